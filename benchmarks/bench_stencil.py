@@ -0,0 +1,46 @@
+## Benchmark of the reference (np.roll based) and in-place update kernels
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_files'))
+from Pde_solver import Solver
+
+
+def bench_grid(n_grid, n_steps=20, repeat=3):
+    """Time n_steps update steps of both kernels on a n_grid x n_grid grid.
+
+    Returns:
+    ---------------
+        t_ref, t_inplace: float
+            - best time per step (in seconds) of update_uv and update_uv_inplace
+    """
+    solv = Solver(n_grid=n_grid, n_time_points=2, n_save_frames=2, fix_seed=True)
+    solv.F, solv.k = 0.035, 0.06
+    u, v = solv.init_u_mat.copy(), solv.init_v_mat.copy()
+    u_next, v_next = np.empty_like(u), np.empty_like(v)
+
+    def reference():
+        u_new, v_new = u, v
+        for _ in range(n_steps):
+            u_new, v_new = solv.update_uv(u_new, v_new)
+
+    def inplace():
+        u_old, v_old, u_new, v_new = u.copy(), v.copy(), u_next, v_next
+        for _ in range(n_steps):
+            solv.update_uv_inplace(u_old, v_old, u_new, v_new)
+            u_old, u_new = u_new, u_old
+            v_old, v_new = v_new, v_old
+
+    t_ref = min(timeit.repeat(reference, number=1, repeat=repeat)) / n_steps
+    t_inplace = min(timeit.repeat(inplace, number=1, repeat=repeat)) / n_steps
+    return t_ref, t_inplace
+
+
+if __name__ == '__main__':
+    grid_sizes = [int(n) for n in sys.argv[1:]] or [64, 128, 256, 512, 1024]
+    print(f'{"n_grid":>8} {"update_uv [ms]":>16} {"in-place [ms]":>16} {"speedup":>8}')
+    for n_grid in grid_sizes:
+        t_ref, t_inplace = bench_grid(n_grid)
+        print(f'{n_grid:>8} {1e3 * t_ref:>16.3f} {1e3 * t_inplace:>16.3f} {t_ref / t_inplace:>8.2f}')
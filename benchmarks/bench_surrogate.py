@@ -0,0 +1,53 @@
+## Number of PDE solves of surrogate-assisted inference and plain SNES, at equal final error
+import os
+import sys
+import warnings
+import numpy as np
+import pints
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(root, 'python_files'))
+sys.path.append(root)
+from Pde_solver import Solver
+from grayscott.surrogate import optimise_surrogate
+
+
+class CountingError(pints.ErrorMeasure):
+    """Sum of squares error that records every evaluation (one PDE solve each)."""
+    def __init__(self, problem):
+        super(CountingError, self).__init__()
+        self._error = pints.SumOfSquaresError(problem)
+        self.history = []
+
+    def n_parameters(self):
+        return self._error.n_parameters()
+
+    def __call__(self, x):
+        self.history.append(self._error(x))
+        return self.history[-1]
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    ## the setup of simulate.py, on a smaller grid with fewer time points
+    n_grid, n_time_points = [int(n) for n in sys.argv[1:3]] or [32, 1000]
+    solv = Solver(n_save_frames=20, n_time_points=n_time_points, n_grid=n_grid, fix_seed=True)
+    solv.solve(parameters=[0.035, 0.060])
+    problem = pints.MultiOutputProblem(solv, solv.save_times, solv.save_u_mat.reshape(solv.n_save_frames, -1))
+    boundaries = pints.RectangularBoundaries([0.01, 0.01], [1.0, 1.0])
+
+    print(f'{"seed":>4} {"surrogate solves":>17} {"error":>10} {"SNES solves to that error":>26} {"SNES solves":>12}')
+    for seed in range(1, 4):
+        np.random.seed(seed)
+        _, surrogate_error, n_solves = optimise_surrogate(problem, boundaries, x0=[0.05, 0.05], seed=seed,
+                                                          transformation=pints.LogTransformation(2))
+        np.random.seed(seed)
+        error = CountingError(problem)
+        snes = pints.OptimisationController(error, [0.05, 0.05], boundaries=boundaries, method=pints.SNES)
+        snes.set_log_to_screen(False)
+        snes.run()
+        best_errors = np.minimum.accumulate(np.nan_to_num(error.history, nan=np.inf))
+        reached = np.flatnonzero(best_errors <= surrogate_error)
+        n_snes = reached[0] + 1 if len(reached) else None
+        print(f'{seed:>4} {n_solves:>17} {surrogate_error:>10.3g} {str(n_snes):>26} {len(error.history):>12}',
+              flush=True)
@@ -0,0 +1,44 @@
+## Benchmark of the throughput (cell updates per second) of the numpy and tiled engines
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'python_files'))
+from Pde_solver import Solver
+
+
+def bench_grid(n_grid, n_steps=8, repeat=3, **solver_kwargs):
+    """Time n_steps update steps of the engine in solver_kwargs on a n_grid x n_grid grid.
+
+    Returns:
+    ---------------
+        throughput: float
+            - best number of cell updates per second
+    """
+    solv = Solver(n_grid=n_grid, n_time_points=2, n_save_frames=2, fix_seed=True, **solver_kwargs)
+    solv.F, solv.k = 0.035, 0.06
+    u_old, v_old = solv.init_u_mat.copy(), solv.init_v_mat.copy()
+    u_new, v_new = np.empty_like(u_old), np.empty_like(v_old)
+    n_blocked = solv.time_block if solv.engine == 'tiled' else 1
+
+    def run():
+        for _ in range(n_steps // n_blocked):
+            if n_blocked > 1:
+                solv.update_uv_tiled(u_old, v_old, u_new, v_new, n_steps=n_blocked)
+            else:
+                solv.advance_uv(u_old, v_old, u_new, v_new)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return n_grid ** 2 * n_steps / best
+
+
+if __name__ == '__main__':
+    grid_sizes = [int(n) for n in sys.argv[1:]] or [256, 512, 1024, 2048, 4096]
+    engines = {'numpy': dict(engine='numpy'),
+               'tiled': dict(engine='tiled', tile_size=256),
+               'tiled, time_block=4': dict(engine='tiled', tile_size=256, time_block=4)}
+    print(f'{"n_grid":>8}' + ''.join(f'{name:>22}' for name in engines) + '   [Mcell updates/s]')
+    for n_grid in grid_sizes:
+        throughputs = [bench_grid(n_grid, **kwargs) for kwargs in engines.values()]
+        print(f'{n_grid:>8}' + ''.join(f'{1e-6 * throughput:>22.1f}' for throughput in throughputs))
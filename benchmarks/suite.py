@@ -0,0 +1,254 @@
+## Benchmark suite of the solver and inference, with a stored baseline to detect performance regressions
+##
+##   python benchmarks/suite.py                         run, compare with benchmarks/baseline.json
+##   python benchmarks/suite.py --output results.json   also write the results
+##   python benchmarks/suite.py --update-baseline       store the results as the new baseline
+##
+## The exit status is 1 if a benchmark is more than --threshold (relative) slower than the baseline.
+## Compare results from the same machine only, and choose a threshold above its run-to-run noise.
+import io
+import os
+import sys
+import contextlib
+import functools
+import json
+import time
+import timeit
+import argparse
+import platform
+import warnings
+import numpy as np
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.append(os.path.join(root, 'python_files'))
+sys.path.append(root)
+from Pde_solver import Solver
+from Inference import Inference
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def bench_update(n_grid, dtype, kernel='advance_uv', n_steps=None, repeat=5):
+    """Cell updates per second of one update step of the reference update_uv()
+    (np.roll, new arrays every step) or of advance_uv() (the in-place step of
+    solve()), timing n_steps steps (about 2**22 cell updates if None).
+
+    Returns:
+    ---------------
+        throughput: float
+            - best number of cell updates per second
+    """
+    solv = Solver(n_grid=n_grid, n_time_points=2, n_save_frames=2, fix_seed=True, dtype=dtype)
+    solv.F, solv.k = 0.035, 0.06
+    u, v = solv.init_u_mat.astype(dtype), solv.init_v_mat.astype(dtype)
+    u_next, v_next = np.empty_like(u), np.empty_like(v)
+    n_steps = n_steps or max(2 ** 22 // n_grid ** 2, 2)
+
+    def reference():
+        u_new, v_new = u, v
+        for _ in range(n_steps):
+            u_new, v_new = solv.update_uv(u_new, v_new)
+
+    def inplace():
+        u_old, v_old, u_new, v_new = u.copy(), v.copy(), u_next, v_next
+        for _ in range(n_steps):
+            solv.advance_uv(u_old, v_old, u_new, v_new)
+            u_old, u_new = u_new, u_old
+            v_old, v_new = v_new, v_old
+
+    run = reference if kernel == 'update_uv' else inplace
+    return n_grid ** 2 * n_steps / min(timeit.repeat(run, number=1, repeat=repeat))
+
+
+def bench_solve(n_grid, n_time_points, n_save_frames, repeat=5):
+    """Time steps per second of solve(), including saving n_save_frames frames.
+
+    Returns:
+    ---------------
+        throughput: float
+            - best number of time steps per second
+    """
+    solv = Solver(n_grid=n_grid, n_time_points=n_time_points, n_save_frames=n_save_frames, fix_seed=True)
+    best = min(timeit.repeat(lambda: solv.solve([0.035, 0.06]), number=1, repeat=repeat))
+    return n_time_points / best
+
+
+class BudgetExhausted(Exception):
+    """Raised by CountingSolver to stop an optimisation after a number of evaluations."""
+
+
+class CountingSolver(Solver):
+    """Solver that counts its simulate() calls (the objective evaluations of
+    inference) and raises BudgetExhausted after max_evaluations of them."""
+    n_evaluations = 0
+    max_evaluations = None
+
+    def simulate(self, parameters, times):
+        if CountingSolver.n_evaluations == CountingSolver.max_evaluations:
+            raise BudgetExhausted()
+        CountingSolver.n_evaluations += 1
+        return super(CountingSolver, self).simulate(parameters, times)
+
+
+def bench_inference(n_grid, n_time_points, max_evaluations=500, seed=1):
+    """Objective evaluations per second of Inference.optimise() (SNES), on data
+    generated with F=0.035, k=0.06, over the first max_evaluations evaluations.
+
+    Returns:
+    ---------------
+        throughput: float
+            - number of evaluations per second of wall time, including the
+            overhead of the optimiser
+    """
+    solv = CountingSolver(n_grid=n_grid, n_time_points=n_time_points, n_save_frames=5, fix_seed=True)
+    data = solv.solve([0.035, 0.06]).reshape(5, -1)
+    inference = Inference(solv, solv.save_times, data)
+    CountingSolver.n_evaluations, CountingSolver.max_evaluations = 0, max_evaluations
+    start = time.perf_counter()
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):  # pints logs to screen
+        warnings.simplefilter('ignore')  # overflow in unstable candidate solves
+        try:
+            inference.optimise(seed=seed)
+        except BudgetExhausted:
+            pass
+    CountingSolver.max_evaluations = None
+    return CountingSolver.n_evaluations / (time.perf_counter() - start)
+
+
+def benchmarks(quick=False):
+    """The benchmarks of the suite.
+
+    Parameters:
+    ---------------
+        quick: bool, default=False
+            - if true, only the smallest sizes (a smoke test of the suite)
+
+    Returns:
+    ---------------
+        benchmarks: dict
+            - benchmark name: (function without arguments that returns a
+            throughput, unit of the throughput)
+    """
+    suite = {}
+    for n_grid in ([64] if quick else [64, 256, 1024]):
+        for dtype in ('float64', 'float32'):
+            for kernel in ('update_uv', 'advance_uv'):
+                suite[f'{kernel}/n_grid={n_grid}/{dtype}'] = (
+                    functools.partial(bench_update, n_grid, dtype, kernel), 'cell updates/s')
+    for n_grid, n_time_points in ([(32, 2000)] if quick else [(32, 2000), (128, 500)]):
+        for label, n_save_frames in (('2 frames', 2), ('every 5th step', n_time_points // 5)):
+            suite[f'solve/n_grid={n_grid}/{label}'] = (
+                functools.partial(bench_solve, n_grid, n_time_points, n_save_frames), 'time steps/s')
+    suite['inference/n_grid=16'] = (functools.partial(bench_inference, 16, 200), 'evaluations/s')
+    return suite
+
+
+def run_suite(quick=False, names=None):
+    """Run the benchmarks.
+
+    Parameters:
+    ---------------
+        quick: bool, default=False
+            - if true, only run the smallest sizes
+        names: list of str, default=None
+            - only run these benchmarks, all if None
+
+    Returns:
+    ---------------
+        results: dict
+            - benchmark name: dict(value, unit), all values are throughputs
+            (higher is better)
+    """
+    results = {}
+    for name, (benchmark, unit) in benchmarks(quick).items():
+        if names is None or name in names:
+            results[name] = dict(value=benchmark(), unit=unit)
+    return results
+
+
+def environment():
+    """Description of the machine and library versions the results were measured with."""
+    return dict(python=platform.python_version(), numpy=np.__version__, machine=platform.machine(),
+                processor=platform.processor(), cpu_count=os.cpu_count(),
+                date=time.strftime('%Y-%m-%d'))
+
+
+def compare(results, baseline, threshold=0.1):
+    """Compare results with a baseline.
+
+    Parameters:
+    ---------------
+        results: dict
+            - results of run_suite()
+        baseline: dict
+            - results of an earlier run_suite()
+        threshold: float, default=0.1
+            - relative slowdown beyond which a benchmark counts as a regression
+
+    Returns:
+    ---------------
+        report: list of dict
+            - per benchmark in both results: name, value, baseline, ratio
+            (value / baseline) and regression (bool)
+    """
+    report = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['value'] / baseline[name]['value']
+        report.append(dict(name=name, value=result['value'], baseline=baseline[name]['value'],
+                           ratio=ratio, regression=ratio < 1 - threshold))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the Gray-Scott solver and inference.')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline results (json)')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slowdown that counts as a regression (default 0.2)')
+    parser.add_argument('--output', help='write the results to this file (json)')
+    parser.add_argument('--update-baseline', action='store_true', help='store the results as the baseline')
+    parser.add_argument('--quick', action='store_true', help='only run the smallest sizes')
+    parser.add_argument('--retries', type=int, default=2,
+                        help='rerun regressed benchmarks up to this many times, keeping their best '
+                             'result, before reporting them (default 2)')
+    args = parser.parse_args()
+
+    results = run_suite(quick=args.quick)
+    document = dict(environment=environment(), results=results)
+
+    def save(path):
+        with open(path, 'w') as json_file:
+            json.dump(document, json_file, indent=2)
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        for path in (args.output, args.baseline if args.update_baseline else None):
+            if path:
+                save(path)
+        if args.update_baseline:
+            print(f'Stored {len(results)} results in {args.baseline}.')
+        else:
+            print(json.dumps(document, indent=2))
+            print(f'No baseline at {args.baseline}, run with --update-baseline to store one.')
+        sys.exit(0)
+    with open(args.baseline) as json_file:
+        baseline = json.load(json_file)
+    report = compare(results, baseline['results'], threshold=args.threshold)
+    for _ in range(args.retries):  # a slow phase of a shared machine is not a regression
+        regressed = [entry['name'] for entry in report if entry['regression']]
+        if not regressed:
+            break
+        for name, result in run_suite(quick=args.quick, names=regressed).items():
+            results[name]['value'] = max(results[name]['value'], result['value'])
+        report = compare(results, baseline['results'], threshold=args.threshold)
+    if args.output:
+        save(args.output)
+    print(f'{"benchmark":<45} {"value":>12} {"baseline":>12} {"ratio":>7}')
+    for entry in report:
+        flag = '  REGRESSION' if entry['regression'] else ''
+        print(f'{entry["name"]:<45} {entry["value"]:>12.4g} {entry["baseline"]:>12.4g} {entry["ratio"]:>7.2f}{flag}')
+    n_regressions = sum(entry['regression'] for entry in report)
+    if baseline['environment'] != {**environment(), 'date': baseline['environment']['date']}:
+        print('The baseline was measured on a different machine or with other library versions.')
+    print(f'{n_regressions} of {len(report)} benchmarks regressed by more than {args.threshold:.0%}.')
+    sys.exit(1 if n_regressions else 0)
@@ -0,0 +1,49 @@
+import numpy as np
+from typing import Tuple
+from scipy.optimize import minimize
+from pints import Boundaries, SumOfSquaresError, Transformation
+
+
+def optimise_gradient(problem, x0: np.ndarray, boundaries: Boundaries = None, transformation: Transformation = None,
+                      max_iterations: int = 100, tolerance: float = 1e-12) -> Tuple:
+    """Minimises the sum of squares error of a problem with L-BFGS-B, using its gradient.
+
+    The gradient comes from pints' evaluateS1(), so the problem's model must
+    implement simulateS1() (e.g. Solver, with forward sensitivities). Each
+    iteration costs one or a few evaluations of the error and its gradient.
+
+    Arguments:
+        problem {pints.SingleOutputProblem or pints.MultiOutputProblem} -- Problem to fit.
+        x0 {np.ndarray} -- Initial point in parameter space.
+
+    Keyword Arguments:
+        boundaries {pints.RectangularBoundaries} -- Bounds of the search. (default: {None})
+        transformation {pints.Transformation} -- If given, search in the transformed parameter
+            space, e.g. pints.LogTransformation for parameters of different magnitudes.
+            (default: {None})
+        max_iterations {int} -- Maximum number of L-BFGS-B iterations. (default: {100})
+        tolerance {float} -- Tolerance on the (relative) change of the error and on the projected
+            gradient. (default: {1e-12})
+
+    Returns:
+        Tuple -- Best parameters, best score, number of evaluations (of error and gradient)
+    """
+    error = SumOfSquaresError(problem)
+    x0 = np.asarray(x0, dtype=float)
+    if transformation is not None:
+        error = transformation.convert_error_measure(error)
+        x0 = transformation.to_search(x0)
+        if boundaries is not None:
+            boundaries = transformation.convert_boundaries(boundaries)
+    bounds = None if boundaries is None else list(zip(boundaries.lower(), boundaries.upper()))
+
+    def error_and_gradient(x):
+        score, gradient = error.evaluateS1(x)
+        if not np.isfinite(score):  # e.g. an unstable solve: make the line search step back
+            return np.inf, np.zeros_like(x)
+        return score, np.asarray(gradient, dtype=float)
+
+    result = minimize(error_and_gradient, x0, jac=True, method='L-BFGS-B', bounds=bounds,
+                      options=dict(maxiter=max_iterations, ftol=tolerance, gtol=tolerance))
+    x_best = result.x if transformation is None else transformation.to_model(result.x)
+    return x_best, result.fun, result.nfev
@@ -0,0 +1,162 @@
+import time
+import functools
+from contextlib import contextmanager
+from collections import defaultdict
+from typing import Callable
+
+# Methods of Solver that are timed while a profiler is attached, with the phase they count towards.
+# Phases nest: solve (or simulateS1) contains step, sensitivity, frames and checkpoint; step contains
+# diffusion, reaction and convergence (the fused numba kernels compute these inside step, without
+# separate timings).
+PHASES = {'advance_uv': 'step', 'advance_uv_monitored': 'step', 'update_uv_tiled': 'step',
+          '_diffusion_increment_inplace': 'diffusion', '_reaction_inplace': 'reaction',
+          '_relative_change': 'convergence', '_sensitivity_step': 'sensitivity',
+          '_write_frame': 'frames', 'save_checkpoint': 'checkpoint'}
+
+
+class Profiler():
+    """Timers and counters of the solves of a Solver, or of all solves of an inference run.
+
+    Enabled with Solver(profiler=Profiler()). While a solve runs, the methods of
+    the solver in PHASES are replaced by timed wrappers on the instance; without
+    a profiler the solver runs its methods unwrapped, so instrumentation costs
+    nothing when it is disabled. After every solve, the solver's profile
+    attribute holds summary().
+
+    Keyword Arguments:
+        callback {Callable} -- Called as callback(solver, i_t, profiler) every `every` time steps
+            (i_t is the index of the next time step), e.g. to log progress. (default: {None})
+        every {int} -- Number of time steps between callbacks. (default: {100})
+    """
+    def __init__(self, callback: Callable = None, every: int = 100):
+        if int(every) < 1:
+            raise ValueError(f'The callback interval must be at least 1, got {every}.')
+        self.callback = callback
+        self.every = int(every)
+        self.active = False
+        self.reset()
+
+    def reset(self):
+        """Clears all timers and counters."""
+        self.times = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.counters = dict(solves=0, steps=0, cell_updates=0, frames_saved=0, bytes_copied_estimate=0,
+                             evaluations=0)
+        self._running = set()
+
+    def timed(self, phase: str, function: Callable) -> Callable:
+        """Returns function wrapped to add its run time to the timer of phase.
+
+        Nested calls of the same phase (e.g. advance_uv inside advance_uv_monitored)
+        are timed once.
+        """
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if phase in self._running:
+                return function(*args, **kwargs)
+            self._running.add(phase)
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.times[phase] += time.perf_counter() - start
+                self.calls[phase] += 1
+                self._running.discard(phase)
+        return wrapper
+
+    @contextmanager
+    def attached(self, solver):
+        """Times the phases of solver within the context, and counts the solve."""
+        wrapped = []
+        for name, phase in PHASES.items():
+            if name not in vars(solver):  # do not wrap methods the user has replaced
+                setattr(solver, name, self.timed(phase, getattr(solver, name)))
+                wrapped.append(name)
+        self.active = True
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.times['solve'] += time.perf_counter() - start
+            self.calls['solve'] += 1
+            self.active = False
+            for name in wrapped:
+                delattr(solver, name)
+        self.counters['solves'] += 1
+        frames_saved = self.calls['frames'] - self.counters['frames_saved']
+        self.counters['frames_saved'] = self.calls['frames']
+        # an estimate, not a count of the copies: one copy of u and v into the solver's buffers per
+        # solve and one per saved frame into the sink (disk sinks and observations copy differently)
+        self.counters['bytes_copied_estimate'] += (solver.u_mat.nbytes + solver.v_mat.nbytes) * (1 + frames_saved)
+
+    def step(self, solver, i_t: int, n_steps: int = 1):
+        """Counts n_steps time steps of solver, starting at step i_t (called by the time loops)."""
+        self.counters['steps'] += n_steps
+        self.counters['cell_updates'] += n_steps * solver.n_x * solver.n_y
+        if self.callback is not None and (i_t + n_steps) // self.every > i_t // self.every:
+            self.callback(solver, i_t + n_steps, self)
+
+    def summary(self) -> dict:
+        """Returns the timers and counters.
+
+        Returns:
+            dict -- The counters, times (seconds per phase, with 'other' for the part of
+                solve outside the timed phases and 'optimiser' for the part of inference
+                outside the objective), calls per phase, the cell updates per second of
+                solving, and the time and steps per objective evaluation if evaluations
+                were counted.
+        """
+        times = dict(self.times)
+        if 'solve' in times:
+            times['other'] = max(0.0, times['solve'] - sum(times.get(phase, 0.0) for phase in
+                                                           ('step', 'sensitivity', 'frames', 'checkpoint')))
+        if 'inference' in times:
+            times['optimiser'] = max(0.0, times['inference'] - times.get('objective', 0.0))
+        summary = dict(self.counters, times=times, calls=dict(self.calls))
+        if times.get('solve', 0) > 0:
+            summary['cell_updates_per_second'] = self.counters['cell_updates'] / times['solve']
+        if self.counters['evaluations']:
+            summary['seconds_per_evaluation'] = times.get('objective', times.get('solve', 0.0)) \
+                / self.counters['evaluations']
+            summary['steps_per_evaluation'] = self.counters['steps'] / self.counters['evaluations']
+        return summary
+
+
+@contextmanager
+def profiled_model(model, profiler: Profiler):
+    """Attaches profiler to model (e.g. a Solver) within the context.
+
+    The context is timed as the 'inference' phase, and the simulate() and
+    simulateS1() calls of the model (and every member of a simulate_batch()
+    call) are counted as objective evaluations, timed as the 'objective' phase.
+    Does nothing if profiler is None.
+
+    Arguments:
+        model {pints.ForwardModel} -- Model of the inference.
+        profiler {Profiler} -- Profiler, or None.
+    """
+    if profiler is None:
+        yield model
+        return
+    previous = getattr(model, 'profiler', None)
+    model.profiler = profiler
+    wrapped = []
+    for name in ('simulate', 'simulateS1', 'simulate_batch'):
+        if name in vars(model) or not hasattr(model, name):
+            continue
+        function = getattr(model, name)
+
+        def counted(parameters, *args, function=function, batch=name == 'simulate_batch', **kwargs):
+            profiler.counters['evaluations'] += len(parameters) if batch else 1
+            return function(parameters, *args, **kwargs)
+        setattr(model, name, profiler.timed('objective', counted))
+        wrapped.append(name)
+    start = time.perf_counter()
+    try:
+        yield model
+    finally:
+        profiler.times['inference'] += time.perf_counter() - start
+        profiler.calls['inference'] += 1
+        model.profiler = previous
+        for name in wrapped:
+            delattr(model, name)
@@ -1,23 +1,139 @@
 import numpy as np
 from typing import List
-from pints import SingleOutputProblem, SumOfSquaresError, OptimisationController, XNES
+from pints import (Boundaries, SingleOutputProblem, SumOfSquaresError, OptimisationController, Transformation,
+                   XNES)
+from grayscott.population import optimise_population
+from grayscott.surrogate import optimise_surrogate
+from grayscott.gradient import optimise_gradient
+from grayscott.instrumentation import Profiler, profiled_model
+from grayscott.sampling import gaussian_log_posterior, residual_sigma, sample_chains
 
 class InverseProblem(SingleOutputProblem):
     def __init__(self, model, times, values):
         super(InverseProblem, self).__init__(model, times, values)
+        self.profile = None
+        self.diagnostics = None
 
-    def find_parameter(self, initial_parameters: np.ndarray) -> List:
+    def find_parameter(self, initial_parameters: np.ndarray, batched: bool = False, parallel: bool = False,
+                       n_workers: int = None, seed: int = None, surrogate: bool = False,
+                       boundaries: Boundaries = None, max_solves: int = 200,
+                       transformation: Transformation = None, gradient: bool = False,
+                       profiler: Profiler = None) -> List:
         """Minimises Least Squares Error to find optimal model parameters.
 
         Arguments:
             initial_parameters {np.ndarray} -- Initial point in parameter space for optimistation.
+
+        Keyword Arguments:
+            batched {bool} -- If True, each XNES population is evaluated with one call to
+                the model's simulate_batch(). (default: {False})
+            parallel {bool} -- If True, each XNES population is evaluated on a pool of worker
+                processes that each keep a warm copy of the model. (default: {False})
+            n_workers {int} -- Number of worker processes, all cores if None. (default: {None})
+            seed {int} -- Seed for numpy's random generator, which XNES samples from. (default: {None})
+            surrogate {bool} -- If True, search an RBF emulator of the error that is refit as
+                solves arrive, and only solve the model at promising points (see
+                grayscott.surrogate.run_surrogate); batched and parallel then apply to the
+                initial design. (default: {False})
+            boundaries {pints.RectangularBoundaries} -- Boundaries of the surrogate search,
+                required if surrogate. (default: {None})
+            max_solves {int} -- Maximum number of model solves of the surrogate search.
+                (default: {200})
+            transformation {pints.Transformation} -- Parameter space of the surrogate or gradient
+                search, e.g. pints.LogTransformation if the boundaries span decades. (default: {None})
+            gradient {bool} -- If True, minimise with L-BFGS-B, using the gradient from the model's
+                simulateS1() (see grayscott.gradient.optimise_gradient); boundaries are optional.
+                (default: {False})
+            profiler {Profiler} -- If given, profile the model's solves and count the objective
+                evaluations during the search; the summary is stored in self.profile. Not
+                supported if parallel. (default: {None})
         
         Returns:
             List -- Parameter estimates, Least Squared Error
         """
+        if profiler is not None and parallel:
+            raise ValueError('Profiling is not supported with parallel=True.')
+        try:
+            with profiled_model(self._model, profiler):
+                return self._find_parameter(initial_parameters, batched, parallel, n_workers, seed, surrogate,
+                                            boundaries, max_solves, transformation, gradient)
+        finally:
+            if profiler is not None:
+                self.profile = profiler.summary()
+
+    def _find_parameter(self, initial_parameters: np.ndarray, batched: bool, parallel: bool, n_workers: int,
+                        seed: int, surrogate: bool, boundaries: Boundaries, max_solves: int,
+                        transformation: Transformation, gradient: bool) -> List:
+        """find_parameter() without profiling."""
+        if seed is not None:
+            np.random.seed(seed)
+
+        if gradient:
+            estimated_parameters, score, _ = optimise_gradient(self, initial_parameters, boundaries=boundaries,
+                                                               transformation=transformation)
+
+            return [estimated_parameters, score]
+
+        if surrogate:
+            if boundaries is None:
+                raise ValueError('The surrogate search requires boundaries.')
+            estimated_parameters, score, _ = optimise_surrogate(
+                self, boundaries, x0=initial_parameters, batched=batched, parallel=parallel,
+                n_workers=n_workers, max_evaluations=max_solves, transformation=transformation, seed=seed)
+
+            return [estimated_parameters, score]
+
+        if batched or parallel:
+            estimated_parameters, score = optimise_population(self, XNES(initial_parameters), batched=batched,
+                                                              parallel=parallel, n_workers=n_workers)
+
+            return [estimated_parameters, score]
+
         error_measure = SumOfSquaresError(self)
         optimisation = OptimisationController(error_measure, initial_parameters, method=XNES)
 
         estimated_parameters, score = optimisation.run()
 
-        return [estimated_parameters, score]
\ No newline at end of file
+        return [estimated_parameters, score]
+
+    def sample(self, initial_parameters: np.ndarray, sigma: float = None, n_chains: int = 4,
+               parallel: bool = False, n_workers: int = None, seed: int = None, boundaries: Boundaries = None,
+               max_iterations: int = 10000, max_rhat: float = 1.05, min_ess: float = 200,
+               warm_up: float = 0.5) -> np.ndarray:
+        """Samples the posterior of the model parameters with parallel MCMC chains that stop
+        once they have converged (see grayscott.sampling.sample_chains).
+
+        Arguments:
+            initial_parameters {np.ndarray} -- Starting point of the chains, e.g. the result of
+                find_parameter().
+
+        Keyword Arguments:
+            sigma {float} -- Standard deviation of the noise of the values, the root mean square
+                residual at initial_parameters if None. (default: {None})
+            n_chains {int} -- Number of chains. (default: {4})
+            parallel {bool} -- If True, run the chains on worker processes. (default: {False})
+            n_workers {int} -- Number of worker processes, n_chains if None. (default: {None})
+            seed {int} -- Seed of the starting points and the samplers. (default: {None})
+            boundaries {pints.RectangularBoundaries} -- Support of the uniform prior,
+                [0.01, 1] for every parameter if None. (default: {None})
+            max_iterations {int} -- Maximum number of iterations per chain. (default: {10000})
+            max_rhat {float} -- Convergence threshold of R-hat. (default: {1.05})
+            min_ess {float} -- Required effective sample size of every parameter. (default: {200})
+            warm_up {float} -- Fraction of every chain that is discarded. (default: {0.5})
+
+        Returns:
+            np.ndarray -- Samples after warm-up, of shape (n_chains, n_samples, n_parameters); the
+                diagnostics are stored in self.diagnostics.
+        """
+        if sigma is None:
+            sigma = residual_sigma(self, initial_parameters)
+        if boundaries is None:
+            lower, upper = [0.01] * self.n_parameters(), [1.0] * self.n_parameters()
+        else:
+            lower, upper = boundaries.lower(), boundaries.upper()
+        log_posterior = gaussian_log_posterior(self, sigma, lower=lower, upper=upper)
+        chains, self.diagnostics = sample_chains(log_posterior, initial_parameters, n_chains=n_chains,
+                                                 parallel=parallel, n_workers=n_workers,
+                                                 max_iterations=max_iterations, max_rhat=max_rhat,
+                                                 min_ess=min_ess, warm_up=warm_up, seed=seed)
+        return chains[:, int(warm_up * chains.shape[1]):]
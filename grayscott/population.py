@@ -0,0 +1,177 @@
+import os
+import multiprocessing
+import numpy as np
+from typing import Callable, List, Tuple
+import pints
+from pints import Evaluator, OptimisationController, Optimiser, SequentialEvaluator, SumOfSquaresError
+
+# Function evaluated by the worker processes of a ProcessPoolEvaluator. It is set
+# once when a worker starts, so the model (e.g. a Solver with its grid and initial
+# conditions) is unpickled once per worker and stays warm between evaluations.
+_worker_function = None
+
+
+def _init_worker(function: Callable):
+    global _worker_function
+    _worker_function = function
+
+
+def _call_worker(x):
+    return _worker_function(x)
+
+
+class BatchEvaluator(Evaluator):
+    """Evaluator that passes a whole population to a single vectorised call.
+
+    Arguments:
+        function {Callable} -- Function that maps an array of positions with shape
+            (n_positions, n_parameters) to an array of n_positions scores.
+    """
+    def __init__(self, function: Callable):
+        super(BatchEvaluator, self).__init__(function)
+
+    def _evaluate(self, positions) -> List:
+        if len(positions) == 0:
+            return []
+        return list(self._function(np.asarray(positions, dtype=float)))
+
+
+class ProcessPoolEvaluator(Evaluator):
+    """Evaluator that distributes a population over a pool of worker processes.
+
+    Each worker receives a copy of the function when the pool starts and reuses
+    it for all later evaluations. Results are returned in the order of the
+    positions, so runs are reproducible for a fixed seed of the optimiser.
+
+    Arguments:
+        function {Callable} -- Function to evaluate, must be picklable.
+
+    Keyword Arguments:
+        n_workers {int} -- Number of worker processes, os.cpu_count() if None.
+            (default: {None})
+        batched {bool} -- If True, function takes an array of positions (see
+            BatchEvaluator) and each worker evaluates one contiguous chunk of the
+            population. (default: {False})
+    """
+    def __init__(self, function: Callable, n_workers: int = None, batched: bool = False):
+        super(ProcessPoolEvaluator, self).__init__(function)
+        self._n_workers = n_workers or os.cpu_count()
+        self._batched = batched
+        self._pool = multiprocessing.Pool(self._n_workers, initializer=_init_worker,
+                                          initargs=(function,))
+
+    def n_workers(self) -> int:
+        return self._n_workers
+
+    def _evaluate(self, positions) -> List:
+        if len(positions) == 0:
+            return []
+        if self._batched:
+            positions = np.asarray(positions, dtype=float)
+            n_chunks = min(self._n_workers, len(positions))
+            chunks = self._pool.map(_call_worker, np.array_split(positions, n_chunks))
+            return list(np.concatenate(chunks))
+        return self._pool.map(_call_worker, list(positions))
+
+    def close(self):
+        """Shuts down the worker processes."""
+        self._pool.close()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class BatchedSumOfSquaresError():
+    """Sum of squares error of a pints problem, evaluated for a population at once.
+
+    Equivalent to pints.SumOfSquaresError, but the problem's model must provide
+    simulate_batch(parameters, times), which returns one row of outputs per
+    parameter set.
+
+    Arguments:
+        problem {pints.SingleOutputProblem or pints.MultiOutputProblem} -- Problem
+            whose model is evaluated.
+    """
+    def __init__(self, problem):
+        self._problem = problem
+        self._model = problem.model()
+        self._values = np.asarray(problem.values()).reshape(problem.n_times(), problem.n_outputs())
+
+    def n_parameters(self) -> int:
+        return self._problem.n_parameters()
+
+    def __call__(self, parameters: np.ndarray) -> np.ndarray:
+        """Returns the sum of squares error of each row of parameters."""
+        simulations = np.asarray(self._model.simulate_batch(parameters, self._problem.times()))
+        residuals = simulations.reshape((len(parameters),) + self._values.shape) - self._values
+        return np.sum(residuals ** 2, axis=(1, 2))
+
+
+class EvaluatorOptimisationController(OptimisationController):
+    """OptimisationController that scores the points of every iteration with a given
+    evaluator (e.g. a BatchEvaluator or a ProcessPoolEvaluator), instead of the
+    sequential or parallel evaluator that pints builds from the error measure. Stopping
+    criteria, logging and callbacks are those of pints.OptimisationController.
+
+    Arguments:
+        function {pints.ErrorMeasure} -- Error measure of the evaluator, which gives the
+            number of parameters.
+        optimiser {pints.Optimiser} -- Optimiser, e.g. pints.SNES or pints.XNES, which
+            starts at its own x0.
+        evaluator {pints.Evaluator} -- Evaluator used to score each population.
+    """
+    def __init__(self, function, optimiser: Optimiser, evaluator: Evaluator):
+        super(EvaluatorOptimisationController, self).__init__(function, optimiser.x_guessed(),
+                                                              method=type(optimiser))
+        self._optimiser = optimiser
+        self._needs_sensitivities = optimiser.needs_sensitivities()
+        self._evaluator = evaluator
+        if isinstance(evaluator, ProcessPoolEvaluator):  # log the worker processes
+            self._parallel = True
+            self._n_workers = evaluator.n_workers()
+
+    def run(self) -> Tuple:
+        """Runs the optimisation, returns a tuple (x, f) (see pints.OptimisationController.run)."""
+        # pints.OptimisationController.run() creates its evaluator with
+        # pints.SequentialEvaluator(f) or pints.ParallelEvaluator(f, n_workers), so these
+        # names are pointed at our evaluator while it runs.
+        evaluators = pints.SequentialEvaluator, pints.ParallelEvaluator
+        pints.SequentialEvaluator = pints.ParallelEvaluator = lambda *args, **kwargs: self._evaluator
+        try:
+            return super(EvaluatorOptimisationController, self).run()
+        finally:
+            pints.SequentialEvaluator, pints.ParallelEvaluator = evaluators
+
+
+def optimise_population(problem, optimiser: Optimiser, batched: bool = False, parallel: bool = False,
+                        n_workers: int = None) -> Tuple:
+    """Minimises the sum of squares error of a problem with a population based optimiser.
+
+    Arguments:
+        problem {pints.SingleOutputProblem or pints.MultiOutputProblem} -- Problem to fit.
+        optimiser {pints.PopulationBasedOptimiser} -- Optimiser, e.g. pints.SNES or pints.XNES.
+
+    Keyword Arguments:
+        batched {bool} -- If True, evaluate populations with the model's
+            simulate_batch(). (default: {False})
+        parallel {bool} -- If True, evaluate populations on a ProcessPoolEvaluator and
+            round the population size up to a multiple of the number of workers.
+            (default: {False})
+        n_workers {int} -- Number of worker processes, os.cpu_count() if None.
+            (default: {None})
+
+    Returns:
+        Tuple -- Best parameters, best score
+    """
+    error = BatchedSumOfSquaresError(problem) if batched else SumOfSquaresError(problem)
+    if not parallel:
+        evaluator = BatchEvaluator(error) if batched else SequentialEvaluator(error)
+        return EvaluatorOptimisationController(error, optimiser, evaluator).run()
+
+    with ProcessPoolEvaluator(error, n_workers=n_workers, batched=batched) as evaluator:
+        optimiser.set_population_size(optimiser.suggested_population_size(evaluator.n_workers()))
+        return EvaluatorOptimisationController(error, optimiser, evaluator).run()
@@ -0,0 +1,192 @@
+import functools
+from collections import OrderedDict
+import numpy as np
+from typing import Callable, Tuple
+from pints import (GaussianKnownSigmaLogLikelihood, HaarioBardenetACMC, LogPDF, LogPosterior, RectangularBoundaries,
+                   SequentialEvaluator, SumOfSquaresError, UniformLogPrior, effective_sample_size, rhat)
+from grayscott.population import ProcessPoolEvaluator
+
+
+class CachedLogPDF(LogPDF):
+    """LogPDF that remembers its most recent evaluations, so that a position that is
+    proposed again (e.g. the shared starting point of several chains) is not solved again.
+
+    Arguments:
+        log_pdf {pints.LogPDF} -- LogPDF to evaluate, e.g. a pints.LogPosterior.
+
+    Keyword Arguments:
+        max_entries {int} -- Number of evaluations that are remembered. (default: {1024})
+    """
+    def __init__(self, log_pdf: LogPDF, max_entries: int = 1024):
+        super(CachedLogPDF, self).__init__()
+        self._log_pdf = log_pdf
+        self._max_entries = max_entries
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def n_parameters(self) -> int:
+        return self._log_pdf.n_parameters()
+
+    def __call__(self, x) -> float:
+        key = tuple(float(value) for value in x)
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key]
+        self.misses += 1
+        self._cache[key] = value = float(self._log_pdf(x))
+        if len(self._cache) > self._max_entries:
+            self._cache.popitem(last=False)
+        return value
+
+
+def gaussian_log_posterior(problem, sigma: float, lower=(0.01, 0.01), upper=(1.0, 1.0)) -> LogPosterior:
+    """Returns the log posterior of a problem with Gaussian noise of known standard deviation
+    sigma, and a uniform prior within the boundaries of the optimisers.
+
+    Arguments:
+        problem {pints.SingleOutputProblem or pints.MultiOutputProblem} -- Problem to sample.
+        sigma {float} -- Standard deviation of the noise of the values of the problem.
+
+    Keyword Arguments:
+        lower {list} -- Lower bounds of the uniform prior. (default: {(0.01, 0.01)})
+        upper {list} -- Upper bounds of the uniform prior. (default: {(1.0, 1.0)})
+    """
+    if not sigma > 0:
+        raise ValueError(f'The noise standard deviation must be positive, got {sigma}.')
+    log_likelihood = GaussianKnownSigmaLogLikelihood(problem, sigma)
+    return LogPosterior(log_likelihood, UniformLogPrior(RectangularBoundaries(lower, upper)))
+
+
+def residual_sigma(problem, x: np.ndarray) -> float:
+    """Returns the root mean square residual of a problem at the position x, an estimate of
+    the noise standard deviation if x is a good fit (e.g. the result of an optimisation)."""
+    return float(np.sqrt(SumOfSquaresError(problem)(x) / np.size(problem.values())))
+
+
+def _run_block(log_pdf: CachedLogPDF, task: Tuple) -> Tuple:
+    """Advances the sampler of one chain by n_iterations. Runs on a worker process if the
+    chains are sampled in parallel, so the sampler is passed and returned with its state.
+
+    pints samplers draw from numpy's global random state, which is seeded for the block
+    and restored afterwards, so serial sampling leaves the caller's random state alone."""
+    sampler, n_iterations, seed, initial_phase = task
+    global_state = np.random.get_state()
+    np.random.seed(seed)
+    try:
+        if sampler.needs_initial_phase():
+            sampler.set_initial_phase(initial_phase)
+        hits, misses = log_pdf.hits, log_pdf.misses
+        samples = np.empty((n_iterations, log_pdf.n_parameters()))
+        log_pdfs = np.empty(n_iterations)
+        for i in range(n_iterations):
+            reply = sampler.tell(log_pdf(sampler.ask()))
+            samples[i], log_pdfs[i] = reply[0], reply[1]
+    finally:
+        np.random.set_state(global_state)
+    return sampler, samples, log_pdfs, log_pdf.hits - hits, log_pdf.misses - misses
+
+
+def diagnose(chains: np.ndarray, warm_up: float = 0.5) -> Tuple:
+    """Returns the R-hat of every parameter and their effective sample sizes, summed over
+    the chains, of the samples after the warm_up fraction of the chains.
+
+    Arguments:
+        chains {np.ndarray} -- Samples of shape (n_chains, n_iterations, n_parameters).
+    """
+    kept = chains[:, int(warm_up * chains.shape[1]):]
+    ess = np.sum([effective_sample_size(chain) for chain in kept], axis=0)
+    return np.asarray(rhat(chains, warm_up=warm_up)), ess
+
+
+def sample_chains(log_pdf: LogPDF, x0: np.ndarray, n_chains: int = 4, method: Callable = HaarioBardenetACMC,
+                  sigma0: np.ndarray = None, parallel: bool = False, n_workers: int = None,
+                  block_size: int = 100, min_iterations: int = 500, max_iterations: int = 10000,
+                  initial_phase_iterations: int = 200, warm_up: float = 0.5, max_rhat: float = 1.05,
+                  min_ess: float = 200, jitter: float = 0.01, cache_size: int = 1024,
+                  seed: int = None) -> Tuple:
+    """Samples a log pdf with several MCMC chains until they have converged.
+
+    The chains advance in blocks of block_size iterations, in parallel on a pool of
+    worker processes if parallel. After every block (from min_iterations on), the
+    R-hat and the effective sample size of the samples after warm-up are computed,
+    and sampling stops once all R-hats are below max_rhat and all effective sample
+    sizes reach min_ess, or after max_iterations. Evaluations are cached per process
+    (see CachedLogPDF).
+
+    Arguments:
+        log_pdf {pints.LogPDF} -- Log pdf to sample, e.g. from gaussian_log_posterior().
+        x0 {np.ndarray} -- Starting point of the chains, or one starting point per chain
+            (shape (n_chains, n_parameters)). A single starting point is perturbed by a
+            relative jitter per chain, so that R-hat can detect chains that have not mixed.
+
+    Keyword Arguments:
+        n_chains {int} -- Number of chains. (default: {4})
+        method {Callable} -- pints single chain MCMC sampler. (default: {pints.HaarioBardenetACMC})
+        sigma0 {np.ndarray} -- Initial proposal standard deviations or covariance, pints'
+            default if None. (default: {None})
+        parallel {bool} -- If True, advance the chains on worker processes, each keeping a
+            warm copy of the log pdf. (default: {False})
+        n_workers {int} -- Number of worker processes, n_chains if None. (default: {None})
+        block_size {int} -- Number of iterations between convergence checks. (default: {100})
+        min_iterations {int} -- Minimum number of iterations per chain. (default: {500})
+        max_iterations {int} -- Maximum number of iterations per chain. (default: {10000})
+        initial_phase_iterations {int} -- Number of iterations before samplers with an
+            initial phase (e.g. adaptive covariance) start to adapt. (default: {200})
+        warm_up {float} -- Fraction of every chain that is discarded for the diagnostics.
+            (default: {0.5})
+        max_rhat {float} -- Convergence threshold of R-hat. (default: {1.05})
+        min_ess {float} -- Required effective sample size of every parameter. (default: {200})
+        jitter {float} -- Relative perturbation of a single starting point. (default: {0.01})
+        cache_size {int} -- Number of evaluations cached per process. (default: {1024})
+        seed {int} -- Seed of the starting points and of the samplers. (default: {None})
+
+    Returns:
+        Tuple -- Samples of shape (n_chains, n_iterations, n_parameters) (all iterations,
+            including warm-up), and a dict of diagnostics: iterations, rhat, ess, converged,
+            acceptance_rate, evaluations (of the log pdf, without cache hits), cache_hits and
+            log_pdfs (of the samples)
+    """
+    x0 = np.asarray(x0, dtype=float)
+    if x0.ndim == 1:
+        rng = np.random.default_rng(seed)
+        x0 = x0 * (1 + jitter * rng.standard_normal((n_chains, len(x0))))
+    if len(x0) != n_chains:
+        raise ValueError(f'Got {len(x0)} starting points for {n_chains} chains.')
+    samplers = [method(x, sigma0) for x in x0]
+    seeds = np.random.SeedSequence(seed).spawn(n_chains)
+    cached = CachedLogPDF(log_pdf, max_entries=cache_size)
+    block = functools.partial(_run_block, cached)
+    if parallel:
+        evaluator = ProcessPoolEvaluator(block, n_workers=min(n_workers or n_chains, n_chains))
+    else:
+        evaluator = SequentialEvaluator(block)
+
+    chains, log_pdfs = [], []
+    diagnostics = dict(iterations=0, rhat=None, ess=None, converged=False, evaluations=0, cache_hits=0)
+    try:
+        while diagnostics['iterations'] < max_iterations:
+            iterations = diagnostics['iterations']
+            n_iterations = min(block_size, max_iterations - iterations)
+            tasks = [(sampler, n_iterations, int(chain_seed.spawn(1)[0].generate_state(1)[0]),
+                      iterations < initial_phase_iterations) for sampler, chain_seed in zip(samplers, seeds)]
+            results = evaluator.evaluate(tasks)
+            samplers = [result[0] for result in results]
+            chains.append(np.stack([result[1] for result in results]))
+            log_pdfs.append(np.stack([result[2] for result in results]))
+            diagnostics['iterations'] += n_iterations
+            diagnostics['cache_hits'] += sum(result[3] for result in results)
+            diagnostics['evaluations'] += sum(result[4] for result in results)
+            if diagnostics['iterations'] >= min_iterations:
+                samples = np.concatenate(chains, axis=1)
+                diagnostics['rhat'], diagnostics['ess'] = diagnose(samples, warm_up)
+                if np.all(diagnostics['rhat'] < max_rhat) and np.all(diagnostics['ess'] >= min_ess):
+                    diagnostics['converged'] = True
+                    break
+    finally:
+        if parallel:
+            evaluator.close()
+    diagnostics['acceptance_rate'] = [sampler.acceptance_rate() for sampler in samplers]
+    diagnostics['log_pdfs'] = np.concatenate(log_pdfs, axis=1)
+    return np.concatenate(chains, axis=1), diagnostics
@@ -0,0 +1,206 @@
+import numpy as np
+from typing import Callable, Tuple
+from scipy.interpolate import RBFInterpolator
+from scipy.stats import qmc
+from pints import (Boundaries, ErrorMeasure, Evaluator, OptimisationController, SequentialEvaluator,
+                   SumOfSquaresError, Transformation, XNES)
+from grayscott.population import BatchEvaluator, BatchedSumOfSquaresError, ProcessPoolEvaluator
+
+
+class RBFSurrogate():
+    """Radial basis function emulator of an error measure within rectangular boundaries.
+
+    The logarithm of the error is interpolated (with a little smoothing) in
+    coordinates scaled to the unit box, which keeps the steep walls and the
+    narrow valley of a sum of squares error within reach of the interpolant.
+
+    Arguments:
+        boundaries {pints.RectangularBoundaries} -- Boundaries of the parameter space.
+
+    Keyword Arguments:
+        kernel {str} -- Kernel of scipy's RBFInterpolator. (default: {'thin_plate_spline'})
+        smoothing {float} -- Smoothing of the interpolant. (default: {1e-6})
+    """
+    def __init__(self, boundaries: Boundaries, kernel: str = 'thin_plate_spline', smoothing: float = 1e-6):
+        self._lower = np.asarray(boundaries.lower(), dtype=float)
+        self._range = np.asarray(boundaries.range(), dtype=float)
+        self._kernel = kernel
+        self._smoothing = smoothing
+        self._interpolant = None
+
+    def scale(self, xs: np.ndarray) -> np.ndarray:
+        """Returns the positions xs in coordinates of the unit box."""
+        return (np.asarray(xs, dtype=float) - self._lower) / self._range
+
+    def fit(self, xs: np.ndarray, fs: np.ndarray):
+        """Fits the emulator to the errors fs at the positions xs (one row per position)."""
+        fs = np.asarray(fs, dtype=float)
+        self._floor = 1e-12 * max(np.max(fs), 1e-300)  # errors can be exactly zero
+        self._interpolant = RBFInterpolator(self.scale(xs), np.log(fs + self._floor),
+                                            kernel=self._kernel, smoothing=self._smoothing)
+
+    def __call__(self, xs: np.ndarray) -> np.ndarray:
+        """Returns the emulated errors at the positions xs (one row per position)."""
+        return np.exp(self._interpolant(self.scale(np.atleast_2d(xs)))) - self._floor
+
+
+class SurrogateErrorMeasure(ErrorMeasure):
+    """Error measure that evaluates an RBFSurrogate, so that pints optimisers can search it.
+
+    Arguments:
+        surrogate {RBFSurrogate} -- Fitted emulator.
+        n_parameters {int} -- Number of parameters.
+    """
+    def __init__(self, surrogate: RBFSurrogate, n_parameters: int):
+        super(SurrogateErrorMeasure, self).__init__()
+        self._surrogate = surrogate
+        self._n_parameters = n_parameters
+
+    def n_parameters(self) -> int:
+        return self._n_parameters
+
+    def __call__(self, x) -> float:
+        return float(self._surrogate(x)[0])
+
+
+def _unit_range(values: np.ndarray) -> np.ndarray:
+    """Returns values scaled linearly to the range [0, 1]."""
+    spread = np.ptp(values)
+    return (values - np.min(values)) / spread if spread > 0 else np.zeros_like(values)
+
+
+def run_surrogate(evaluator: Evaluator, boundaries: Boundaries, x0: np.ndarray = None, n_initial: int = None,
+                  max_evaluations: int = 200, sigma0: float = 0.1, min_sigma: float = 1e-5,
+                  n_candidates: int = 200, method: Callable = XNES, transformation: Transformation = None,
+                  seed: int = None) -> Tuple:
+    """Minimises an error with a surrogate-assisted search.
+
+    The error is evaluated on a Latin hypercube design within the boundaries
+    (plus x0). Then every iteration fits an RBFSurrogate to all evaluated
+    errors and evaluates the error at one new position, picked from
+    candidates that are scored on their emulated error and their distance to
+    the evaluated positions (a stochastic RBF search): the minimum of the
+    surrogate, found with a pints optimiser, and random perturbations of the
+    best position with standard deviation sigma (relative to the boundaries).
+    The weight of the emulated error cycles between exploring and exploiting.
+    sigma is halved after repeated failures to improve the best error and
+    doubled after repeated successes, and the search stops once it falls
+    below min_sigma.
+
+    Arguments:
+        evaluator {pints.Evaluator} -- Evaluator of the (expensive) error, e.g. one full PDE
+            solve per position.
+        boundaries {pints.RectangularBoundaries} -- Boundaries of the search.
+
+    Keyword Arguments:
+        x0 {np.ndarray} -- Position added to the initial design. (default: {None})
+        n_initial {int} -- Size of the initial design, 5 * n_parameters if None. (default: {None})
+        max_evaluations {int} -- Maximum number of error evaluations. (default: {200})
+        sigma0 {float} -- Initial relative step size of the perturbations. (default: {0.1})
+        min_sigma {float} -- Stop once the relative step size falls below min_sigma. (default: {1e-5})
+        n_candidates {int} -- Number of random perturbations per iteration. (default: {200})
+        method {Callable} -- pints optimiser that searches the surrogate. (default: {XNES})
+        transformation {pints.Transformation} -- If given, the search (design, surrogate and
+            perturbations) runs in the transformed space, e.g. pints.LogTransformation for
+            parameters whose boundaries span decades. (default: {None})
+        seed {int} -- Seed of the random generator of the initial design and perturbations;
+            the surrogate search uses numpy's global generator. (default: {None})
+
+    Returns:
+        Tuple -- Best parameters, best error, number of error evaluations
+    """
+    if transformation is not None:
+        boundaries = transformation.convert_boundaries(boundaries)
+        x0 = None if x0 is None else transformation.to_search(x0)
+
+    def evaluate(positions):
+        if transformation is not None:
+            positions = [transformation.to_model(x) for x in positions]
+        return np.asarray(evaluator.evaluate(list(positions)), dtype=float)
+
+    n_parameters = boundaries.n_parameters()
+    lower, upper = np.asarray(boundaries.lower()), np.asarray(boundaries.upper())
+    rng = np.random.default_rng(seed)
+    n_initial = n_initial or 5 * n_parameters
+    xs = qmc.scale(qmc.LatinHypercube(d=n_parameters, seed=rng).random(n_initial), lower, upper)
+    if x0 is not None:
+        xs = np.vstack([xs, x0])
+    fs = evaluate(xs)
+    surrogate = RBFSurrogate(boundaries)
+    error = SurrogateErrorMeasure(surrogate, n_parameters)
+
+    weights = [0.3, 0.5, 0.8, 0.95]  # weight of the emulated error in the score of a candidate
+    sigma = sigma0
+    n_successes = n_failures = 0
+    while len(fs) < max_evaluations and sigma >= min_sigma:
+        fs[~np.isfinite(fs)] = np.max(fs[np.isfinite(fs)], initial=1)  # failed solves count as the worst error
+        surrogate.fit(xs, fs)
+        x_best = xs[np.argmin(fs)]
+        search = OptimisationController(error, x_best, sigma0=sigma * (upper - lower),
+                                        boundaries=boundaries, method=method)
+        search.set_log_to_screen(False)
+        search.set_max_unchanged_iterations(20, threshold=1e-12)
+        x_search, _ = search.run()
+        ## perturb a random subset of the coordinates, which follows valleys along the axes
+        steps = sigma * (upper - lower) * rng.standard_normal((n_candidates, n_parameters))
+        mask = rng.random((n_candidates, n_parameters)) < 0.5
+        mask[np.arange(n_candidates), rng.integers(n_parameters, size=n_candidates)] = True
+        perturbations = x_best + steps * mask
+        candidates = np.vstack([x_search, np.clip(perturbations, lower, upper)])
+
+        ## score the candidates on their emulated error and distance, both scaled to [0, 1]
+        emulated = surrogate(candidates)
+        distances = np.min(np.linalg.norm(surrogate.scale(candidates)[:, np.newaxis]
+                                          - surrogate.scale(xs)[np.newaxis], axis=2), axis=1)
+        weight = weights[len(fs) % len(weights)]
+        scores = weight * _unit_range(emulated) + (1 - weight) * (1 - _unit_range(distances))
+        scores[distances < 1e-3 * sigma] = np.inf  # do not evaluate the same position twice
+        x_new = candidates[np.argmin(scores)]
+
+        f_best = np.min(fs)
+        xs = np.vstack([xs, x_new])
+        fs = np.append(fs, evaluate([x_new]))
+        if fs[-1] < f_best - 1e-3 * abs(f_best):
+            n_successes, n_failures = n_successes + 1, 0
+        else:
+            n_successes, n_failures = 0, n_failures + 1
+        if n_successes >= 3:
+            sigma, n_successes = min(2 * sigma, 0.2), 0
+        elif n_failures >= max(8, 2 * n_parameters):
+            sigma, n_failures = sigma / 2, 0
+
+    fs[~np.isfinite(fs)] = np.inf
+    x_best = xs[np.argmin(fs)]
+    if transformation is not None:
+        x_best = transformation.to_model(x_best)
+    return x_best, np.min(fs), len(fs)
+
+
+def optimise_surrogate(problem, boundaries: Boundaries, x0: np.ndarray = None, batched: bool = False,
+                       parallel: bool = False, n_workers: int = None, **kwargs) -> Tuple:
+    """Minimises the sum of squares error of a problem with a surrogate-assisted search (see run_surrogate).
+
+    Arguments:
+        problem {pints.SingleOutputProblem or pints.MultiOutputProblem} -- Problem to fit.
+        boundaries {pints.RectangularBoundaries} -- Boundaries of the search.
+
+    Keyword Arguments:
+        x0 {np.ndarray} -- Position added to the initial design. (default: {None})
+        batched {bool} -- If True, evaluate the initial design with the model's
+            simulate_batch(). (default: {False})
+        parallel {bool} -- If True, evaluate the initial design on a ProcessPoolEvaluator.
+            (default: {False})
+        n_workers {int} -- Number of worker processes, os.cpu_count() if None.
+            (default: {None})
+        kwargs -- Keyword arguments of run_surrogate.
+
+    Returns:
+        Tuple -- Best parameters, best score, number of error evaluations
+    """
+    error = BatchedSumOfSquaresError(problem) if batched else SumOfSquaresError(problem)
+    if not parallel:
+        evaluator = BatchEvaluator(error) if batched else SequentialEvaluator(error)
+        return run_surrogate(evaluator, boundaries, x0=x0, **kwargs)
+
+    with ProcessPoolEvaluator(error, n_workers=n_workers, batched=batched) as evaluator:
+        return run_surrogate(evaluator, boundaries, x0=x0, **kwargs)
@@ -1,4 +1,11 @@
+import numpy as np
 import pints
+from grayscott.population import optimise_population
+from grayscott.surrogate import optimise_surrogate
+from grayscott.gradient import optimise_gradient
+from multifidelity import CoarseToFine
+from grayscott.instrumentation import profiled_model
+from grayscott.sampling import gaussian_log_posterior, residual_sigma, sample_chains
 
 class Inference():
     """
@@ -9,31 +16,183 @@ class Inference():
         model:
             - the model implemented as a Pde_solver class
         times:
-            - the time-points of the obtained values
+            - the time-points of the obtained values (observed_times of a solver
+            with an observation operator)
         values:
-            - the obtained values of the Gray-Scott data
+            - the obtained values of the Gray-Scott data, of shape
+            (len(times), model.n_outputs()), e.g. save_observed of a solver with
+            the same observation operator as the model
     """
     def __init__(self, model, times, values):
         self.problem = pints.MultiOutputProblem(model, times, values)
+        self.profile = None
+        self.diagnostics = None
 
-    def optimise(self):
+    def optimise(self, batched=False, parallel=False, n_workers=None, seed=None, surrogate=False,
+                 max_solves=200, gradient=False, x0=None, coarse_to_fine=None, profiler=None):
         """
         Parameter inference using SNES (Seperable Natural Evolution Strategy).
 
+        Parameters:
+        ---------------
+            batched: bool, default=False
+                - if true, each SNES generation is evaluated with a single call to
+                the model's simulate_batch() (see Solver.solve_batch) instead of
+                one simulate() call per candidate.
+            parallel: bool, default=False
+                - if true, evaluate the candidates of each generation on a pool of
+                worker processes, each holding its own copy of the model.
+            n_workers: int, default=None
+                - number of worker processes if parallel, all cores if None.
+            seed: int, default=None
+                - if given, seed numpy's random generator (used by SNES) so that
+                the optimisation is reproducible.
+            surrogate: bool, default=False
+                - if true, replace SNES by a surrogate-assisted search: an RBF
+                emulator of the sum of squares error is fitted to an initial
+                design of model runs and refit as new runs arrive, and the model
+                is only solved at promising points of the emulator (see
+                grayscott/surrogate.py), searching in log(F) and log(k). batched
+                and parallel then apply to the initial design.
+            max_solves: int, default=200
+                - maximum number of model solves of the surrogate search.
+            gradient: bool, default=False
+                - if true, replace SNES by L-BFGS-B on log(F) and log(k), with the
+                gradient of the sum of squares error from the model's
+                simulateS1() (see grayscott/gradient.py). This converges in tens
+                of solves, but only from a starting point x0 in the valley of
+                the error around the optimum, e.g. a result of a coarser search.
+            x0: list, default=None
+                - starting point, [0.05, 0.05] if None.
+            coarse_to_fine: list of (int, int), default=None
+                - if given, replace SNES by XNES in stages of increasing fidelity
+                (see multifidelity.CoarseToFine), e.g. ((2, 4), (1, 1)): first on a
+                2x coarser grid with 4x fewer time steps, at 1/16 of the cost
+                per solve, then on the full model, starting from the best
+                parameters and search covariance of the coarse stage. The model
+                must be a Solver without observation operator and the values its
+                u frames.
+            profiler: Profiler, default=None
+                - if given, attach it to the model during the optimisation (see
+                grayscott/instrumentation.py) and count the objective evaluations; its
+                summary, with the time per evaluation and the split between the
+                solver phases, the objective and the optimiser, is stored in
+                self.profile afterwards. Not supported if parallel, because the
+                worker processes solve with their own copies of the model.
+
         Returns:
         ---------------
             found_parameters:
                 - found optimal parameters
         """
-        #Define a score function, i.e the sum of squares error
-        score = pints.SumOfSquaresError(self.problem)
+        if profiler is not None and parallel:
+            raise ValueError('Profiling is not supported with parallel=True.')
+        try:
+            with profiled_model(self.problem._model, profiler):
+                return self._optimise(batched, parallel, n_workers, seed, surrogate, max_solves,
+                                      gradient, x0, coarse_to_fine)
+        finally:
+            if profiler is not None:
+                self.profile = profiler.summary()
 
+    def _optimise(self, batched, parallel, n_workers, seed, surrogate, max_solves, gradient, x0,
+                  coarse_to_fine):
+        """optimise() without profiling."""
         #Define the boundaries for F and k according to literature
         boundaries = pints.RectangularBoundaries([0.01, 0.01], [1.0, 1.0])
 
         #Starting point within the boundaries
-        x0 = [0.05, 0.05]
+        if x0 is None:
+            x0 = [0.05, 0.05]
+
+        if seed is not None:
+            np.random.seed(seed)
+
+        if gradient:
+            found_parameters, found_value, n_solves = optimise_gradient(
+                self.problem, x0, boundaries=boundaries, transformation=pints.LogTransformation(2))
+            return found_parameters
+
+        if coarse_to_fine is not None:
+            model = self.problem._model
+            values = self.problem.values().reshape(-1, model.n_x, model.n_y)
+            driver = CoarseToFine(model, values, stages=coarse_to_fine,
+                                  max_iterations=[100] * (len(coarse_to_fine) - 1) + [30],
+                                  boundaries=boundaries, transformation=pints.LogTransformation(2))
+            found_parameters, found_value, history = driver.run(x0)
+            return found_parameters
+
+        if surrogate:
+            found_parameters, found_value, n_solves = optimise_surrogate(
+                self.problem, boundaries, x0=x0, batched=batched, parallel=parallel,
+                n_workers=n_workers, max_evaluations=max_solves, seed=seed,
+                transformation=pints.LogTransformation(2))  # the boundaries span two decades
+            return found_parameters
+
+        if batched or parallel:
+            #Run SNES, scoring whole populations at once
+            optimiser = pints.SNES(x0, boundaries=boundaries)
+            found_parameters, found_value = optimise_population(self.problem, optimiser, batched=batched,
+                                                                parallel=parallel, n_workers=n_workers)
+            return found_parameters
+
+        #Define a score function, i.e the sum of squares error
+        score = pints.SumOfSquaresError(self.problem)
 
         #Run SNES
         found_parameters, found_value = pints.optimise(score, x0, boundaries=boundaries, method=pints.SNES)
-        return found_parameters
\ No newline at end of file
+        return found_parameters
+
+    def sample(self, x0=None, sigma=None, n_chains=4, parallel=False, n_workers=None, seed=None,
+               max_iterations=10000, max_rhat=1.05, min_ess=200, warm_up=0.5):
+        """
+        Bayesian inference of F and k with adaptive covariance MCMC (Haario-Bardenet),
+        with a Gaussian likelihood and a uniform prior on the boundaries of optimise().
+
+        The chains advance in blocks of 100 iterations and stop once R-hat and the
+        effective sample size of every parameter reach max_rhat and min_ess (see
+        grayscott/sampling.py). Repeated positions are not solved again; give the
+        model a ResultCache to also reuse solves between runs.
+
+        Parameters:
+        ---------------
+            x0: list, default=None
+                - starting point of the chains, e.g. the result of optimise(), which
+                saves the chains a long way to the posterior. [0.05, 0.05] if None.
+            sigma: float, default=None
+                - standard deviation of the noise of the values, the root mean square
+                residual at x0 if None.
+            n_chains: int, default=4
+                - number of chains, which start at x0 perturbed by 1%.
+            parallel: bool, default=False
+                - if true, run the chains on a pool of worker processes, each holding
+                its own copy of the model. Results do not depend on parallel.
+            n_workers: int, default=None
+                - number of worker processes if parallel, n_chains if None.
+            seed: int, default=None
+                - if given, the sampling is reproducible.
+            max_iterations: int, default=10000
+                - maximum number of iterations per chain.
+            max_rhat: float, default=1.05
+                - convergence threshold of R-hat.
+            min_ess: float, default=200
+                - required effective sample size (summed over the chains).
+            warm_up: float, default=0.5
+                - fraction of every chain that is discarded.
+
+        Returns:
+        ---------------
+            samples:
+                - samples of F and k after warm-up, of shape (n_chains, n_samples, 2).
+                The diagnostics (iterations, rhat, ess, converged, acceptance rates,
+                number of evaluations) are stored in self.diagnostics.
+        """
+        if x0 is None:
+            x0 = [0.05, 0.05]
+        if sigma is None:
+            sigma = residual_sigma(self.problem, x0)
+        log_posterior = gaussian_log_posterior(self.problem, sigma)
+        chains, self.diagnostics = sample_chains(log_posterior, x0, n_chains=n_chains, parallel=parallel,
+                                                 n_workers=n_workers, max_iterations=max_iterations,
+                                                 max_rhat=max_rhat, min_ess=min_ess, warm_up=warm_up, seed=seed)
+        return chains[:, int(warm_up * chains.shape[1]):]
@@ -1,14 +1,32 @@
 ## PDE solver
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from tqdm import tqdm
-import matplotlib.pylab as plab
-import matplotlib.animation as animation
-from matplotlib.animation import PillowWriter
+import os
+import json
+import hashlib
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 import pints
+from frame_sinks import MemorySink, sink_from_description
+from convergence_monitor import ConvergenceMonitor
+from observations import Observation
+from initial_conditions import initial_state
+from distributed import DistributedStepper, can_start_workers
 
-class Solver(pints.ForwardModel):
+# Plotting (matplotlib), progress bars (tqdm) and the numba kernels are imported on first
+# use, so that processes that only solve (e.g. workers of a pool) start quickly.
+_numba_kernels = None
+
+
+def numba_kernels():
+    """Return the numba_kernels module, importing (and compiling) it on first use."""
+    global _numba_kernels
+    if _numba_kernels is None:
+        import numba_kernels as module
+        _numba_kernels = module
+    return _numba_kernels
+
+
+class Solver(pints.ForwardModelS1):
     """The PDE solver for the Gray-Scott equation and heat equation.
 
     Parameters:
@@ -23,12 +41,123 @@ class Solver(pints.ForwardModel):
             - How many frames (sampled evenly between 0 and n_time_points) to save
             for e.g. plotting purposes
         fix_seed: bool, Default=False
-            - If true, the numpy random seed is fixed. This allows users to recreate
-            exactly the same results each time (because initial conditions contain
-            some random noise).
+            - If true (and seed is None), the initial conditions are generated with
+            seed 0. This allows users to recreate exactly the same results each
+            time (because initial conditions contain some random noise).
+        initial_condition: InitialCondition or str, Default=None
+            - Generator of the initial u and v matrices (see initial_conditions.py),
+            or its name: 'square' (a centred square plus uniform noise, the
+            default), 'spots', 'file' or 'run'. Generated matrices are cached by
+            generator, grid, model and seed, and shared (read-only) between
+            solvers.
+        seed: int, Default=None
+            - Seed of the random generator of the initial conditions. Numpy's
+            global random state is not used.
+        profiler: Profiler, Default=None
+            - If given, solve() times its phases (update steps, diffusion, reaction,
+            convergence metric, frame saving, checkpoints) and counts steps, cell
+            updates, saved frames and an estimate of the copied bytes (see
+            grayscott/instrumentation.py), and calls the callback of the profiler
+            every profiler.every steps. The summary of the profiler is attached as
+            profile after every solve. The batched solve_batch() is not profiled.
+            None adds no overhead.
+        engine: str, 'numpy', 'numba', 'tiled', 'distributed' or 'active', Default='numpy'
+            - Backend used for the update steps in solve(). 'numba' uses a fused,
+            multi-threaded kernel and falls back to 'numpy' (with a warning) if
+            numba is not installed. 'tiled' updates the grid in cache-sized tiles
+            with periodic halos on a thread pool (see update_uv_tiled()), for
+            grids that do not fit in cache. 'distributed' splits the grid into strips
+            of rows over n_workers processes, with the matrices in shared memory
+            (see distributed.py); call close() to stop the worker processes.
+            'active' only applies the full update to tiles with spatial structure
+            (and their neighbours), integrates the reaction ODE on flat tiles and
+            skips tiles at rest (see update_uv_active()), so the cost of a step
+            scales with the area of the pattern; its results differ from the
+            other engines within active_tol per step.
+        tile_size: int, Default=256
+            - Number of rows and columns of a tile of the 'tiled' and 'active'
+            engines. Use small tiles (e.g. 16-32) with the 'active' engine.
+        active_tol: float, Default=1e-6
+            - Tolerance of the 'active' engine: tiles on which the diffusion
+            increment of every cell is below active_tol are updated without
+            diffusion, and tiles on which the whole increment is below it are
+            skipped.
+        active_interval: int, Default=None
+            - Number of time steps between the classifications of the tiles of the
+            'active' engine (which cost a full update step), at most tile_size;
+            tile_size if None.
+        time_block: int, Default=1
+            - Maximum number of time steps the 'tiled' engine advances a tile at
+            once (temporal blocking), using a halo of time_block cells. Steps are
+            only combined between saved frames and sampled convergence steps, so
+            this requires a convergence_interval larger than 1 (or None).
+        n_threads: int, Default=None
+            - Number of threads of the 'tiled' engine, os.cpu_count() if None.
+        n_workers: int, Default=None
+            - Number of worker processes of the 'distributed' engine, os.cpu_count()
+            if None.
+        scheme: str, 'euler' or 'imex-spectral', Default='euler'
+            - Time stepping scheme. 'euler' is the explicit forward difference
+            scheme, which is only stable for dt <~ 1.5 with the hard-coded
+            diffusion coefficients. 'imex-spectral' treats the linear terms
+            (diffusion, feed and decay) implicitly in Fourier space and the uv^2
+            interaction explicitly (IMEX Euler), which allows much larger time
+            steps. The engine only applies to 'euler'.
+        dt: float, Default=1
+            - Time step, the time points are 0, dt, ..., (n_time_points - 1) * dt.
+            With adaptive time stepping this is the initial time step.
+        grid_spacing: float, Default=1
+            - Distance dx = dy between grid points, the grid covers
+            (n_grid - 1) * grid_spacing in both directions. A coarse grid with
+            grid_spacing=2 and half the n_grid covers the same domain with a
+            quarter of the cells (and is stable with a 4x larger dt).
+        adaptive: bool, Default=False
+            - If true, solve() adapts the time step of the scheme with step-doubling
+            error control (one step of size h is compared with two steps of h/2)
+            until t = (n_time_points - 1) * dt. Frames are saved at the same times
+            as without adaptive time stepping. With 'euler' the steps grow beyond
+            dt=1 in slowly evolving regimes; with 'imex-spectral' they can grow
+            much further, at a lower accuracy per step.
+        atol: float, Default=1e-4
+            - Absolute tolerance on the local error per step if adaptive.
+        rtol: float, Default=1e-3
+            - Relative tolerance on the local error per step if adaptive.
+        frame_sink: FrameSink, Default=None
+            - Storage for the saved frames (see frame_sinks.py), which are written
+            to it as soon as they are produced. None keeps them in memory
+            (MemorySink); NpyMemmapSink or HDF5Sink stream them to disk, so the
+            memory use of solve() does not grow with n_save_frames. The output
+            of solve() and simulate() is only read lazily with NpyMemmapSink;
+            HDF5Sink reads all u frames back into memory for it.
+        cache: ResultCache, Default=None
+            - If given, simulate() looks its results up in this cache (see
+            result_cache.py) and only solves on a miss.
+        dtype: numpy dtype, Default=np.float64
+            - Floating point type of the u and v matrices, work arrays and saved
+            frames (and hence of the output of solve() and simulate()). With
+            np.float32 the memory traffic and size of the saved frames are halved;
+            the convergence metric is still accumulated in float64.
+        convergence_interval: int or None, Default=1
+            - Number of time steps between evaluations of the convergence metric
+            (see convergence_monitor.py), which is also how often til_convergence
+            is checked. None disables the metric, so it costs nothing, but then
+            solve() cannot stop at convergence.
+        convergence_norm: str, 'l1', 'l2' or 'max', Default='l1'
+            - Norm of the relative change between time steps.
+        observation: Observation, Default=None
+            - Observation operator (see observations.py), e.g. a downsampling,
+            a random subset of sensors, a radial power spectrum or a selection of
+            frames, that is applied to every saved u frame during solving. The
+            output of solve() and simulate() is then the observations of the
+            observed frames (save_observed, at times observed_times) instead of
+            all u frames, and n_outputs() is the number of observations per frame.
     """
     def __init__(self, n_grid=256, n_time_points=8000, model='gray-scott',
-                n_save_frames=100, fix_seed=False):
+                n_save_frames=100, fix_seed=False, engine='numpy', scheme='euler', dt=1,
+                adaptive=False, atol=1e-4, rtol=1e-3, frame_sink=None, cache=None,
+                dtype=np.float64, convergence_interval=1, convergence_norm='l1', tile_size=256,
+                time_block=1, n_threads=None, n_workers=None, observation=None, grid_spacing=1,
+                initial_condition=None, seed=None, profiler=None, active_tol=1e-6, active_interval=None):
 
         self.solve_eq = model
         self.eps_1 = 0.14  # hard-coded. These values were found to work well with dx=dy=dt=1
@@ -37,43 +166,30 @@ class Solver(pints.ForwardModel):
         ## Create x and y grids
         self.n_x = n_grid
         self.x_start = 0
-        self.x_end = n_grid - 1
+        self.x_end = (n_grid - 1) * grid_spacing
         self.x_arr = np.linspace(self.x_start, self.x_end, self.n_x)
-        self.dx = np.diff(self.x_arr)[0]
+        self.dx = float(np.diff(self.x_arr)[0])  # python floats keep float32 arithmetic in float32
 
         self.n_y= n_grid
         self.y_start = 0
-        self.y_end = n_grid - 1
+        self.y_end = (n_grid - 1) * grid_spacing
         self.y_arr = np.linspace(self.y_start, self.y_end, self.n_y)
-        self.dy = np.diff(self.y_arr)[0]
+        self.dy = float(np.diff(self.y_arr)[0])
 
         ## Create time array for solving (t_arr) and for saving/plotting (save_frames)
-        self.n_times = n_time_points
         self.t_start = 0
-        self.t_end = n_time_points - 1
-        self.t_arr = np.linspace(self.t_start, self.t_end, self.n_times)
-        self.dt = np.diff(self.t_arr)[0]
-        self.n_save_frames = n_save_frames
-        self.save_frames = np.linspace(self.t_start, self.t_end, self.n_save_frames)
-        self.save_frames = np.round(self.save_frames)
+        self.dt = float(dt)
+        self._set_time_points(n_time_points, n_save_frames)
 
-        if fix_seed:  # fix random seed if required
-            np.random.seed(0)
+        if fix_seed and seed is None:  # fix random seed if required
+            seed = 0
 
-        ## Set initial conditions:
-        if model == 'gray-scott':
-            self.u_mat = np.ones((self.n_x, self.n_y))
-        elif model == 'heat':
-            self.u_mat = np.zeros((self.n_x, self.n_y))
-        self.v_mat = np.zeros((self.n_x, self.n_y))
-
-        spat_slice = slice(int(7/16 * self.n_x), int(9/16 * self.n_x))   # create square with initial offset
-        self.u_mat[spat_slice, spat_slice] = 0.5  # standard init values for gray scott model
-        self.v_mat[spat_slice, spat_slice] = 0.25
-        self.u_mat[:, :] += ((np.random.rand(self.n_x, self.n_y) - 0.5) * 0.02)  # add uniform noise
-        self.v_mat[:, :] += ((np.random.rand(self.n_x, self.n_y) - 0.5) * 0.02)
-        self.init_u_mat = self.u_mat.copy()  # save initial values
-        self.init_v_mat = self.v_mat.copy()
+        ## Set initial conditions (read-only, shared with other solvers through the cache):
+        self.initial_condition = 'square' if initial_condition is None else initial_condition
+        self.init_u_mat, self.init_v_mat = initial_state(self.initial_condition, (self.n_x, self.n_y),
+                                                         model=model, seed=seed)
+        self.u_mat = self.init_u_mat.copy()
+        self.v_mat = self.init_v_mat.copy()
 
         if model == 'gray-scott':
             self.interaction = True
@@ -82,6 +198,54 @@ class Solver(pints.ForwardModel):
             self.interaction = False
             self.decay = False
 
+        if engine not in ('numpy', 'numba', 'tiled', 'distributed', 'active'):
+            raise ValueError(f'Unknown engine {engine}, choose numpy, numba, tiled, distributed or active.')
+        if engine == 'numba' and not numba_kernels().HAS_NUMBA:
+            warnings.warn('numba is not installed, falling back to the numpy engine.')
+            engine = 'numpy'
+        self.engine = engine
+        self.tile_size = tile_size
+        self.time_block = time_block
+        self.n_threads = n_threads or os.cpu_count()
+        self._tile_pool = None
+        self.n_workers = n_workers or os.cpu_count()
+        self._stepper = None
+        self.active_tol = active_tol
+        self.active_interval = active_interval or tile_size
+        if self.active_interval > tile_size:
+            raise ValueError('The active_interval cannot exceed the tile_size: in more steps, the '
+                             'pattern can spread past the neighbours of the active tiles.')
+        self._active_state = None
+
+        if scheme not in ('euler', 'imex-spectral'):
+            raise ValueError(f'Unknown scheme {scheme}, choose euler or imex-spectral.')
+        self.scheme = scheme
+        if scheme == 'imex-spectral':
+            self._set_spectral_multipliers()
+        self.adaptive = adaptive
+        self.atol = atol
+        self.rtol = rtol
+        self.dtype = np.dtype(dtype)
+        self._config = dict(n_grid=n_grid, n_time_points=n_time_points, model=model,
+                            n_save_frames=n_save_frames, fix_seed=fix_seed, engine=engine,
+                            scheme=scheme, dt=dt, adaptive=adaptive, atol=atol, rtol=rtol,
+                            dtype=self.dtype.name, convergence_interval=convergence_interval,
+                            convergence_norm=convergence_norm, tile_size=tile_size,
+                            time_block=time_block, n_threads=n_threads, n_workers=n_workers,
+                            grid_spacing=grid_spacing, seed=seed, active_tol=active_tol,
+                            active_interval=active_interval)
+        if convergence_interval is None:
+            self.monitor = None
+        else:
+            self.monitor = ConvergenceMonitor(interval=convergence_interval, norm=convergence_norm)
+        self.frame_sink = MemorySink() if frame_sink is None else frame_sink
+        self.cache = cache
+        if observation is not None:
+            observation = observation.bind((self.n_x, self.n_y), n_save_frames)
+        self.observation = observation
+        self.profiler = profiler
+        self.profile = None
+
         ## convergence paraemtesr, defined in solve()
         self.til_convergence = False
         self.rel_tol = None
@@ -150,8 +314,489 @@ class Solver(pints.ForwardModel):
 
         return new_u_mat, new_v_mat
 
+    def _get_work_arrays(self, shape):
+        """Return the three scratch arrays used by the in-place kernel,
+        (re)allocating them only if the grid shape has changed."""
+        if getattr(self, '_work', None) is None or self._work[0].shape != shape:
+            self._work = [np.empty(shape, dtype=self.dtype) for _ in range(3)]
+        return self._work
+
+    @staticmethod
+    def _periodic_neighbour_sum(old_u, axis, out):
+        """Compute np.roll(old_u, 1, axis) + np.roll(old_u, -1, axis) into out,
+        using slices with periodic halos instead of full-grid rolled copies.
+        The spatial axes are the last two axes, so stacks of grids with shape
+        (n_members, n_x, n_y) are supported as well."""
+        if axis == 0:
+            np.add(old_u[..., :-2, :], old_u[..., 2:, :], out=out[..., 1:-1, :])
+            np.add(old_u[..., -1, :], old_u[..., 1, :], out=out[..., 0, :])
+            np.add(old_u[..., -2, :], old_u[..., 0, :], out=out[..., -1, :])
+        else:
+            np.add(old_u[..., :-2], old_u[..., 2:], out=out[..., 1:-1])
+            np.add(old_u[..., -1], old_u[..., 1], out=out[..., 0])
+            np.add(old_u[..., -2], old_u[..., 0], out=out[..., -1])
+        return out
+
+    def _diffusion_increment_inplace(self, old_u, diff_coef, work):
+        """Write dt * diffusion_update(old_u, diff_coef) into work[0], using
+        work[1] and work[2] as scratch. The floating point operations are
+        performed in the same order as in diffusion_update()."""
+        lap, two_u, lap_y = work
+        self._periodic_neighbour_sum(old_u, axis=0, out=lap)
+        np.multiply(old_u, 2, out=two_u)
+        np.subtract(lap, two_u, out=lap)
+        np.divide(lap, self.dx ** 2, out=lap)
+        self._periodic_neighbour_sum(old_u, axis=1, out=lap_y)
+        np.subtract(lap_y, two_u, out=lap_y)
+        np.divide(lap_y, self.dy ** 2, out=lap_y)
+        np.add(lap, lap_y, out=lap)
+        np.multiply(lap, diff_coef, out=lap)
+        np.multiply(lap, self.dt, out=lap)
+        return lap
+
+    def update_uv_inplace(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=None, k=None):
+        """Allocation-free update step of gray-scott or heat equation.
+
+        Equivalent to update_uv(), but writes the result into the preallocated
+        arrays new_u_mat and new_v_mat (which must not alias the old matrices)
+        and uses three internal scratch arrays instead of creating full-grid
+        temporaries. The results are bit-for-bit identical to update_uv().
+
+        Parameters:
+        ---------------
+            old_u_mat: 2D numpy array
+                - u matrix
+            old_v_mat: 2D numpy array
+                - v matrix
+            new_u_mat: 2D numpy array with size old_u_mat.shape
+                - output array for the updated u matrix
+            new_v_mat: 2D numpy array with size old_v_mat.shape
+                - output array for the updated v matrix
+            F, k: float or numpy array, default=None
+                - parameters of gray-scott model, self.F and self.k if None. Arrays
+                of shape (n_members, 1, 1) can be used to update a stack of u and v
+                matrices with shape (n_members, n_x, n_y) at once.
+
+        Returns:
+        ---------------
+            new_u_mat, new_v_mat: 2D numpy arrays
+                - the output arrays that were passed in
+        """
+        if F is None:
+            F = self.F
+        if k is None:
+            k = self.k
+        work = self._get_work_arrays(old_u_mat.shape)
+        tmp_a, tmp_b = work[0], work[1]
+
+        ## Perform diffusion step:
+        np.add(old_u_mat, self._diffusion_increment_inplace(old_u_mat, self.eps_1, work), out=new_u_mat)
+        np.add(old_v_mat, self._diffusion_increment_inplace(old_v_mat, self.eps_2, work), out=new_v_mat)
+
+        self._reaction_inplace(old_u_mat, old_v_mat, new_u_mat, new_v_mat, F, k, tmp_a, tmp_b)
+        return new_u_mat, new_v_mat
+
+    def _reaction_inplace(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F, k, tmp_a, tmp_b):
+        """Add the interaction and feed/decay increments of the gray-scott model to
+        new_u_mat and new_v_mat, using the scratch arrays tmp_a and tmp_b."""
+        if self.solve_eq == 'gray-scott':  ## IF gray=-scott model, perform other two actions:
+            if self.interaction:
+                np.multiply(old_v_mat, old_v_mat, out=tmp_a)
+                np.multiply(old_u_mat, tmp_a, out=tmp_a)
+                np.multiply(tmp_a, self.dt, out=tmp_b)
+                new_u_mat -= tmp_b
+                new_v_mat += tmp_b
+
+            if self.decay:
+                np.subtract(1, old_u_mat, out=tmp_a)
+                np.multiply(tmp_a, self.dt * F, out=tmp_a)
+                new_u_mat += tmp_a
+                np.multiply(old_v_mat, self.dt * (k + F), out=tmp_a)
+                new_v_mat -= tmp_a
+
+    def _interior_update(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F, k, work):
+        """Update step of the interior cells [1:-1, 1:-1] of (padded) u and v
+        matrices, without periodic boundaries, using the three scratch arrays in
+        work (of the interior shape). The floating point operations are performed
+        in the same order as in update_uv_inplace()."""
+        inner = (Ellipsis, slice(1, -1), slice(1, -1))
+        lap, two_u, lap_y = work
+        for old, new, diff_coef in ((old_u_mat, new_u_mat, self.eps_1), (old_v_mat, new_v_mat, self.eps_2)):
+            np.add(old[..., :-2, 1:-1], old[..., 2:, 1:-1], out=lap)
+            np.multiply(old[inner], 2, out=two_u)
+            np.subtract(lap, two_u, out=lap)
+            np.divide(lap, self.dx ** 2, out=lap)
+            np.add(old[..., 1:-1, :-2], old[..., 1:-1, 2:], out=lap_y)
+            np.subtract(lap_y, two_u, out=lap_y)
+            np.divide(lap_y, self.dy ** 2, out=lap_y)
+            np.add(lap, lap_y, out=lap)
+            np.multiply(lap, diff_coef, out=lap)
+            np.multiply(lap, self.dt, out=lap)
+            np.add(old[inner], lap, out=new[inner])
+        self._reaction_inplace(old_u_mat[inner], old_v_mat[inner], new_u_mat[inner], new_v_mat[inner],
+                               F, k, work[0], work[1])
+
+    @staticmethod
+    def _periodic_window(mat, row_start, row_stop, col_start, col_stop):
+        """Return a copy of mat[..., row_start:row_stop, col_start:col_stop] where
+        indices outside the grid wrap around the periodic boundaries. The window
+        is copied in at most 3 x 3 contiguous blocks instead of by fancy indexing."""
+        def segments(start, stop, n):
+            offset = 0
+            while start < stop:
+                begin = start % n
+                length = min(stop - start, n - begin)
+                yield slice(offset, offset + length), slice(begin, begin + length)
+                offset += length
+                start += length
+
+        window = np.empty(mat.shape[:-2] + (row_stop - row_start, col_stop - col_start), dtype=mat.dtype)
+        for dst_rows, src_rows in segments(row_start, row_stop, mat.shape[-2]):
+            for dst_cols, src_cols in segments(col_start, col_stop, mat.shape[-1]):
+                window[..., dst_rows, dst_cols] = mat[..., src_rows, src_cols]
+        return window
+
+    def _update_tile(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, rows, cols, n_steps, F, k):
+        """Advance the tile [rows, cols] of the u and v matrices by n_steps time
+        steps and write it into new_u_mat and new_v_mat. The tile is copied with a
+        periodic halo of n_steps cells; every step updates the interior of the
+        previous step's valid region, so the halo shrinks by one cell per step."""
+        u = self._periodic_window(old_u_mat, rows.start - n_steps, rows.stop + n_steps,
+                                  cols.start - n_steps, cols.stop + n_steps)
+        v = self._periodic_window(old_v_mat, rows.start - n_steps, rows.stop + n_steps,
+                                  cols.start - n_steps, cols.stop + n_steps)
+        u_new, v_new = np.empty_like(u), np.empty_like(v)
+        n_rows, n_cols = u.shape[-2:]
+        work = [np.empty(u.shape[:-2] + (n_rows - 2, n_cols - 2), dtype=u.dtype) for _ in range(3)]
+        for i_step in range(n_steps):
+            n_shrink = n_rows - 2 * (i_step + 1), n_cols - 2 * (i_step + 1)
+            region = (Ellipsis, slice(i_step, i_step + n_shrink[0] + 2),
+                      slice(i_step, i_step + n_shrink[1] + 2))
+            self._interior_update(u[region], v[region], u_new[region], v_new[region], F, k,
+                                  [arr[..., :n_shrink[0], :n_shrink[1]] for arr in work])
+            u, u_new = u_new, u
+            v, v_new = v_new, v
+        new_u_mat[..., rows, cols] = u[..., n_steps:-n_steps, n_steps:-n_steps]
+        new_v_mat[..., rows, cols] = v[..., n_steps:-n_steps, n_steps:-n_steps]
+
+    def update_uv_tiled(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=None, k=None, n_steps=1):
+        """Cache-blocked update of gray-scott or heat equation by n_steps time steps.
+
+        The grid is split into tiles of tile_size x tile_size cells, which are
+        updated independently (on a thread pool of n_threads threads), so the
+        working set of each update stays in cache. With n_steps > 1 each tile is
+        advanced n_steps time steps before it is written back (temporal
+        blocking), at the cost of recomputing a halo of n_steps cells. The
+        results are bit-for-bit identical to n_steps calls of update_uv_inplace().
+        Arguments as in update_uv_inplace(); stacks of grids are supported.
+        """
+        if F is None:
+            F = self.F
+        if k is None:
+            k = self.k
+        n_x, n_y = old_u_mat.shape[-2:]
+        assert n_steps <= min(n_x, n_y), 'the halo of a tile cannot exceed the grid size'
+        tiles = [(slice(row, min(row + self.tile_size, n_x)), slice(col, min(col + self.tile_size, n_y)))
+                 for row in range(0, n_x, self.tile_size) for col in range(0, n_y, self.tile_size)]
+
+        def update_tile(tile):
+            self._update_tile(old_u_mat, old_v_mat, new_u_mat, new_v_mat, tile[0], tile[1], n_steps, F, k)
+
+        self._map_tiles(update_tile, tiles)
+        return new_u_mat, new_v_mat
+
+    def _map_tiles(self, function, tiles):
+        """Call function on every tile, on the thread pool of the tiled engine if
+        n_threads > 1."""
+        if self.n_threads == 1 or len(tiles) <= 1:
+            for tile in tiles:
+                function(tile)
+        else:
+            if self._tile_pool is None:
+                self._tile_pool = ThreadPoolExecutor(self.n_threads)
+            list(self._tile_pool.map(function, tiles))
+
+    def _classify_tiles(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F, k):
+        """Full update step of the 'active' engine, which also sorts the tiles into
+        active tiles (with a diffusion increment above active_tol somewhere, and
+        their periodic neighbours), flat tiles (which only need the reaction ODE)
+        and tiles at rest (with no increment above active_tol)."""
+        state = self._active_state
+        change, diffusion = state['scratch']
+        work = self._get_work_arrays(old_u_mat.shape)
+        ## The update of update_uv_inplace(), keeping the size of the diffusion increments
+        increment = self._diffusion_increment_inplace(old_u_mat, self.eps_1, work)
+        np.add(old_u_mat, increment, out=new_u_mat)
+        np.abs(increment, out=diffusion)
+        increment = self._diffusion_increment_inplace(old_v_mat, self.eps_2, work)
+        np.add(old_v_mat, increment, out=new_v_mat)
+        np.abs(increment, out=change)
+        diffusion += change
+        self._reaction_inplace(old_u_mat, old_v_mat, new_u_mat, new_v_mat, F, k, work[0], work[1])
+        diffusion_max = np.maximum.reduceat(np.maximum.reduceat(diffusion, state['rows'], axis=0),
+                                            state['cols'], axis=1)
+        np.subtract(new_u_mat, old_u_mat, out=change)
+        np.abs(change, out=change)
+        np.subtract(new_v_mat, old_v_mat, out=diffusion)
+        np.abs(diffusion, out=diffusion)
+        change += diffusion
+        change_max = np.maximum.reduceat(np.maximum.reduceat(change, state['rows'], axis=0),
+                                         state['cols'], axis=1)
+        active = diffusion_max > self.active_tol
+        dilated = active.copy()  # the pattern spreads at most one tile until the next classification
+        for shift in (-1, 1):
+            dilated |= np.roll(active, shift, axis=0)
+        for shift in (-1, 1):
+            dilated |= np.roll(dilated, shift, axis=1)
+        flat = ~dilated & (change_max > self.active_tol)
+        state['n_active'] = int(np.sum(dilated))
+        state['active'] = self._tile_runs(dilated)
+        state['flat'] = self._tile_runs(flat)
+        state['resting'] = self._tile_runs(~dilated & ~flat)
+        state['synced'] = set()
+
+    def _tile_runs(self, mask):
+        """Rectangles (pairs of slices) that cover the tiles in the boolean (n_tile_rows,
+        n_tile_cols) mask, merging runs of neighbouring tiles in a row of tiles, so
+        that large regions are updated with few calls."""
+        n_x, n_y = self._active_state['shape']
+        runs = []
+        for i_row, row in enumerate(mask):
+            edges = np.flatnonzero(np.diff(np.concatenate([[False], row, [False]]).astype(int)))
+            for start, stop in zip(edges[::2], edges[1::2]):
+                runs.append((slice(i_row * self.tile_size, min((i_row + 1) * self.tile_size, n_x)),
+                             slice(start * self.tile_size, min(stop * self.tile_size, n_y))))
+        return runs
+
+    def update_uv_active(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=None, k=None):
+        """Update step of gray-scott or heat equation that only does the work where
+        the solution has structure (the 'active' engine).
+
+        Every active_interval steps, a full update step sorts the tiles of
+        tile_size x tile_size cells into active, flat and resting tiles (see
+        _classify_tiles()). Until the next classification, active tiles are
+        updated with a periodic halo of one cell (as in update_uv_tiled()),
+        flat tiles with the reaction terms only (the homogeneous ODE of every
+        cell), and resting tiles are copied once and then left alone, because
+        both buffers hold the same values. The error per step is at most about
+        active_tol per cell. Arguments as in update_uv_inplace(), for a single grid.
+        """
+        if F is None:
+            F = self.F
+        if k is None:
+            k = self.k
+        state = self._active_state
+        buffers = (id(old_u_mat), id(new_u_mat))
+        if state is None or state['shape'] != old_u_mat.shape or sorted(buffers) != state['buffers']:
+            rows, cols = np.arange(0, old_u_mat.shape[0], self.tile_size), np.arange(0, old_u_mat.shape[1], self.tile_size)
+            state = self._active_state = dict(
+                shape=old_u_mat.shape, buffers=sorted(buffers), step=0, rows=rows, cols=cols,
+                scratch=[np.empty(old_u_mat.shape, dtype=old_u_mat.dtype) for _ in range(2)])
+        if state['step'] % self.active_interval == 0:
+            self._classify_tiles(old_u_mat, old_v_mat, new_u_mat, new_v_mat, F, k)
+        else:
+            def update_tile(tile):
+                self._update_tile(old_u_mat, old_v_mat, new_u_mat, new_v_mat, tile[0], tile[1], 1, F, k)
+
+            def update_flat_tile(tile):
+                new_u_mat[tile] = old_u_mat[tile]
+                new_v_mat[tile] = old_v_mat[tile]
+                self._reaction_inplace(old_u_mat[tile], old_v_mat[tile], new_u_mat[tile], new_v_mat[tile],
+                                       F, k, state['scratch'][0][tile], state['scratch'][1][tile])
+
+            self._map_tiles(update_tile, state['active'])
+            self._map_tiles(update_flat_tile, state['flat'])
+            for tile in state['resting']:
+                key = (tile[0].start, tile[1].start)
+                if key not in state['synced']:
+                    new_u_mat[tile] = old_u_mat[tile]
+                    new_v_mat[tile] = old_v_mat[tile]
+                    state['synced'].add(key)
+        state['step'] += 1
+        return new_u_mat, new_v_mat
+
+    def _use_distributed(self):
+        """Return True if update steps run on the distributed engine. Inside
+        daemonic processes, which cannot start workers, the solver falls back
+        to the numpy engine (with a warning)."""
+        if self.engine != 'distributed' or self.scheme != 'euler':
+            return False
+        if self._stepper is None and not can_start_workers():
+            warnings.warn('The distributed engine cannot start worker processes from a daemonic '
+                          'process, falling back to the numpy engine.')
+            self.engine = 'numpy'
+            return False
+        return True
+
+    def _get_stepper(self):
+        """Return the DistributedStepper of the 'distributed' engine, starting its
+        worker processes on first use or if the grid has changed."""
+        stepper = self._stepper
+        if stepper is None or stepper.shape != (self.n_x, self.n_y) or stepper.dtype != self.dtype:
+            if stepper is not None:
+                stepper.close()
+            self._stepper = DistributedStepper(self, self.n_workers)
+        return self._stepper
+
+    def close(self):
+        """Stop the worker processes of the 'distributed' engine and the threads of
+        the 'tiled' engine. They are restarted if the solver is used again."""
+        if self._stepper is not None:
+            self._stepper.close()
+            self._stepper = None
+        if self._tile_pool is not None:
+            self._tile_pool.shutdown()
+            self._tile_pool = None
+
+    def __getstate__(self):
+        """Pickle without the thread pool of the tiled engine and the worker
+        processes of the distributed engine (e.g. for worker processes)."""
+        state = self.__dict__.copy()
+        state['_tile_pool'] = None
+        state['_stepper'] = None
+        state['_active_state'] = None
+        return state
+
+    def _set_spectral_multipliers(self):
+        """Precompute the Fourier symbol of the laplacian for the implicit step.
+
+        The eigenvalues of the periodic central difference laplacian (the modified
+        wavenumbers of diffusion_update()) are used rather than -|k|^2, so that
+        both schemes discretise the same semi-discrete system in space.
+        """
+        freq_x = 2 * np.pi * np.fft.fftfreq(self.n_x)
+        freq_y = 2 * np.pi * np.fft.rfftfreq(self.n_y)
+        self._lap_symbol = ((2 * np.cos(freq_x)[:, np.newaxis] - 2) / self.dx ** 2
+                            + (2 * np.cos(freq_y)[np.newaxis, :] - 2) / self.dy ** 2)
+        self._implicit_cache = None
+
+    def _implicit_multipliers(self, F, k):
+        """Return the Fourier multipliers 1 / (1 - dt * L) of the implicit step of u
+        and v, where L is the linear part (diffusion, and feed/decay for the
+        gray-scott model) of their right hand side."""
+        cache = self._implicit_cache
+        if cache is not None and cache[0] is F and cache[1] is k and cache[2] == self.dt:
+            return cache[3:]
+        linear_u = self.eps_1 * self._lap_symbol
+        linear_v = self.eps_2 * self._lap_symbol
+        if self.solve_eq == 'gray-scott' and self.decay:
+            linear_u = linear_u - np.asarray(F)
+            linear_v = linear_v - (np.asarray(k) + np.asarray(F))
+        implicit_u = (1 / (1 - self.dt * linear_u)).astype(self.dtype)
+        implicit_v = (1 / (1 - self.dt * linear_v)).astype(self.dtype)
+        self._implicit_cache = (F, k, self.dt, implicit_u, implicit_v)
+        return implicit_u, implicit_v
+
+    def update_uv_imex(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=None, k=None):
+        """IMEX Euler update step of gray-scott or heat equation.
+
+        The nonlinear interaction term and the constant feed are integrated
+        explicitly. The linear terms (diffusion, and the -F * u and -(F + k) * v
+        decay) are then solved implicitly by a division in Fourier space, which
+        fits the periodic boundary conditions. Arguments as in update_uv_inplace();
+        stacks of grids (with F and k of shape (n_members, 1, 1)) are supported.
+        """
+        if F is None:
+            F = self.F
+        if k is None:
+            k = self.k
+        implicit_u, implicit_v = self._implicit_multipliers(F, k)
+        rhs_u = old_u_mat.copy()
+        rhs_v = old_v_mat.copy()
+
+        if self.solve_eq == 'gray-scott':  ## IF gray=-scott model, perform other two actions:
+            if self.interaction:
+                uvv = self.dt * (old_u_mat * old_v_mat * old_v_mat)
+                rhs_u -= uvv
+                rhs_v += uvv
+
+            if self.decay:
+                rhs_u += self.dt * F
+
+        grid_shape = old_u_mat.shape[-2:]
+        new_u_mat[...] = np.fft.irfft2(np.fft.rfft2(rhs_u) * implicit_u, s=grid_shape)
+        new_v_mat[...] = np.fft.irfft2(np.fft.rfft2(rhs_v) * implicit_v, s=grid_shape)
+        return new_u_mat, new_v_mat
+
+    def advance_uv(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=None, k=None):
+        """Perform one in-place update step with the selected engine, writing the
+        updated u and v matrices into new_u_mat and new_v_mat. See
+        update_uv_inplace() for the (optional) F and k arguments."""
+        if F is None:
+            F = self.F
+        if k is None:
+            k = self.k
+        if self.scheme == 'imex-spectral':
+            self.update_uv_imex(old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=F, k=k)
+        elif self.engine == 'numba':
+            grid_shape = (-1,) + old_u_mat.shape[-2:]  # view 2D grids as a stack of one
+            stacks = [mat.reshape(grid_shape) for mat in (old_u_mat, old_v_mat, new_u_mat, new_v_mat)]
+            F_arr = np.broadcast_to(F, (stacks[0].shape[0], 1, 1))
+            k_arr = np.broadcast_to(k, (stacks[0].shape[0], 1, 1))
+            kernels = numba_kernels()
+            for i_m, (old_u, old_v, new_u, new_v) in enumerate(zip(*stacks)):
+                kernels.fused_update_uv(old_u, old_v, new_u, new_v,
+                                *self._fused_arguments(F_arr[i_m, 0, 0], k_arr[i_m, 0, 0]))
+        elif self.engine == 'tiled':
+            self.update_uv_tiled(old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=F, k=k)
+        elif self.engine == 'active' and old_u_mat.ndim == 2:
+            self.update_uv_active(old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=F, k=k)
+        elif self._use_distributed():
+            grid_shape = (-1,) + old_u_mat.shape[-2:]  # view 2D grids as a stack of one
+            stacks = [mat.reshape(grid_shape) for mat in (old_u_mat, old_v_mat, new_u_mat, new_v_mat)]
+            F_arr = np.broadcast_to(F, (stacks[0].shape[0], 1, 1))
+            k_arr = np.broadcast_to(k, (stacks[0].shape[0], 1, 1))
+            for i_m, (old_u, old_v, new_u, new_v) in enumerate(zip(*stacks)):
+                self._get_stepper().step(old_u, old_v, new_u, new_v, float(F_arr[i_m, 0, 0]),
+                                         float(k_arr[i_m, 0, 0]), self.dt)
+        else:
+            self.update_uv_inplace(old_u_mat, old_v_mat, new_u_mat, new_v_mat, F=F, k=k)
+        return new_u_mat, new_v_mat
+
+    def _fused_arguments(self, F, k):
+        """Scalar arguments (after the four matrices) of the numba kernels."""
+        gray_scott = self.solve_eq == 'gray-scott'
+        return (float(self.dt), float(self.dx), float(self.dy), self.eps_1, self.eps_2,
+                float(F), float(k), gray_scott and self.interaction, gray_scott and self.decay)
+
+    def _relative_change(self, old_u, new_u, old_v, new_v, axis=None):
+        """Convergence metric of one step in the norm of the monitor, computed in the
+        scratch arrays, e.g. for the L1 norm:
+        sum|new_u - old_u| / sum|old_u| + sum|new_v - old_v| / sum|old_v|
+        For stacks of grids, use axis=(-2, -1) to get one value per member."""
+        return self.monitor.measure(old_u, new_u, old_v, new_v,
+                                    work=self._get_work_arrays(old_u.shape)[:2], axis=axis)
+
+    def advance_uv_monitored(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat):
+        """advance_uv() for a single grid that also returns the convergence metric of
+        the step. The numba engine accumulates the norms inside its update kernel,
+        the distributed engine reduces the norms of the strips of its workers,
+        the other engines measure them from the old and new matrices."""
+        if self.engine == 'numba' and self.scheme == 'euler':
+            if getattr(self, '_row_stats', None) is None or len(self._row_stats) != self.n_x:
+                self._row_stats = np.empty((self.n_x, 4))
+            numba_kernels().fused_update_uv_monitored(old_u_mat, old_v_mat, new_u_mat, new_v_mat,
+                                                      *self._fused_arguments(self.F, self.k),
+                                                      self.monitor.norm_code, self._row_stats)
+            return self.monitor.from_row_stats(self._row_stats)
+        if self._use_distributed():
+            return self._get_stepper().step(old_u_mat, old_v_mat, new_u_mat, new_v_mat, self.F, self.k,
+                                            self.dt, monitor=self.monitor)
+        self.advance_uv(old_u_mat, old_v_mat, new_u_mat, new_v_mat)
+        return self._relative_change(old_u=old_u_mat, new_u=new_u_mat, old_v=old_v_mat, new_v=new_v_mat)
+
+    def _set_time_points(self, n_time_points, n_save_frames):
+        """Set the time array for solving (t_arr) and the time step indices of the saved
+        frames (save_frames). A converged or adaptive solve() shortens these arrays."""
+        self.n_times = n_time_points
+        self.t_end = (n_time_points - 1) * self.dt
+        self.t_arr = np.linspace(self.t_start, self.t_end, self.n_times)
+        self.n_save_frames = n_save_frames
+        self.save_frames = np.linspace(0, self.n_times - 1, self.n_save_frames)  # time step indices
+        self.save_frames = np.round(self.save_frames)
+
     def solve(self, parameters, til_convergence=False, rel_tol=1e-4, verbose=False,
-                init=True):
+                init=True, checkpoint_path=None, checkpoint_every=1000):
         """Solving function for PDE.
 
         Arguments:
@@ -171,24 +816,42 @@ class Solver(pints.ForwardModel):
                 - if true, print info and progress bar during solving.
             init: bool, default=True
                 - if true, re-initialise u and v mat.
+            checkpoint_path: str, default=None
+                - if given, write a checkpoint (see save_checkpoint()) to this file every
+                checkpoint_every time steps, from which Solver.resume() can continue.
+            checkpoint_every: int, default=1000
+                - number of time steps between checkpoints
         Returns:
         ----------------
             save_u_mat: float of len (n_save_frames * n_x * n_y)
                 - Returns all save u matrices, collapsed to 1 dimension
         """
 
+        if self.profiler is not None and not self.profiler.active:
+            with self.profiler.attached(self):
+                output = self.solve(parameters, til_convergence=til_convergence, rel_tol=rel_tol,
+                                    verbose=verbose, init=init, checkpoint_path=checkpoint_path,
+                                    checkpoint_every=checkpoint_every)
+            self.profile = self.profiler.summary()
+            return output
+
         assert len(parameters) == 2
-        self.F = parameters[0]  # find F and k from input
-        self.k = parameters[1]
+        self.F = float(parameters[0])  # find F and k from input
+        self.k = float(parameters[1])
+        ## Undo the shortening of the time points by an earlier converged or adaptive solve
+        self._set_time_points(self._config['n_time_points'], self._config['n_save_frames'])
         if verbose:
             print(f'Solving {self.solve_eq} model in {self.n_times} time steps.\n\n')
 
-        ## Create matrices to save frames during solving at regular intervals
-        self.save_u_mat = np.zeros((self.n_save_frames, self.n_x, self.n_y))
-        self.save_v_mat = np.zeros((self.n_save_frames, self.n_x, self.n_y))
+        ## Open frame sink to save frames during solving at regular intervals
+        self.frame_sink.open(self.n_save_frames, (self.n_x, self.n_y), dtype=self.dtype)
+        self._open_observations()
         self.save_times = np.zeros(self.n_save_frames)
         self.i_save = 0
-        self.convergence = np.zeros((self.n_times))
+        if til_convergence and self.monitor is None:
+            raise ValueError('til_convergence requires a convergence_interval.')
+        if self.monitor is not None:
+            self.monitor.reset()
         if til_convergence:
             self.til_convergence = til_convergence
             self.convergence_reached = False
@@ -196,132 +859,664 @@ class Solver(pints.ForwardModel):
         if init:
             self.u_mat = self.init_u_mat
             self.v_mat = self.init_v_mat
+        ## Double buffering: the solver owns two pairs of matrices and swaps them
+        ## every step, so no full-grid arrays are allocated inside the loop.
+        self.u_mat = np.array(self.u_mat, dtype=self.dtype)
+        self.v_mat = np.array(self.v_mat, dtype=self.dtype)
+        if self.adaptive:
+            if checkpoint_path is not None:
+                raise ValueError('Checkpointing is not supported with adaptive time stepping.')
+            self._solve_adaptive(til_convergence=til_convergence, rel_tol=rel_tol, verbose=verbose)
+            return self._finish_frames()
+        return self._time_loop(start_step=0, til_convergence=til_convergence, rel_tol=rel_tol,
+                               verbose=verbose, checkpoint_path=checkpoint_path,
+                               checkpoint_every=checkpoint_every)
+
+    def _time_loop(self, start_step, til_convergence, rel_tol, verbose, checkpoint_path=None,
+                   checkpoint_every=1000):
+        """Fixed time step loop of solve(), starting at time step start_step."""
+        self._active_state = None  # new buffers: the active engine starts with a classification
+        if self._use_distributed():
+            ## solve in the shared buffers of the workers, so no data is copied per step
+            stepper = self._get_stepper()
+            stepper.u[0][...] = self.u_mat
+            stepper.v[0][...] = self.v_mat
+            self.u_mat, u_next = stepper.u
+            self.v_mat, v_next = stepper.v
+        else:
+            u_next = np.empty_like(self.u_mat)
+            v_next = np.empty_like(self.v_mat)
         ## Forward difference time solving loop:
-        def forward_diff(i_t):
+        def forward_diff(i_t, n_steps=1):
+            nonlocal u_next, v_next
             if i_t in self.save_frames:  # if at the save interval, save matrices
-                self.save_u_mat[self.i_save, :, :] = self.u_mat.copy()
-                self.save_v_mat[self.i_save, :, :] = self.v_mat.copy()
-                self.save_times[self.i_save] = i_t
+                self._write_frame(self.i_save)
+                self.save_times[self.i_save] = self.t_arr[i_t]
                 self.i_save += 1
-            old_u = self.u_mat.copy()
-            old_v = self.v_mat.copy()
-            self.u_mat, self.v_mat = self.update_uv(old_u_mat=old_u, old_v_mat=old_v)  # do update
-            self.convergence[i_t] = ((np.sum(np.abs(self.u_mat - old_u)) / np.sum(np.abs(old_u)))
-                                    + (np.sum(np.abs(self.v_mat - old_v)) / np.sum(np.abs(old_v))))
-            if til_convergence:
-                if self.convergence[i_t] < rel_tol: ## reached convergence
+            if self.monitor is not None and self.monitor.due(i_t):  # do update and sample convergence
+                change = self.monitor.record(i_t, self.advance_uv_monitored(self.u_mat, self.v_mat,
+                                                                            u_next, v_next))
+            elif n_steps > 1:  # temporal blocking of the tiled engine
+                change = None
+                self.update_uv_tiled(self.u_mat, self.v_mat, u_next, v_next, n_steps=n_steps)
+            else:
+                change = None
+                self.advance_uv(old_u_mat=self.u_mat, old_v_mat=self.v_mat,
+                                new_u_mat=u_next, new_v_mat=v_next)  # do update
+            self.u_mat, u_next = u_next, self.u_mat  # swap buffers
+            self.v_mat, v_next = v_next, self.v_mat
+            if til_convergence and change is not None:
+                if change < rel_tol: ## reached convergence
                     if verbose:
                         print(f'Convergence reached after {i_tau}/{self.n_times} time points')
                     self.convergence_reached = True
-                    self.save_u_mat[self.i_save, :, :] = self.u_mat.copy()
-                    self.save_v_mat[self.i_save, :, :] = self.v_mat.copy()
-                    self.save_times[self.i_save] = i_t
-                    self.save_u_mat = self.save_u_mat[:self.i_save, :, :]
-                    self.save_v_mat = self.save_v_mat[:self.i_save, :, :]
+                    if self.i_save < self.n_save_frames:  # keep the converged state as the last frame
+                        self._write_frame(self.i_save)
+                        self.save_times[self.i_save] = self.t_arr[i_t]
+                        self.i_save += 1
+                    self._truncate_frames(self.i_save)
                     self.save_times = self.save_times[:self.i_save]
                     self.n_save_frames = len(self.save_times)
                     self.n_times = i_t + 1
-                    self.t_end = i_t
-                    self.t_arr = np.linspace(self.t_start, self.t_end, self.n_times)
-                    self.convergence = self.convergence[:i_t+1]
+                    self.t_end = self.t_arr[i_t]
+                    self.t_arr = self.t_arr[:i_t+1]
                     return True
                 else:
                     return False
             else:
                 return False
         if verbose:  # show progress bar
-            for i_tau in tqdm(range(self.n_times)):
-                conv = forward_diff(i_t=i_tau)
-                if conv:
-                    break
-        elif not verbose:  # do not show progress bar
-            for i_tau in range(self.n_times):
-                conv = forward_diff(i_t=i_tau)
-                if conv:
+            from tqdm import tqdm
+            progress = tqdm(total=self.n_times, initial=start_step)
+        if checkpoint_path is None:
+            checkpoint_every = None
+        profiler = self.profiler
+        i_tau = start_step
+        while i_tau < self.n_times:
+            n_steps = self._n_blocked_steps(i_tau, checkpoint_every)
+            conv = forward_diff(i_t=i_tau, n_steps=n_steps)
+            if profiler is not None:
+                profiler.step(self, i_tau, n_steps)
+            if verbose:
+                progress.update(n_steps)
+            if conv:
+                break
+            i_tau += n_steps
+            if checkpoint_every is not None and i_tau % checkpoint_every == 0:
+                self.save_checkpoint(checkpoint_path, next_step=i_tau,
+                                     til_convergence=til_convergence, rel_tol=rel_tol)
+        if verbose:
+            progress.close()
+        if self._stepper is not None and self._stepper._buffer_index(self.u_mat, self.v_mat) is not None:
+            self.u_mat = self.u_mat.copy()  # detach the result from the shared buffers
+            self.v_mat = self.v_mat.copy()
+
+        self._write_frame(self.n_save_frames - 1)
+        self._finish_convergence()
+
+        return self._finish_frames()
+
+    def _open_observations(self):
+        """Allocate the observations of the saved frames, if there is an observation operator."""
+        if self.observation is None:
+            return
+        self.observed = np.zeros((self.n_save_frames, self.observation.n_values()), dtype=self.dtype)
+        self._observe_mask = np.zeros(self.n_save_frames, dtype=bool)
+        self._observe_mask[self.observation.observed_frames(self.n_save_frames)] = True
+
+    def _write_frame(self, i_frame):
+        """Save the current u and v matrices as frame i_frame, and the observations
+        of u if the frame is observed."""
+        self.frame_sink.write(i_frame, self.u_mat, self.v_mat)
+        if self.observation is not None and self._observe_mask[i_frame]:
+            self.observed[i_frame] = self.observation(self.u_mat)
+
+    def _truncate_frames(self, n_frames):
+        """Keep only the first n_frames saved frames (and their observations)."""
+        self.frame_sink.truncate(n_frames)
+        if self.observation is not None:
+            self.observed = self.observed[:n_frames]
+
+    def _n_blocked_steps(self, i_t, checkpoint_every=None):
+        """Number of time steps, starting at step i_t, that the tiled engine can
+        combine per tile: at most time_block, and never past a saved frame, a
+        sampled convergence step or a checkpoint. 1 for the other engines."""
+        if self.engine != 'tiled' or self.scheme != 'euler' or self.time_block == 1:
+            return 1
+        if self.monitor is not None and self.monitor.due(i_t):
+            return 1
+        stop = min(self.n_times, i_t + self.time_block, i_t + self.n_x, i_t + self.n_y)
+        later_frames = self.save_frames[self.save_frames > i_t]
+        if len(later_frames) > 0:
+            stop = min(stop, int(later_frames[0]))
+        if self.monitor is not None:
+            stop = min(stop, i_t + self.monitor.interval - i_t % self.monitor.interval)
+        if checkpoint_every is not None:
+            stop = min(stop, (i_t // checkpoint_every + 1) * checkpoint_every)
+        return stop - i_t
+
+    def _finish_convergence(self):
+        """Expose the history of the convergence monitor: convergence holds the
+        relative change of the sampled time steps in convergence_steps."""
+        if self.monitor is None:
+            self.convergence_steps, self.convergence = np.zeros(0, dtype=int), np.zeros(0)
+        else:
+            self.convergence_steps, self.convergence = self.monitor.history()
+
+    def save_checkpoint(self, path, next_step, til_convergence=False, rel_tol=1e-4):
+        """Save the state of a running solve() to a binary .npz file.
+
+        The checkpoint holds the solver configuration, the initial and current u
+        and v matrices, the next time step, F and k, the sampled convergence
+        history so far. Random numbers are only drawn for the initial conditions,
+        which the checkpoint stores, so it holds no random state. Frames saved so
+        far are only copied into the checkpoint for a MemorySink; disk sinks
+        (NpyMemmapSink, HDF5Sink) are flushed and the checkpoint refers to their
+        files, so its size does not grow with the number of frames. The
+        file is written to a temporary file first and then renamed, so an
+        interrupted write never corrupts an existing checkpoint.
+
+        Parameters:
+        ---------------
+            path: str
+                - file name of the checkpoint
+            next_step: int
+                - index of the first time step that has not been computed yet
+        """
+        self._finish_convergence()
+        if self.frame_sink.persistent:
+            self.frame_sink.flush()
+            frames_u = frames_v = np.zeros(0)
+        else:
+            frames_u = np.asarray(self.frame_sink.u[:self.i_save])
+            frames_v = np.asarray(self.frame_sink.v[:self.i_save])
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as checkpoint_file:
+            np.savez(checkpoint_file, config=json.dumps(self._config), next_step=next_step,
+                     frame_sink=json.dumps(self.frame_sink.describe()),
+                     F=self.F, k=self.k, u_mat=self.u_mat, v_mat=self.v_mat,
+                     init_u_mat=self.init_u_mat, init_v_mat=self.init_v_mat,
+                     n_times=self.n_times, n_save_frames=self.n_save_frames,
+                     save_frames=self.save_frames, t_arr=self.t_arr, i_save=self.i_save,
+                     save_times=self.save_times, frames_u=frames_u, frames_v=frames_v,
+                     convergence=self.convergence, convergence_steps=self.convergence_steps,
+                     til_convergence=til_convergence, rel_tol=rel_tol)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def resume(cls, path, frame_sink=None, verbose=False, checkpoint_every=None, observation=None):
+        """Resume a solve() from a checkpoint written by save_checkpoint().
+
+        The solver is rebuilt from the configuration in the checkpoint and solving
+        continues at the saved time step, which gives the same result as an
+        uninterrupted run. If checkpoint_every is given, the resumed run keeps
+        writing checkpoints to the same path.
+
+        Parameters:
+        ---------------
+            path: str
+                - file name of the checkpoint
+            frame_sink: FrameSink, default=None
+                - frame sink of the resumed solver. If None, the sink of the
+                checkpointed run is used (for disk sinks, its files are reopened
+                and keep the frames saved before the checkpoint). Otherwise these
+                frames are copied to frame_sink, one frame at a time.
+            verbose: bool, default=False
+                - if true, show progress bar during solving.
+            checkpoint_every: int, default=None
+                - if given, continue writing checkpoints every checkpoint_every steps
+            observation: Observation, default=None
+                - observation operator of the resumed solver (the operator is not
+                stored in the checkpoint); the observations of the frames saved
+                before the checkpoint are recomputed from these frames
+
+        Returns:
+        ---------------
+            solver: Solver
+                - the solver after finishing the run, with results in save_u_mat etc.
+        """
+        with np.load(path) as checkpoint:
+            solver = cls(frame_sink=frame_sink, observation=observation,
+                         **json.loads(str(checkpoint['config'])))
+            solver.init_u_mat = checkpoint['init_u_mat']
+            solver.init_v_mat = checkpoint['init_v_mat']
+            solver.u_mat = checkpoint['u_mat'].astype(solver.dtype)
+            solver.v_mat = checkpoint['v_mat'].astype(solver.dtype)
+            solver.F = float(checkpoint['F'])
+            solver.k = float(checkpoint['k'])
+            solver.n_times = int(checkpoint['n_times'])
+            solver.n_save_frames = int(checkpoint['n_save_frames'])
+            solver.save_frames = checkpoint['save_frames']
+            solver.t_arr = checkpoint['t_arr']
+            solver.t_end = solver.t_arr[-1]
+            solver.i_save = int(checkpoint['i_save'])
+            solver.save_times = checkpoint['save_times']
+            frame_shape = (solver.n_x, solver.n_y)
+            saved_sink = json.loads(str(checkpoint['frame_sink']))
+            if saved_sink['sink'] == 'MemorySink':
+                saved_u, saved_v = checkpoint['frames_u'], checkpoint['frames_v']
+            else:  # the frames are still in the files of the checkpointed run
+                if frame_sink is not None and frame_sink.describe() == saved_sink:
+                    source = frame_sink
+                else:
+                    source = sink_from_description(saved_sink)
+                source.reopen(solver.n_save_frames, frame_shape, dtype=solver.dtype)
+                if frame_sink is None:
+                    solver.frame_sink = source
+                saved_u, saved_v = source.u, source.v
+            if solver.frame_sink.u is not saved_u:
+                solver.frame_sink.open(solver.n_save_frames, frame_shape, dtype=solver.dtype)
+                for i_frame in range(solver.i_save):
+                    solver.frame_sink.write(i_frame, saved_u[i_frame], saved_v[i_frame])
+                if saved_sink['sink'] != 'MemorySink':
+                    source.close()
+            solver._open_observations()
+            if observation is not None:
+                for i_frame in np.flatnonzero(solver._observe_mask[:solver.i_save]):
+                    solver.observed[i_frame] = observation(solver.frame_sink.u[i_frame])
+            next_step = int(checkpoint['next_step'])
+            if solver.monitor is not None:
+                solver.monitor.steps = list(checkpoint['convergence_steps'])
+                solver.monitor.values = list(checkpoint['convergence'])
+            til_convergence = bool(checkpoint['til_convergence'])
+            rel_tol = float(checkpoint['rel_tol'])
+            if til_convergence:
+                solver.til_convergence = til_convergence
+                solver.convergence_reached = False
+                solver.rel_tol = rel_tol
+
+        solver._time_loop(start_step=next_step, til_convergence=til_convergence, rel_tol=rel_tol,
+                          verbose=verbose, checkpoint_path=path if checkpoint_every else None,
+                          checkpoint_every=checkpoint_every)
+        return solver
+
+    def warm_start(self, path):
+        """Use the current u and v matrices stored in a checkpoint as the initial
+        conditions of this solver, e.g. to start a parameter sweep from a nearby
+        converged pattern instead of the noisy square.
+
+        Parameters:
+        ---------------
+            path: str
+                - file name of a checkpoint written by save_checkpoint()
+        """
+        with np.load(path) as checkpoint:
+            assert checkpoint['u_mat'].shape == (self.n_x, self.n_y)
+            self.init_u_mat = checkpoint['u_mat']
+            self.init_v_mat = checkpoint['v_mat']
+        self.u_mat = self.init_u_mat.copy()
+        self.v_mat = self.init_v_mat.copy()
+
+    def _finish_frames(self):
+        """Flush the frame sink, expose its frames as save_u_mat and save_v_mat and
+        return the u frames (or their observations) collapsed to 1 dimension."""
+        self.frame_sink.flush()
+        self.save_u_mat = self.frame_sink.u
+        self.save_v_mat = self.frame_sink.v
+        if self.observation is not None:
+            observed_frames = self.observation.observed_frames(self.n_save_frames)
+            self.save_observed = self.observed[observed_frames]
+            self.observed_times = self.save_times[observed_frames]
+            return self.save_observed.reshape(-1)
+        self.observed_times = self.save_times
+        return self.frame_sink.flat_u()  # only return u for parameter inference
+
+    def _solve_adaptive(self, til_convergence, rel_tol, verbose):
+        """Adaptive time loop of solve(), using step-doubling error control.
+
+        Each trial step of size h is computed once with a full step and once with
+        two half steps. The half step result is kept if the scaled RMS difference
+        between the two (an estimate of the local error) is at most 1, and the
+        next step size is chosen from the error estimate. Steps are shortened to
+        land exactly on the output times of the saved frames.
+
+        After solving, step_sizes holds the accepted step sizes, t_arr the start
+        time of every accepted step, convergence the relative change per unit
+        time step dt of the sampled accepted steps (with their indices in
+        convergence_steps), and n_rhs_evals the number of update
+        steps (right hand side evaluations) that were performed.
+        """
+        dt_initial = self.dt
+        output_times = self.save_frames * dt_initial
+        t_now = self.t_start
+        h_next = dt_initial
+        step_sizes, step_times = [], []
+        self.n_rhs_evals = 0
+        u_full, v_full = np.empty_like(self.u_mat), np.empty_like(self.v_mat)
+        u_half, v_half = np.empty_like(self.u_mat), np.empty_like(self.v_mat)
+        u_new, v_new = np.empty_like(self.u_mat), np.empty_like(self.v_mat)
+        try:
+            while True:
+                while self.i_save < self.n_save_frames and output_times[self.i_save] <= t_now:
+                    self._write_frame(self.i_save)  # save frames at output times
+                    self.save_times[self.i_save] = output_times[self.i_save]
+                    self.i_save += 1
+                if self.i_save == self.n_save_frames:
                     break
+                t_target = output_times[self.i_save]
+                h = min(h_next, t_target - t_now)  # align steps with the next output time
+
+                self.dt = h
+                self.advance_uv(self.u_mat, self.v_mat, u_full, v_full)
+                self.dt = h / 2
+                self.advance_uv(self.u_mat, self.v_mat, u_half, v_half)
+                self.advance_uv(u_half, v_half, u_new, v_new)
+                self.n_rhs_evals += 3
+
+                scale_u = self.atol + self.rtol * np.maximum(np.abs(self.u_mat), np.abs(u_new))
+                scale_v = self.atol + self.rtol * np.maximum(np.abs(self.v_mat), np.abs(v_new))
+                error = np.sqrt((np.mean(((u_new - u_full) / scale_u) ** 2)
+                                 + np.mean(((v_new - v_full) / scale_v) ** 2)) / 2)
+                if not np.isfinite(error):
+                    error = np.inf
+                factor = 0.9 / np.sqrt(error) if error > 0 else 5
+                h_proposed = h * min(5, max(0.2, factor))
+                if error > 1:  # reject step and retry with a smaller step size
+                    h_next = h_proposed
+                    continue
+                if h == h_next:  # only grow steps that were not shortened for an output time
+                    h_next = h_proposed
+
+                step_sizes.append(h)
+                step_times.append(t_now)
+                if self.profiler is not None:
+                    self.profiler.step(self, len(step_sizes) - 1)
+                change = None
+                if self.monitor is not None and self.monitor.due(len(step_sizes) - 1):
+                    change = self.monitor.record(len(step_sizes) - 1, self._relative_change(
+                        old_u=self.u_mat, new_u=u_new, old_v=self.v_mat, new_v=v_new) * dt_initial / h)
+                t_now = t_target if h == t_target - t_now else t_now + h
+                self.u_mat, u_new = u_new, self.u_mat
+                self.v_mat, v_new = v_new, self.v_mat
 
-        self.save_u_mat[-1, :, :] = self.u_mat.copy()
-        self.save_v_mat[-1, :, :] = self.v_mat.copy()
+                if til_convergence and change is not None and change < rel_tol:  ## reached convergence
+                    if verbose:
+                        print(f'Convergence reached at t={t_now} after {len(step_sizes)} steps')
+                    self.convergence_reached = True
+                    self._write_frame(self.i_save)
+                    self.save_times[self.i_save] = t_now
+                    self._truncate_frames(self.i_save + 1)
+                    self.save_times = self.save_times[:self.i_save + 1]
+                    self.n_save_frames = len(self.save_times)
+                    self.t_end = t_now
+                    break
+        finally:
+            self.dt = dt_initial
 
-        return self.save_u_mat.reshape(-1)  # only return u for parameter inference
+        self.step_sizes = np.array(step_sizes)
+        self.t_arr = np.array(step_times)
+        self._finish_convergence()
+        self.n_times = len(self.step_sizes)
+        if verbose:
+            print(f'{self.n_times} adaptive steps, {self.n_rhs_evals} update evaluations.')
 
     def plot2d(self, save_figures=False):
-        """Function to plot u and v matrix at their current state.
+        """Function to plot u and v matrix at their current state (see plotting.plot2d).
 
         Arguments:
         --------------
             save_figures: bool, default = False
                 - If true, save figure as png file
         """
-        filename_uv = f'u_matrix_F={self.F}_k={self.k}.png'  # define file name to save to
-        plt.rcParams['figure.figsize'] = (12, 5)
-        plt.subplot(121)  # plot u matrix
-        plt.pcolor(self.u_mat, cmap=plt.cm.RdBu)
-        plt.xlabel('u_1'); plt.ylabel('u_2'); plt.title(f'u matrix, F={self.F}, k={self.k} after {self.n_times} iterations')
-        plt.colorbar()
-        plt.subplot(122) # plot v matrix
-        plt.pcolor(self.v_mat, cmap=plt.cm.RdBu)
-        plt.xlabel('v_1'); plt.ylabel('v_2'); plt.title(f'v matrix, F={self.F}, k={self.k} after {self.n_times} iterations')
-        plt.colorbar()
-        if save_figures:
-            plt.savefig(filename_uv, dpi=200)
-
-    def animation(self, save_animation=True):
-        """Function to create animation of evolution u matrix using the saved frames.
+        from plotting import plot2d  # matplotlib is only imported when plotting
+        plot2d(self, save_figures=save_figures)
+
+    def animation(self, save_animation=True, file_name=None, fps=20, scale=None):
+        """Function to create animation of evolution u matrix using the saved frames
+        (see plotting.animate_frames).
 
         Argumetns:
         -----------------
             save_animation: bool
-                - If true, save animation to gif file
+                - If true, save animation to gif file (or mp4, see file_name)
+            file_name: str, default=None
+                - file to save to (.gif or .mp4), u_matrix_F={F}_k={k}.gif if None
+            fps: float, default=20
+                - frames per second
+            scale: int, default=None
+                - pixels per grid cell of the saved animation, at least 512 pixels wide if None
+
+        Returns:
+        -----------------
+            anim: matplotlib.animation.FuncAnimation
+                - the animation, if save_animation is False
         """
-        fig = plab.figure()
-        plt.rcParams['figure.figsize'] = (10, 10)
-        plab.pcolormesh(self.u_mat, cmap=plab.cm.RdBu)
-
-        def animate(i):
-            """Plotting function for animation"""
-            if i < self.save_u_mat.shape[0]:
-                plab.pcolormesh(np.squeeze(self.save_u_mat[i, :, :]), cmap=plab.cm.RdBu)
-
-        anim = animation.FuncAnimation(fig, animate, frames=range(self.save_u_mat.shape[0]), blit=False)
-        writer = PillowWriter(fps=20)
-        filename_an = f'u_matrix_F={self.F}_k={self.k}.gif'
-        plab.xlabel('u_1')
-        plab.ylabel('u_2')
-        plab.title(f'u matrix, F={self.F}, k={self.k} after {self.n_times} iterations.')
-        if save_animation:
-            anim.save(filename_an, writer=writer)
+        from plotting import animate_frames
+        return animate_frames(self, save_animation=save_animation, file_name=file_name, fps=fps, scale=scale)
 
     def plot_convergence(self, save_convergence=False):
-        """Function to plot convergence of matrices.
+        """Function to plot convergence of matrices (see plotting.plot_convergence).
 
         Arguments:
         -----------------
             save_convergence: bool
                 - If true, save convergence plot to file
         """
-        plt.rcParams['figure.figsize'] = (9, 5)
-        plt.plot(self.t_arr, self.convergence, linewidth=2, label='Difference')
-        if self.til_convergence:
-            plt.hlines(y=self.rel_tol, xmin=self.t_arr[0], xmax=self.t_arr[-1], label='convergence criterion')
-        plt.xlabel('Time t'); plt.ylabel('Sum of absolute differences U and V \n between t and t+1')
-        plt.grid(True); plt.yscale('log');
-        plt.title('Convergence plot')
-        plt.legend()
-
-        if save_convergence:
-            file_name = f'convergence_ F={self.F}, k={self.k} after {self.n_times} iterations.png'
-            plt.savefig(file_name)
+        from plotting import plot_convergence
+        plot_convergence(self, save_convergence=save_convergence)
 
     def n_outputs(self):
-        """Returns number of outputs."""
+        """Returns number of outputs (per observed frame)."""
+        if self.observation is not None:
+            return self.observation.n_values()
         return (self.n_x * self.n_y)
 
     def n_parameters(self):
         """Returns number of parameters for inference (F and K)"""
         return 2
 
+    def init_hash(self):
+        """Returns a sha256 hash of the initial u and v matrices. The hash is
+        recomputed only when init_u_mat or init_v_mat are replaced (not when they
+        are modified in place)."""
+        arrays_id = (id(self.init_u_mat), id(self.init_v_mat))
+        if getattr(self, '_init_hash', (None,))[0] != arrays_id:
+            init_hash = hashlib.sha256()
+            for init_mat in (self.init_u_mat, self.init_v_mat):
+                init_hash.update(np.ascontiguousarray(init_mat).tobytes())
+            self._init_hash = (arrays_id, init_hash.hexdigest())
+        return self._init_hash[1]
+
     def simulate(self, parameters, times):
         """Wraps the solve function inside simulate to be compatible with pints"""
+        if self.cache is not None:
+            key = self.cache.key(self, parameters)
+            value = self.cache.get(key)
+            if value is None:
+                value = self.cache.put(key, self.solve(parameters))
+            return value
         value = self.solve(parameters)
         return value
+
+
+    def _sensitivity_step(self, u_mat, v_mat, sens_u, sens_v, new_sens_u, new_sens_v, work):
+        """Advance the sensitivities of u and v to F and k over one update step from
+        u_mat and v_mat (the tangent-linear model of update_uv_inplace()).
+
+        Parameters:
+        ---------------
+            u_mat, v_mat: 2D numpy arrays
+                - u and v matrices at the start of the step
+            sens_u, sens_v: numpy arrays of shape (2, n_x, n_y)
+                - derivatives of u_mat and v_mat with respect to F (first) and k (second)
+            new_sens_u, new_sens_v: numpy arrays of shape (2, n_x, n_y)
+                - output arrays for the sensitivities after the step
+            work: list of 3 numpy arrays of shape (2, n_x, n_y)
+                - scratch arrays
+        """
+        np.add(sens_u, self._diffusion_increment_inplace(sens_u, self.eps_1, work), out=new_sens_u)
+        np.add(sens_v, self._diffusion_increment_inplace(sens_v, self.eps_2, work), out=new_sens_v)
+        if self.solve_eq == 'gray-scott':
+            if self.interaction:  # d(u v^2) = v^2 du + 2 u v dv
+                d_uvv = self.dt * (v_mat * v_mat * sens_u + 2 * u_mat * v_mat * sens_v)
+                new_sens_u -= d_uvv
+                new_sens_v += d_uvv
+            if self.decay:  # d(F (1 - u)) = (1 - u) dF - F du, d((k + F) v) = v (dF + dk) + (k + F) dv
+                new_sens_u -= self.dt * self.F * sens_u
+                new_sens_u[0] += self.dt * (1 - u_mat)
+                new_sens_v -= self.dt * (self.k + self.F) * sens_v
+                new_sens_v -= self.dt * v_mat
+
+    def simulateS1(self, parameters, times):
+        """Solve the PDE and return the output of simulate() together with its
+        derivatives with respect to F and k, for pints' evaluateS1() (e.g. gradient
+        based optimisers and HMC samplers).
+
+        The derivatives are forward sensitivities: the tangent-linear model of the
+        explicit Euler step is advanced alongside the solution, which costs about
+        two extra update steps per time step and no storage of past states. The
+        frame sink, cache and convergence monitor are not used.
+
+        Returns:
+        ---------------
+            output: np array
+                - output of simulate(), of length n_observed_frames * n_outputs()
+            sensitivities: np array of shape (n_observed_frames, n_outputs(), 2)
+                - derivatives of the output with respect to F and k
+        """
+        if self.scheme != 'euler' or self.adaptive:
+            raise ValueError('Sensitivities are only implemented for the fixed step euler scheme.')
+        if self.profiler is not None and not self.profiler.active:
+            with self.profiler.attached(self):
+                result = type(self).simulateS1(self, parameters, times)  # not a wrapper on the instance
+            self.profile = self.profiler.summary()
+            return result
+        assert len(parameters) == 2
+        self.F = float(parameters[0])
+        self.k = float(parameters[1])
+        observation = self.observation
+        if observation is None:
+            observation = Observation().bind((self.n_x, self.n_y), self.n_save_frames)
+        observed_frames = observation.observed_frames(self.n_save_frames)
+        observe_mask = np.zeros(self.n_save_frames, dtype=bool)
+        observe_mask[observed_frames] = True
+        output = np.zeros((self.n_save_frames, observation.n_values()), dtype=self.dtype)
+        sensitivities = np.zeros((self.n_save_frames, observation.n_values(), 2))
+
+        u_mat = np.array(self.init_u_mat, dtype=self.dtype)
+        v_mat = np.array(self.init_v_mat, dtype=self.dtype)
+        u_next, v_next = np.empty_like(u_mat), np.empty_like(v_mat)
+        sens_u, sens_v = np.zeros((2,) + u_mat.shape), np.zeros((2,) + u_mat.shape)
+        sens_u_next, sens_v_next = np.empty_like(sens_u), np.empty_like(sens_v)
+        work = [np.empty_like(sens_u) for _ in range(3)]
+
+        def observe(i_frame):
+            if observe_mask[i_frame]:
+                output[i_frame] = observation(u_mat)
+                for i_parameter in range(2):
+                    sensitivities[i_frame, :, i_parameter] = observation.derivative(u_mat, sens_u[i_parameter])
+
+        profiler = self.profiler
+        i_save = 0
+        for i_t in range(self.n_times):
+            if i_t in self.save_frames:
+                observe(i_save)
+                i_save += 1
+            self._sensitivity_step(u_mat, v_mat, sens_u, sens_v, sens_u_next, sens_v_next, work)
+            self.advance_uv(u_mat, v_mat, u_next, v_next)
+            if profiler is not None:
+                profiler.step(self, i_t)
+            u_mat, u_next = u_next, u_mat
+            v_mat, v_next = v_next, v_mat
+            sens_u, sens_u_next = sens_u_next, sens_u
+            sens_v, sens_v_next = sens_v_next, sens_v
+        observe(self.n_save_frames - 1)  # like solve(), the last frame holds the final state
+        self.u_mat, self.v_mat = u_mat, v_mat
+        return output[observed_frames].reshape(-1), sensitivities[observed_frames]
+
+    def solve_batch(self, parameters, til_convergence=False, rel_tol=1e-4):
+        """Solve the PDE for many parameter sets at once.
+
+        The u and v matrices of all members are stacked into arrays of shape
+        (n_members, n_x, n_y) and advanced together in a single time loop, with
+        F and k broadcast per member. All members start from the initial
+        conditions of this solver. Without til_convergence, each member gives
+        exactly the same result as solve() would for its parameters.
+
+        Arguments:
+        ----------------
+            parameters: np array of shape (n_members, 2)
+                - F and k of each member
+            til_convergence: bool, default=False
+                - if true, a member is frozen once its relative change < rel_tol.
+                Its remaining save frames are filled with its converged state, so
+                all members keep the same output size.
+            rel_tol: float, default=1e-4
+                - relative tolerance level that determines stopping criterion
+
+        Returns:
+        ----------------
+            batch_save_u_mat: np array of shape (n_members, n_save_frames * n_x * n_y)
+                - saved u matrices of each member, collapsed to 1 dimension (or,
+                with an observation operator, the observations of the observed
+                frames in batch_save_observed, which are computed from the
+                saved frames after solving)
+        """
+        if self.adaptive:
+            raise ValueError('solve_batch() does not support adaptive time stepping.')
+        if til_convergence and self.monitor is None:
+            raise ValueError('til_convergence requires a convergence_interval.')
+        parameters = np.asarray(parameters, dtype=float)
+        assert parameters.ndim == 2 and parameters.shape[1] == 2
+        n_members = parameters.shape[0]
+        F = parameters[:, 0].reshape(-1, 1, 1).astype(self.dtype)
+        k = parameters[:, 1].reshape(-1, 1, 1).astype(self.dtype)
+
+        grid_shape = (n_members, self.n_x, self.n_y)
+        u_mat = np.empty(grid_shape, dtype=self.dtype)
+        v_mat = np.empty(grid_shape, dtype=self.dtype)
+        u_mat[...] = self.init_u_mat
+        v_mat[...] = self.init_v_mat
+        u_next = np.empty_like(u_mat)
+        v_next = np.empty_like(v_mat)
+        final_u_mat = np.empty(grid_shape, dtype=self.dtype)
+        final_v_mat = np.empty(grid_shape, dtype=self.dtype)
+        frames_shape = (n_members, self.n_save_frames, self.n_x, self.n_y)
+        self.batch_save_u_mat = np.zeros(frames_shape, dtype=self.dtype)
+        self.batch_save_v_mat = np.zeros(frames_shape, dtype=self.dtype)
+        self.batch_n_times = np.full(n_members, self.n_times)  # time points until convergence
+
+        active = np.arange(n_members)  # members that are still being updated
+        i_save = 0
+        for i_t in range(self.n_times):
+            if i_t in self.save_frames:
+                self.batch_save_u_mat[active, i_save] = u_mat
+                self.batch_save_v_mat[active, i_save] = v_mat
+                i_save += 1
+            self.advance_uv(u_mat, v_mat, u_next, v_next, F=F, k=k)
+            u_mat, u_next = u_next, u_mat
+            v_mat, v_next = v_next, v_mat
+            if til_convergence and self.monitor.due(i_t):
+                converged = self._relative_change(old_u=u_next, new_u=u_mat, old_v=v_next,
+                                                  new_v=v_mat, axis=(-2, -1)) < rel_tol
+                if np.any(converged):  # freeze converged members and drop them from the stack
+                    done = active[converged]
+                    final_u_mat[done] = u_mat[converged]
+                    final_v_mat[done] = v_mat[converged]
+                    self.batch_save_u_mat[done, i_save:] = u_mat[converged, np.newaxis]
+                    self.batch_save_v_mat[done, i_save:] = v_mat[converged, np.newaxis]
+                    self.batch_n_times[done] = i_t + 1
+                    keep = ~converged
+                    active = active[keep]
+                    u_mat, v_mat, u_next, v_next = u_mat[keep], v_mat[keep], u_next[keep], v_next[keep]
+                    F, k = F[keep], k[keep]
+                    if len(active) == 0:
+                        break
+
+        final_u_mat[active] = u_mat
+        final_v_mat[active] = v_mat
+        self.batch_save_u_mat[:, -1] = final_u_mat
+        self.batch_save_v_mat[:, -1] = final_v_mat
+        self.batch_u_mat = final_u_mat
+        self.batch_v_mat = final_v_mat
+
+        if self.observation is not None:
+            observed_frames = self.observation.observed_frames(self.n_save_frames)
+            self.batch_save_observed = np.array([[self.observation(frames[i_frame]) for i_frame in observed_frames]
+                                                 for frames in self.batch_save_u_mat], dtype=self.dtype)
+            return self.batch_save_observed.reshape(n_members, -1)
+        return self.batch_save_u_mat.reshape(n_members, -1)
+
+    def simulate_batch(self, parameters, times):
+        """Batched version of simulate(), returns one row of outputs per parameter set."""
+        return self.solve_batch(parameters)
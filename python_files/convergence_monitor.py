@@ -0,0 +1,120 @@
+## Convergence monitoring of the time loops of Solver
+import numpy as np
+
+
+class ConvergenceMonitor():
+    """Relative change of u and v between time steps, sampled every interval steps.
+
+    The relative change of a step is
+        |new_u - old_u| / |old_u| + |new_v - old_v| / |old_v|
+    in the chosen norm. It is only computed on the sampled steps, and can either
+    be measured from the matrices (measure()) or assembled from the per-row
+    norms that the fused numba kernel accumulates while updating
+    (from_row_stats()), which needs no extra pass over memory. The sampled
+    steps and values are kept in steps and values.
+
+    Parameters:
+    ---------------
+        interval: int, default=1
+            - number of time steps between samples
+        norm: str, 'l1', 'l2' or 'max', default='l1'
+            - norm of the change and of the old matrices
+    """
+    norms = ('l1', 'l2', 'max')
+
+    def __init__(self, interval=1, norm='l1'):
+        if int(interval) < 1:
+            raise ValueError(f'The convergence interval must be at least 1, got {interval}.')
+        if norm not in self.norms:
+            raise ValueError(f'Unknown convergence norm {norm}, choose l1, l2 or max.')
+        self.interval = int(interval)
+        self.norm = norm
+        self.norm_code = self.norms.index(norm)  # norm argument of fused_update_uv_monitored()
+        self.reset()
+
+    def reset(self):
+        """Clear the history of sampled steps and values."""
+        self.steps = []
+        self.values = []
+
+    def due(self, i_t):
+        """Return True if time step i_t is sampled."""
+        return i_t % self.interval == 0
+
+    def record(self, i_t, value):
+        """Add the relative change value of time step i_t to the history."""
+        self.steps.append(i_t)
+        self.values.append(value)
+        return value
+
+    @staticmethod
+    def _sum_of_squares(mat, axis):
+        """Sum of squares of mat (over the last two axes if axis is given), in one
+        read-only pass and accumulated in float64."""
+        if axis is None:
+            flat = mat.reshape(-1)
+            return np.einsum('i,i->', flat, flat, dtype=np.float64)
+        return np.einsum('...ij,...ij->...', mat, mat, dtype=np.float64)
+
+    @staticmethod
+    def _max_abs(mat, axis):
+        """Maximum absolute value of mat, from read-only max and min reductions."""
+        return np.maximum(np.max(mat, axis=axis), -np.min(mat, axis=axis)).astype(np.float64)
+
+    def _norms(self, old, new, work, axis):
+        """Norms of new - old and of old in the norm of the monitor (sums of squares
+        for the L2 norm). new - old is written to work[0], and |old| to work[1] for
+        the L1 norm."""
+        tmp_a, tmp_b = work
+        np.subtract(new, old, out=tmp_a)
+        if self.norm == 'l2':
+            return self._sum_of_squares(tmp_a, axis), self._sum_of_squares(old, axis)
+        if self.norm == 'max':
+            return self._max_abs(tmp_a, axis), self._max_abs(old, axis)
+        np.abs(tmp_a, out=tmp_a)
+        np.abs(old, out=tmp_b)
+        return np.sum(tmp_a, axis=axis, dtype=np.float64), np.sum(tmp_b, axis=axis, dtype=np.float64)
+
+    def measure(self, old_u, new_u, old_v, new_v, work, axis=None):
+        """Relative change of one step, computed in the two scratch arrays work.
+        For stacks of grids, use axis=(-2, -1) to get one value per member.
+
+        Unlike the fused numba kernel, this reads the old and new matrices again
+        after the update: one pass writing new - old and, per field, two read-only
+        reductions (L2, max) or two more passes and two reductions (L1). numpy
+        cannot fold the reduction into the update without changing its rounding,
+        so sampling (interval > 1) is what keeps the cost down on this path."""
+        change = 0
+        for old, new in ((old_u, new_u), (old_v, new_v)):
+            diff_norm, old_norm = self._norms(old, new, work, axis)
+            if self.norm == 'l2':
+                change += np.sqrt(diff_norm / old_norm)
+            else:
+                change += diff_norm / old_norm
+        return change
+
+    def partial_norms(self, old_u, new_u, old_v, new_v, work):
+        """Norms of |new_u - old_u|, |old_u|, |new_v - old_v| and |old_v| of part of
+        the grid (e.g. the strip of one worker process), as one row of the
+        row_stats of from_row_stats(). With the L2 norm the sums of squares are
+        returned, so partial norms of several parts can be combined."""
+        stats = []
+        for old, new in ((old_u, new_u), (old_v, new_v)):
+            stats.extend(float(norm) for norm in self._norms(old, new, work, None))
+        return stats
+
+    def from_row_stats(self, row_stats):
+        """Relative change of one step from the per-row norms of |new_u - old_u|,
+        |old_u|, |new_v - old_v| and |old_v| (columns of row_stats), as written
+        by fused_update_uv_monitored()."""
+        if self.norm == 'max':
+            stats = np.max(row_stats, axis=0)
+        else:
+            stats = np.sum(row_stats, axis=0)
+            if self.norm == 'l2':
+                stats = np.sqrt(stats)
+        return stats[0] / stats[1] + stats[2] / stats[3]
+
+    def history(self):
+        """Return the sampled time steps and relative changes as numpy arrays."""
+        return np.array(self.steps, dtype=int), np.array(self.values, dtype=np.float64)
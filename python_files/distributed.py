@@ -0,0 +1,183 @@
+## Domain-decomposed update steps on worker processes with grids in shared memory
+import copy
+import multiprocessing
+import threading
+import weakref
+from multiprocessing import shared_memory
+import numpy as np
+
+STEP = 0  # commands of the control block
+STOP = 1
+
+## Workers are spawned rather than forked: forking a process that has already run
+## multi-threaded code (e.g. the numba engine) can deadlock the children.
+_context = multiprocessing.get_context('spawn')
+
+
+def _attach(shm, shape, dtype):
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _worker_loop(solver, i_worker, rows, names, shape, dtype, barrier):
+    """Main loop of a worker process: wait for the start barrier, update the strip
+    rows of the grid and (if requested) compute its partial convergence norms,
+    then wait for the end barrier."""
+    blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    u_buffers, v_buffers = _attach(blocks[0], (2,) + shape, dtype), _attach(blocks[1], (2,) + shape, dtype)
+    control = _attach(blocks[2], (6,), np.float64)
+    stats = _attach(blocks[3], (barrier.parties - 1, 4), np.float64)
+    try:
+        while True:
+            barrier.wait()
+            if control[0] == STOP:
+                break
+            src = int(control[1])
+            dst = 1 - src
+            solver.dt = float(control[4])
+            F, k = float(control[2]), float(control[3])
+            for col in range(0, shape[1], solver.tile_size):
+                ## the halo rows of the strip are read from the strips of the neighbouring workers
+                solver._update_tile(u_buffers[src], v_buffers[src], u_buffers[dst], v_buffers[dst],
+                                    rows, slice(col, min(col + solver.tile_size, shape[1])), 1, F, k)
+            if control[5] > 0:
+                work = solver._get_work_arrays((rows.stop - rows.start, shape[1]))[:2]
+                stats[i_worker] = solver.monitor.partial_norms(
+                    u_buffers[src][rows], u_buffers[dst][rows], v_buffers[src][rows],
+                    v_buffers[dst][rows], work)
+            barrier.wait()
+    except threading.BrokenBarrierError:
+        pass
+    except BaseException:
+        barrier.abort()  # wake up the main process instead of leaving it waiting
+        raise
+    finally:
+        del u_buffers, v_buffers, control, stats
+        for block in blocks:
+            block.close()
+
+
+def _shutdown(processes, blocks, barrier, control):
+    """Stop the workers and release the shared memory (also called at exit)."""
+    if control is not None and all(process.is_alive() for process in processes):
+        control[0] = STOP
+        try:
+            barrier.wait(timeout=10)
+        except threading.BrokenBarrierError:
+            pass
+    for process in processes:
+        process.join(timeout=10)
+        if process.is_alive():
+            process.terminate()
+    for block in blocks:
+        try:
+            block.close()
+        except BufferError:  # still viewed by arrays, the mapping is released with them
+            pass
+        block.unlink()
+
+
+def can_start_workers():
+    """Return False inside daemonic processes (e.g. the workers of a
+    multiprocessing.Pool), which are not allowed to start worker processes."""
+    return not multiprocessing.current_process().daemon
+
+
+class DistributedStepper():
+    """Update steps of a Solver, with the grid split into strips of rows over
+    worker processes.
+
+    The u and v matrices live in two pairs of buffers in shared memory
+    (multiprocessing.shared_memory), so the workers read the one-cell halos of
+    their strip directly from the strips of their neighbours, which keeps the
+    periodic boundaries. Every step is bracketed by two barriers. The partial
+    convergence norms of the strips are reduced in the main process. Workers
+    update their strip in tiles (see Solver._update_tile()), so results are
+    bit-for-bit identical to the numpy engine.
+
+    Parameters:
+    ---------------
+        solver: Solver
+            - solver whose update step is distributed (a copy, without its
+            frames, cache and matrices, is sent to every worker)
+        n_workers: int
+            - number of worker processes, at most the number of grid rows
+    """
+    def __init__(self, solver, n_workers):
+        if not can_start_workers():
+            raise RuntimeError('The distributed engine cannot start worker processes from a '
+                               'daemonic process, e.g. a worker of a multiprocessing.Pool.')
+        self.shape = (solver.n_x, solver.n_y)
+        self.dtype = solver.dtype
+        self.n_workers = min(n_workers, solver.n_x)
+        buffers_bytes = 2 * solver.n_x * solver.n_y * self.dtype.itemsize
+        self._blocks = []
+        self._processes = []
+        self._barrier = _context.Barrier(self.n_workers + 1)
+        try:
+            for size in (buffers_bytes, buffers_bytes, 6 * 8, self.n_workers * 4 * 8):
+                self._blocks.append(shared_memory.SharedMemory(create=True, size=size))
+            self.u = list(_attach(self._blocks[0], (2,) + self.shape, self.dtype))  # two buffers each
+            self.v = list(_attach(self._blocks[1], (2,) + self.shape, self.dtype))
+            self._control = _attach(self._blocks[2], (6,), np.float64)
+            self._stats = _attach(self._blocks[3], (self.n_workers, 4), np.float64)
+            self._control[0] = STEP
+
+            worker_solver = copy.copy(solver)
+            for name in ('frame_sink', 'cache', 'u_mat', 'v_mat', 'init_u_mat', 'init_v_mat', '_work'):
+                setattr(worker_solver, name, None)
+            bounds = np.linspace(0, solver.n_x, self.n_workers + 1).astype(int)
+            names = [block.name for block in self._blocks]
+            for i_worker in range(self.n_workers):
+                process = _context.Process(
+                    target=_worker_loop, daemon=True,
+                    args=(worker_solver, i_worker, slice(bounds[i_worker], bounds[i_worker + 1]), names,
+                          self.shape, self.dtype, self._barrier))
+                process.start()
+                self._processes.append(process)
+        except BaseException:
+            self._barrier.abort()  # release the workers that did start
+            _shutdown(self._processes, self._blocks, self._barrier, None)
+            raise
+        self._finalizer = weakref.finalize(self, _shutdown, self._processes, self._blocks,
+                                           self._barrier, self._control)
+
+    def _buffer_index(self, u_mat, v_mat):
+        for i_buffer in range(2):
+            if u_mat is self.u[i_buffer] and v_mat is self.v[i_buffer]:
+                return i_buffer
+        return None
+
+    def step(self, old_u_mat, old_v_mat, new_u_mat, new_v_mat, F, k, dt, monitor=None):
+        """Perform one update step. If old_u_mat and old_v_mat are the shared
+        buffers u[i] and v[i] and new_u_mat and new_v_mat the other pair, no data
+        is copied; other arrays are copied in and out of the shared buffers.
+
+        Returns:
+        ---------------
+            change: float or None
+                - relative change of the step in the norm of monitor, if given
+        """
+        src = self._buffer_index(old_u_mat, old_v_mat)
+        if src is None:
+            src = 0
+            self.u[src][...] = old_u_mat
+            self.v[src][...] = old_v_mat
+        dst = 1 - src
+        self._control[1:] = [src, F, k, dt, monitor is not None]
+        try:
+            self._barrier.wait()  # start the step
+            self._barrier.wait()  # wait until all strips are updated
+        except threading.BrokenBarrierError:
+            self.close()
+            raise RuntimeError('A worker process of the distributed engine failed.')
+        if self._buffer_index(new_u_mat, new_v_mat) != dst:
+            new_u_mat[...] = self.u[dst]
+            new_v_mat[...] = self.v[dst]
+        if monitor is not None:
+            return monitor.from_row_stats(self._stats)
+        return None
+
+    def close(self):
+        """Stop the worker processes and release the shared memory. Arrays that
+        view the shared buffers (u and v) must not be used afterwards."""
+        self._finalizer()
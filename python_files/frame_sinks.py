@@ -0,0 +1,232 @@
+## Frame sinks: storage backends for the frames saved by Solver.solve()
+import io
+import os
+import numpy as np
+
+
+class FrameSink():
+    """Base class for the storage of the u and v frames saved during solving.
+
+    Solver.solve() calls open() once per solve, write() as soon as a frame is
+    produced, and truncate() if it stops early. Afterwards the frames can be
+    read back through the u and v attributes, which support numpy style
+    indexing (u[i] is the i-th frame) and, for the disk based sinks, only read
+    the frames that are accessed.
+
+    Sinks that store the frames in files (persistent = True) can be described
+    (describe()) and reopened later without losing frames (reopen()), so that
+    checkpoints only need to refer to their files.
+    """
+    persistent = False
+
+    def __init__(self):
+        self.u = None
+        self.v = None
+
+    def open(self, n_frames, frame_shape, dtype=np.float64):
+        """Prepare storage for n_frames frames of shape frame_shape."""
+        raise NotImplementedError
+
+    def reopen(self, n_frames, frame_shape, dtype=np.float64):
+        """Open the existing storage of n_frames frames (e.g. after a restart)
+        without clearing the frames that were written to it."""
+        raise NotImplementedError
+
+    def describe(self):
+        """Return a json-serialisable description of the sink, from which
+        sink_from_description() recreates it."""
+        return dict(sink=type(self).__name__)
+
+    def write(self, i_frame, u_frame, v_frame):
+        """Store the u and v matrices as frame i_frame."""
+        self.u[i_frame] = u_frame
+        self.v[i_frame] = v_frame
+
+    def truncate(self, n_frames):
+        """Keep only the first n_frames frames."""
+        raise NotImplementedError
+
+    def flat_u(self):
+        """Return all u frames collapsed to 1 dimension."""
+        return np.asarray(self.u).reshape(-1)
+
+    def flush(self):
+        """Make sure all written frames are stored."""
+        pass
+
+    def close(self):
+        """Release any open files, after which the frames can no longer be read."""
+        self.flush()
+
+
+class MemorySink(FrameSink):
+    """Keep all frames in numpy arrays in memory (the default)."""
+    def open(self, n_frames, frame_shape, dtype=np.float64):
+        self.u = np.zeros((n_frames,) + tuple(frame_shape), dtype=dtype)
+        self.v = np.zeros((n_frames,) + tuple(frame_shape), dtype=dtype)
+        return self
+
+    def truncate(self, n_frames):
+        self.u = self.u[:n_frames]
+        self.v = self.v[:n_frames]
+
+
+class NpyMemmapSink(FrameSink):
+    """Stream frames to two memory-mapped .npy files, {path}_u.npy and {path}_v.npy.
+
+    The files can be loaded later with np.load(..., mmap_mode='r'). Every solve
+    replaces the files; arrays returned by an earlier solve keep referring to
+    the (unlinked) previous files and stay valid.
+
+    Parameters:
+    ---------------
+        path: str
+            - path prefix of the .npy files
+    """
+    persistent = True
+
+    def __init__(self, path):
+        super(NpyMemmapSink, self).__init__()
+        self.path = path
+        self.u_path = f'{path}_u.npy'
+        self.v_path = f'{path}_v.npy'
+
+    def describe(self):
+        return dict(sink=type(self).__name__, path=self.path)
+
+    def reopen(self, n_frames, frame_shape, dtype=np.float64):
+        self.close()
+        shape = (n_frames,) + tuple(frame_shape)
+        for path in (self.u_path, self.v_path):
+            self._rewrite_header(path, shape, np.dtype(dtype))  # undo an earlier truncate()
+        self.u = np.lib.format.open_memmap(self.u_path, mode='r+')
+        self.v = np.lib.format.open_memmap(self.v_path, mode='r+')
+        assert self.u.shape == shape and self.v.shape == shape, 'the frame files do not match the solver'
+        return self
+
+    def open(self, n_frames, frame_shape, dtype=np.float64):
+        self.close()
+        shape = (n_frames,) + tuple(frame_shape)
+        for path in (self.u_path, self.v_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.u = np.lib.format.open_memmap(self.u_path, mode='w+', dtype=dtype, shape=shape)
+        self.v = np.lib.format.open_memmap(self.v_path, mode='w+', dtype=dtype, shape=shape)
+        return self
+
+    def truncate(self, n_frames):
+        self.u = self.u[:n_frames]
+        self.v = self.v[:n_frames]
+        for path, frames in ((self.u_path, self.u), (self.v_path, self.v)):
+            self._rewrite_header(path, frames.shape, frames.dtype)
+
+    @staticmethod
+    def _rewrite_header(path, shape, dtype):
+        """Update the shape in the header of a .npy file (e.g. to the truncated
+        frames), so that loading the file only returns the frames that were
+        solved. The unused frames stay in the file, and the header is left
+        unchanged if it would change length."""
+        header = io.BytesIO()
+        np.lib.format.write_array_header_1_0(
+            header, {'descr': np.lib.format.dtype_to_descr(dtype),
+                     'fortran_order': False, 'shape': shape})
+        with open(path, 'r+b') as npy_file:
+            if np.lib.format.read_magic(npy_file) == (1, 0):
+                np.lib.format.read_array_header_1_0(npy_file)
+            else:
+                np.lib.format.read_array_header_2_0(npy_file)
+            if npy_file.tell() == len(header.getvalue()):
+                npy_file.seek(0)
+                npy_file.write(header.getvalue())
+
+    def flush(self):
+        for frames in (self.u, self.v):
+            if isinstance(frames, np.memmap):
+                frames.flush()
+
+
+class HDF5Sink(FrameSink):
+    """Stream frames to a chunked, compressed HDF5 file with datasets 'u' and 'v'
+    (requires h5py). Each frame is one chunk, so frames are compressed and read
+    back individually. Every solve replaces the file, which invalidates the
+    datasets of the previous solve.
+
+    This sink is meant for storage: the output of Solver.solve() and simulate()
+    (flat_u()) decompresses all u frames into memory. For inference on long
+    runs, where the output should be read lazily, use NpyMemmapSink.
+
+    Parameters:
+    ---------------
+        path: str
+            - path of the HDF5 file
+        compression: str, default='gzip'
+            - h5py compression filter
+        compression_opts: int, default=4
+            - compression level
+    """
+    persistent = True
+
+    def __init__(self, path, compression='gzip', compression_opts=4):
+        super(HDF5Sink, self).__init__()
+        self.path = path
+        self.compression = compression
+        self.compression_opts = compression_opts
+        self._file = None
+
+    def describe(self):
+        return dict(sink=type(self).__name__, path=self.path, compression=self.compression,
+                    compression_opts=self.compression_opts)
+
+    @staticmethod
+    def _h5py():
+        try:
+            import h5py
+        except ImportError:
+            raise ImportError('HDF5Sink requires h5py, install it with pip install h5py.')
+        return h5py
+
+    def reopen(self, n_frames, frame_shape, dtype=np.float64):
+        self.close()
+        self._file = self._h5py().File(self.path, 'a')
+        self.u = self._file['u']
+        self.v = self._file['v']
+        assert self.u.shape[1:] == tuple(frame_shape), 'the frame file does not match the solver'
+        self.u.resize(n_frames, axis=0)  # undo an earlier truncate()
+        self.v.resize(n_frames, axis=0)
+        return self
+
+    def open(self, n_frames, frame_shape, dtype=np.float64):
+        self.close()
+        self._file = self._h5py().File(self.path, 'w')
+        shape = (n_frames,) + tuple(frame_shape)
+        chunks = (1,) + tuple(frame_shape)
+        for name in ('u', 'v'):
+            self._file.create_dataset(name, shape=shape, maxshape=(None,) + tuple(frame_shape),
+                                      dtype=dtype, chunks=chunks, compression=self.compression,
+                                      compression_opts=self.compression_opts)
+        self.u = self._file['u']
+        self.v = self._file['v']
+        return self
+
+    def truncate(self, n_frames):
+        self.u.resize(n_frames, axis=0)
+        self.v.resize(n_frames, axis=0)
+
+    def flat_u(self):
+        """Return all u frames collapsed to 1 dimension, read into memory."""
+        return self.u[...].reshape(-1)
+
+    def flush(self):
+        if self._file is not None and self._file.id.valid:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None and self._file.id.valid:
+            self._file.close()
+
+
+def sink_from_description(description):
+    """Recreate a frame sink from the output of its describe() method."""
+    description = dict(description)
+    sink_class = {sink.__name__: sink for sink in (MemorySink, NpyMemmapSink, HDF5Sink)}[description.pop('sink')]
+    return sink_class(**description)
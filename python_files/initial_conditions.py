@@ -0,0 +1,300 @@
+## Initial conditions of Solver: named generators with their own random state, and a shared cache
+import os
+import json
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+class InitialCondition():
+    """Base class of the generators of the initial u and v matrices of a Solver.
+
+    A generator draws its random numbers from the np.random.Generator passed to
+    generate(), never from numpy's global random state. Subclasses implement
+    generate() and describe(); the description (with the grid shape, model and
+    seed) is the key of the cache of generated fields, see initial_state().
+    """
+    random = True  # False if generate() does not use its random generator
+
+    @staticmethod
+    def background(shape, model):
+        """Homogeneous steady state of the model: u=1, v=0 for gray-scott and u=v=0 for heat."""
+        u_mat = np.ones(shape) if model == 'gray-scott' else np.zeros(shape)
+        return u_mat, np.zeros(shape)
+
+    def generate(self, shape, model, rng):
+        """Return the initial u and v matrices of the given shape and model."""
+        raise NotImplementedError
+
+    def describe(self):
+        """Return a json-serialisable description of the generator (e.g. for cache keys)."""
+        raise NotImplementedError
+
+
+class Square(InitialCondition):
+    """The homogeneous state with a centred square of perturbed values, plus
+    uniform noise (the standard initial conditions of the solver).
+
+    Parameters:
+    ---------------
+        size: float, default=1/8
+            - side length of the square relative to the grid
+        u_value: float, default=0.5
+            - value of u in the square
+        v_value: float, default=0.25
+            - value of v in the square
+        noise: float, default=0.02
+            - width of the uniform noise added to u and v
+    """
+    def __init__(self, size=1/8, u_value=0.5, v_value=0.25, noise=0.02):
+        self.size = size
+        self.u_value = u_value
+        self.v_value = v_value
+        self.noise = noise
+
+    def generate(self, shape, model, rng):
+        u_mat, v_mat = self.background(shape, model)
+        rows = slice(int((1 - self.size) / 2 * shape[0]), int((1 + self.size) / 2 * shape[0]))
+        cols = slice(int((1 - self.size) / 2 * shape[1]), int((1 + self.size) / 2 * shape[1]))
+        u_mat[rows, cols] = self.u_value
+        v_mat[rows, cols] = self.v_value
+        u_mat += (rng.random(shape) - 0.5) * self.noise
+        v_mat += (rng.random(shape) - 0.5) * self.noise
+        return u_mat, v_mat
+
+    def describe(self):
+        return dict(generator='square', size=self.size, u_value=self.u_value, v_value=self.v_value,
+                    noise=self.noise)
+
+
+class RandomSpots(InitialCondition):
+    """The homogeneous state with discs of perturbed values at random positions
+    (with periodic boundaries), plus uniform noise.
+
+    Parameters:
+    ---------------
+        n_spots: int, default=10
+            - number of spots
+        radius: float, default=None
+            - radius of the spots in grid cells, 1/32 of the smallest grid dimension
+            (at least 1) if None
+        u_value: float, default=0.5
+            - value of u in the spots
+        v_value: float, default=0.25
+            - value of v in the spots
+        noise: float, default=0.02
+            - width of the uniform noise added to u and v
+    """
+    def __init__(self, n_spots=10, radius=None, u_value=0.5, v_value=0.25, noise=0.02):
+        self.n_spots = int(n_spots)
+        self.radius = radius
+        self.u_value = u_value
+        self.v_value = v_value
+        self.noise = noise
+
+    def generate(self, shape, model, rng):
+        u_mat, v_mat = self.background(shape, model)
+        radius = self.radius or max(min(shape) / 32, 1)
+        rows, cols = np.arange(shape[0])[:, np.newaxis], np.arange(shape[1])[np.newaxis, :]
+        for centre_row, centre_col in rng.random((self.n_spots, 2)) * shape:
+            d_row = np.abs(rows - centre_row)
+            d_col = np.abs(cols - centre_col)
+            d_row, d_col = np.minimum(d_row, shape[0] - d_row), np.minimum(d_col, shape[1] - d_col)
+            spot = d_row ** 2 + d_col ** 2 <= radius ** 2
+            u_mat[spot] = self.u_value
+            v_mat[spot] = self.v_value
+        u_mat += (rng.random(shape) - 0.5) * self.noise
+        v_mat += (rng.random(shape) - 0.5) * self.noise
+        return u_mat, v_mat
+
+    def describe(self):
+        return dict(generator='spots', n_spots=self.n_spots, radius=self.radius, u_value=self.u_value,
+                    v_value=self.v_value, noise=self.noise)
+
+
+def _file_stamp(path):
+    """Modification time and size of a file, so that cache keys change with its content."""
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class FromFile(InitialCondition):
+    """u and v matrices stored in a file: a .npz file with arrays u_mat and v_mat
+    (e.g. a checkpoint of save_checkpoint(), which continues from its current
+    state) or a .npy file with an array of shape (2, n_x, n_y).
+
+    Parameters:
+    ---------------
+        path: str
+            - file name
+    """
+    random = False
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def generate(self, shape, model, rng):
+        if self.path.endswith('.npz'):
+            with np.load(self.path) as arrays:
+                u_mat, v_mat = arrays['u_mat'], arrays['v_mat']
+        else:
+            u_mat, v_mat = np.load(self.path)
+        if u_mat.shape != tuple(shape) or v_mat.shape != tuple(shape):
+            raise ValueError(f'The initial conditions in {self.path} have shape {u_mat.shape}, '
+                             f'the grid has shape {tuple(shape)}.')
+        return np.array(u_mat, dtype=float), np.array(v_mat, dtype=float)
+
+    def describe(self):
+        return dict(generator='file', path=os.path.abspath(self.path), stamp=_file_stamp(self.path))
+
+
+class FromRun(InitialCondition):
+    """A saved frame of a previous run, whose frames were written by an
+    NpyMemmapSink with the given path prefix ({path}_u.npy and {path}_v.npy).
+
+    Parameters:
+    ---------------
+        path: str
+            - path prefix of the frame files
+        frame: int, default=-1
+            - index of the frame (negative indices count from the last frame)
+    """
+    random = False
+
+    def __init__(self, path, frame=-1):
+        self.path = str(path)
+        self.frame = int(frame)
+
+    def generate(self, shape, model, rng):
+        frames_u = np.load(f'{self.path}_u.npy', mmap_mode='r')
+        frames_v = np.load(f'{self.path}_v.npy', mmap_mode='r')
+        if frames_u.shape[1:] != tuple(shape):
+            raise ValueError(f'The frames of {self.path} have shape {frames_u.shape[1:]}, '
+                             f'the grid has shape {tuple(shape)}.')
+        return np.array(frames_u[self.frame], dtype=float), np.array(frames_v[self.frame], dtype=float)
+
+    def describe(self):
+        return dict(generator='run', path=os.path.abspath(self.path), frame=self.frame,
+                    stamp=[_file_stamp(f'{self.path}_u.npy'), _file_stamp(f'{self.path}_v.npy')])
+
+
+GENERATORS = {'square': Square, 'spots': RandomSpots, 'file': FromFile, 'run': FromRun}
+
+
+def make_initial_condition(name, **params):
+    """Return the generator registered under name (see GENERATORS), constructed with params."""
+    if name not in GENERATORS:
+        raise ValueError(f'Unknown initial condition {name}, choose {", ".join(GENERATORS)}.')
+    return GENERATORS[name](**params)
+
+
+class InitialStateCache():
+    """Cache of generated initial u and v matrices, keyed on the description of
+    the generator, the grid shape, the model and the seed. The in-memory tier
+    holds the max_entries most recently used states; the optional disk tier
+    stores one .npz file per state in a directory, written atomically, so
+    worker processes and later sessions share the generated fields. Cached
+    arrays are read-only.
+
+    Parameters:
+    ---------------
+        max_entries: int, default=16
+            - number of states in memory
+        directory: str, default=None
+            - directory of the disk tier, no disk tier if None
+    """
+    def __init__(self, max_entries=16, directory=None):
+        self.max_entries = max_entries
+        self.directory = directory
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._memory = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(initial_condition, shape, model, seed):
+        """Return the sha256 hash that identifies a generated state."""
+        description = dict(initial_condition=initial_condition.describe(), shape=[int(n) for n in shape],
+                           model=model, seed=seed if initial_condition.random else None)
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        """Return the cached (u_mat, v_mat) of key, or None if it is not cached."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if self.directory is not None and os.path.exists(self._path(key)):
+            with np.load(self._path(key)) as arrays:
+                self.hits += 1
+                return self._put_memory(key, (arrays['u_mat'], arrays['v_mat']))
+        self.misses += 1
+        return None
+
+    def put(self, key, state):
+        """Store the state (u_mat, v_mat) under key and return the (read-only) cached arrays."""
+        state = self._put_memory(key, tuple(np.array(mat) for mat in state))
+        if self.directory is not None and not os.path.exists(self._path(key)):
+            tmp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as npz_file:
+                np.savez(npz_file, u_mat=state[0], v_mat=state[1])
+            os.replace(tmp_path, self._path(key))
+        return state
+
+    def _put_memory(self, key, state):
+        for mat in state:
+            mat.flags.writeable = False
+        self._memory[key] = state
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+        return state
+
+    def clear(self):
+        """Remove all states from the memory tier (the disk tier is kept)."""
+        self._memory.clear()
+
+
+default_cache = InitialStateCache()
+
+
+def initial_state(initial_condition, shape, model='gray-scott', seed=None, cache=None):
+    """Generate the initial u and v matrices of a solver, or look them up in the cache.
+
+    Parameters:
+    ---------------
+        initial_condition: InitialCondition or str
+            - generator, or the name of a generator in GENERATORS (with its default
+            parameters)
+        shape: tuple of int
+            - shape of the grid
+        model: str, default='gray-scott'
+            - model of the solver, which sets the homogeneous background state
+        seed: int, default=None
+            - seed of the random generator of initial_condition. Random states
+            with seed None are fresh every time and never cached.
+        cache: InitialStateCache, default=None
+            - cache of the generated states, default_cache if None
+
+    Returns:
+    ---------------
+        u_mat, v_mat: 2D numpy arrays
+            - read-only initial matrices, shared with other solvers of the same
+            initial conditions (unless seed is None)
+    """
+    if isinstance(initial_condition, str):
+        initial_condition = make_initial_condition(initial_condition)
+    if initial_condition.random and seed is None:
+        u_mat, v_mat = initial_condition.generate(tuple(shape), model, np.random.default_rng())
+        u_mat.flags.writeable = v_mat.flags.writeable = False
+        return u_mat, v_mat
+    cache = default_cache if cache is None else cache
+    key = cache.key(initial_condition, shape, model, seed)
+    state = cache.get(key)
+    if state is None:
+        state = cache.put(key, initial_condition.generate(tuple(shape), model, np.random.default_rng(seed)))
+    return state
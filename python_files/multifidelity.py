@@ -0,0 +1,230 @@
+## Multi-fidelity (coarse-to-fine) parameter inference
+import numpy as np
+import pints
+from Pde_solver import Solver
+from grayscott.population import EvaluatorOptimisationController
+
+
+def restrict(frames, factor):
+    """Restrict frames to a grid that is factor times coarser, by averaging
+    blocks of factor x factor cells (the restriction of multigrid methods).
+
+    Parameters:
+    ---------------
+        frames: numpy array
+            - frames, of which the last two axes are the grid
+        factor: int
+            - coarsening factor, which must divide both grid dimensions
+
+    Returns:
+    ---------------
+        coarse_frames: numpy array
+            - restricted frames, with the last two axes divided by factor
+    """
+    frames = np.asarray(frames)
+    n_x, n_y = frames.shape[-2:]
+    if n_x % factor or n_y % factor:
+        raise ValueError(f'A coarsening factor of {factor} does not divide the grid of shape {(n_x, n_y)}.')
+    blocks = frames.reshape(frames.shape[:-2] + (n_x // factor, factor, n_y // factor, factor))
+    return blocks.mean(axis=(-3, -1))
+
+
+class WarmStartXNES(pints.XNES):
+    """XNES that starts from a given square root A of the search covariance
+    (A A^T), e.g. the one an earlier XNES run ended with, instead of
+    sigma0 * identity.
+
+    Parameters:
+    ---------------
+        x0: list
+            - initial position (mean of the search distribution)
+        sigma0: float or list, default=None
+            - initial standard deviations if A is None (see pints.XNES)
+        boundaries: pints.Boundaries, default=None
+            - boundaries of the search
+        A: 2D numpy array, default=None
+            - initial square root of the search covariance
+    """
+    def __init__(self, x0, sigma0=None, boundaries=None, A=None):
+        super(WarmStartXNES, self).__init__(x0, sigma0, boundaries)
+        self._A_initial = None if A is None else np.array(A, dtype=float)
+
+    def _initialise(self):
+        super(WarmStartXNES, self)._initialise()
+        if self._A_initial is not None:
+            self._A = self._A_initial.copy()
+
+    def covariance_root(self):
+        """Current square root A of the search covariance (None before the first ask())."""
+        return self._A
+
+
+class StageError(pints.ErrorMeasure):
+    """Sum of squares error of a stage, which is inf for (F, k) where the explicit
+    Euler steps of the stage blow up (large F and k with the large time steps of a
+    coarse stage), instead of emitting overflow warnings and returning nan.
+
+    Parameters:
+    ---------------
+        problem: pints.MultiOutputProblem
+            - problem of the stage (see CoarseToFine.stage_problem())
+    """
+    def __init__(self, problem):
+        super(StageError, self).__init__()
+        self._error = pints.SumOfSquaresError(problem)
+
+    def n_parameters(self):
+        return self._error.n_parameters()
+
+    def __call__(self, x):
+        with np.errstate(over='ignore', invalid='ignore'):
+            error = self._error(x)
+        return error if np.isfinite(error) else np.inf
+
+
+class CoarseToFine():
+    """
+    Coarse-to-fine inference of (F, k) from the frames of a Gray-Scott run.
+
+    The optimisation runs in stages of increasing fidelity. Every stage solves
+    the model on a grid that is grid_factor times coarser (with grid_spacing
+    grid_factor, so it covers the same domain) with time_factor times fewer,
+    larger time steps, starting from the restricted initial conditions of the
+    solver, and fits the data restricted to that grid. A stage with factors
+    (2, 4) costs 1/16 of a full solve per evaluation. Each stage starts XNES
+    from the best (F, k) and the search covariance of the previous stage. The
+    last stage should be (1, 1), so the estimate comes from the full-fidelity
+    model; the coarse stages only bring the search close to the optimum
+    (their optimum is biased by the discretisation error of the coarse grid).
+
+    The explicit Euler scheme is only stable if time_factor is at most
+    grid_factor ** 2, and (F, k) for which the steps of a stage blow up score
+    an error of inf. Coarse stages run on the numpy engine (or numba, if the
+    solver uses it), so they start no worker processes or threads.
+
+    Parameters:
+    ---------------
+        solver: Solver
+            - full-fidelity model, which also provides the configuration, initial
+            conditions and cache of the coarse models. It must not have an
+            observation operator.
+        values: numpy array
+            - observed u frames, of shape (solver.n_save_frames, n_grid, n_grid),
+            e.g. save_u_mat of a run of the same configuration
+        stages: list of (int, int), default=((2, 4), (1, 1))
+            - (grid_factor, time_factor) of each stage. grid_factor must divide
+            n_grid and time_factor must divide n_time_points - 1.
+        max_iterations: list of int, default=(100, 30)
+            - maximum number of XNES iterations of each stage
+        max_unchanged_iterations: int, default=20
+            - stop a stage after this many iterations without a significant
+            change in its best error
+        min_sigma: float, default=0.05
+            - the covariance passed on to the next stage is scaled up (if needed)
+            so that its largest standard deviation is at least min_sigma times
+            the range of the boundaries (in the search space)
+        boundaries: pints.RectangularBoundaries, default=None
+            - boundaries of F and k, [0.01, 0.01] to [1, 1] if None
+        transformation: pints.Transformation, default=None
+            - search space of XNES (and of its covariance), e.g.
+            pints.LogTransformation(2)
+    """
+    def __init__(self, solver, values, stages=((2, 4), (1, 1)), max_iterations=(100, 30),
+                 max_unchanged_iterations=20, min_sigma=0.05, boundaries=None, transformation=None):
+        if solver.observation is not None:
+            raise ValueError('Coarse-to-fine inference restricts full frames, the solver must not '
+                             'have an observation operator.')
+        if len(max_iterations) != len(stages):
+            raise ValueError(f'Got {len(max_iterations)} maximum numbers of iterations for {len(stages)} stages.')
+        self.solver = solver
+        self.values = np.asarray(values)
+        self.stages = [(int(grid_factor), int(time_factor)) for grid_factor, time_factor in stages]
+        self.max_iterations = list(max_iterations)
+        self.max_unchanged_iterations = max_unchanged_iterations
+        self.min_sigma = min_sigma
+        if boundaries is None:
+            boundaries = pints.RectangularBoundaries([0.01, 0.01], [1.0, 1.0])
+        self.boundaries = boundaries
+        self.transformation = transformation
+
+    def stage_solver(self, grid_factor, time_factor):
+        """Return the model of a stage: a copy of the configuration of the solver
+        on a grid_factor times coarser grid, with time_factor times fewer time
+        steps, starting from the restricted initial conditions."""
+        if grid_factor == 1 and time_factor == 1:
+            return self.solver
+        config = dict(self.solver._config)
+        if (config['n_time_points'] - 1) % time_factor:
+            raise ValueError(f'A time factor of {time_factor} does not divide the '
+                             f'{config["n_time_points"] - 1} time steps.')
+        config.update(n_grid=config['n_grid'] // grid_factor,
+                      n_time_points=(config['n_time_points'] - 1) // time_factor + 1,
+                      dt=config['dt'] * time_factor, grid_spacing=config['grid_spacing'] * grid_factor,
+                      fix_seed=False,  # the initial conditions are replaced below
+                      engine='numba' if config['engine'] == 'numba' else 'numpy')
+        coarse_solver = Solver(cache=self.solver.cache, profiler=self.solver.profiler, **config)
+        coarse_solver.init_u_mat = restrict(self.solver.init_u_mat, grid_factor)
+        coarse_solver.init_v_mat = restrict(self.solver.init_v_mat, grid_factor)
+        return coarse_solver
+
+    def stage_problem(self, grid_factor, time_factor):
+        """Return the pints problem of a stage: its model and the data restricted to its grid."""
+        model = self.stage_solver(grid_factor, time_factor)
+        values = restrict(self.values, grid_factor).reshape(len(self.values), -1)
+        return pints.MultiOutputProblem(model, model.save_frames * model.dt, values)
+
+    def run(self, x0, sigma0=None, verbose=False):
+        """
+        Run the stages.
+
+        Parameters:
+        ---------------
+            x0: list
+                - initial (F, k)
+            sigma0: float or list, default=None
+                - initial standard deviations of XNES in the search space (see
+                pints.XNES); later stages start from the covariance of the
+                previous stage instead
+            verbose: bool, default=False
+                - if true, print the result of every stage
+
+        Returns:
+        ---------------
+            found_parameters: numpy array
+                - best (F, k) of the last stage
+            found_value: float
+                - sum of squares error of found_parameters in the last stage
+            history: list of dict
+                - per stage: grid_factor, time_factor, parameters, error and
+                the number of evaluations
+        """
+        boundaries = self.boundaries
+        x_best = np.asarray(x0, dtype=float)
+        if self.transformation is not None:
+            boundaries = self.transformation.convert_boundaries(boundaries)
+            x_best = self.transformation.to_search(x_best)
+        A = None
+        history = []
+        for (grid_factor, time_factor), max_iterations in zip(self.stages, self.max_iterations):
+            error = StageError(self.stage_problem(grid_factor, time_factor))
+            if self.transformation is not None:
+                error = self.transformation.convert_error_measure(error)
+            optimiser = WarmStartXNES(x_best, sigma0, boundaries=boundaries, A=A)
+            controller = EvaluatorOptimisationController(error, optimiser, pints.SequentialEvaluator(error))
+            controller.set_max_iterations(max_iterations)
+            controller.set_function_tolerance(self.max_unchanged_iterations)
+            controller.set_log_to_screen(False)
+            x_best, f_best = controller.run()
+            A = optimiser.covariance_root()
+            ## widen the covariance (keeping its shape) to reach the optimum of the next
+            ## stage, which is shifted by the discretisation error of this stage
+            largest_sigma = np.sqrt(np.max(np.linalg.eigvalsh(A @ A.T)))
+            A = A * max(1, self.min_sigma * np.min(boundaries.range()) / largest_sigma)
+            found_parameters = x_best if self.transformation is None else self.transformation.to_model(x_best)
+            history.append(dict(grid_factor=grid_factor, time_factor=time_factor,
+                                parameters=found_parameters, error=f_best,
+                                n_evaluations=controller.evaluations()))
+            if verbose:
+                print(f'Stage {len(history)} (grid / {grid_factor}, steps / {time_factor}): '
+                      f'F={found_parameters[0]:.5f}, k={found_parameters[1]:.5f}, error={f_best:.4g}')
+        return found_parameters, f_best, history
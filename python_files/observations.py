@@ -0,0 +1,232 @@
+## Observation operators: reduced outputs of Solver for parameter inference
+import numpy as np
+
+
+class Observation():
+    """Base class of the observation operators of a Solver, which map every saved
+    u frame to a vector of observations as soon as the frame is produced. The
+    output of solve() and simulate() is then the observations of the observed
+    frames instead of the full frames, so the forward output and the
+    likelihood evaluation scale with the number of observations rather than
+    with the grid size.
+
+    The base class observes the full frame (the output without an observation
+    operator). Subclasses override bind() (to precompute anything that depends
+    on the frame shape), n_values() and __call__().
+    """
+    frames = None  # indices of the observed saved frames, None for all frames
+
+    def bind(self, frame_shape, n_frames):
+        """Prepare the operator for frames of shape frame_shape, of which n_frames are saved."""
+        self.frame_shape = tuple(frame_shape)
+        return self
+
+    def observed_frames(self, n_frames):
+        """Indices of the observed frames out of n_frames saved frames."""
+        return np.arange(n_frames)
+
+    def n_values(self):
+        """Number of observations per observed frame."""
+        return int(np.prod(self.frame_shape))
+
+    def __call__(self, u_frame):
+        """Return the observations of one u frame as a 1D array."""
+        return np.ravel(u_frame)
+
+    def derivative(self, u_frame, du_frame):
+        """Return the derivative of the observations of u_frame in the direction
+        du_frame (e.g. the sensitivity of u to a parameter), as a 1D array."""
+        return np.ravel(du_frame)
+
+    def describe(self):
+        """Return a json-serialisable description of the operator (e.g. for cache keys)."""
+        return dict(observation=type(self).__name__)
+
+
+class Downsample(Observation):
+    """Spatial downsampling of the frames by an integer factor, by pooling blocks
+    of factor x factor cells (rows and columns that do not fill a block are
+    dropped) or by keeping every factor-th cell.
+
+    Parameters:
+    ---------------
+        factor: int
+            - downsampling factor in both directions
+        method: str, 'mean', 'max' or 'subsample', default='mean'
+            - pooling of the blocks
+    """
+    methods = ('mean', 'max', 'subsample')
+
+    def __init__(self, factor, method='mean'):
+        if int(factor) < 1:
+            raise ValueError(f'The downsampling factor must be at least 1, got {factor}.')
+        if method not in self.methods:
+            raise ValueError(f'Unknown pooling method {method}, choose mean, max or subsample.')
+        self.factor = int(factor)
+        self.method = method
+
+    def bind(self, frame_shape, n_frames):
+        super(Downsample, self).bind(frame_shape, n_frames)
+        if min(frame_shape) < self.factor:
+            raise ValueError(f'A downsampling factor of {self.factor} is too large for frames '
+                             f'of shape {frame_shape}.')
+        if self.method == 'subsample':
+            self.coarse_shape = tuple(-(-n // self.factor) for n in frame_shape)
+        else:
+            self.coarse_shape = tuple(n // self.factor for n in frame_shape)
+        return self
+
+    def n_values(self):
+        return int(np.prod(self.coarse_shape))
+
+    def _blocks(self, frame):
+        """View of the pooled part of frame with shape (n_rows, n_cols, factor**2)."""
+        n_rows, n_cols = self.coarse_shape
+        blocks = frame[:n_rows * self.factor, :n_cols * self.factor].reshape(
+            n_rows, self.factor, n_cols, self.factor)
+        return blocks.transpose(0, 2, 1, 3).reshape(n_rows, n_cols, self.factor ** 2)
+
+    def __call__(self, u_frame):
+        if self.method == 'subsample':
+            return u_frame[::self.factor, ::self.factor].ravel()
+        if self.method == 'mean':
+            return self._blocks(u_frame).mean(axis=2).ravel()
+        return self._blocks(u_frame).max(axis=2).ravel()
+
+    def derivative(self, u_frame, du_frame):
+        if self.method != 'max':  # linear
+            return self(du_frame)
+        i_max = np.argmax(self._blocks(u_frame), axis=2)[..., np.newaxis]
+        return np.take_along_axis(self._blocks(du_frame), i_max, axis=2).ravel()
+
+    def describe(self):
+        return dict(observation=type(self).__name__, factor=self.factor, method=self.method)
+
+
+class SensorSubset(Observation):
+    """Values of u at a random subset of the grid cells (sensors). The sensors are
+    drawn once, when the operator is bound to a solver, from a random generator
+    of their own, so the same seed gives the same sensors for the data and the
+    model, independent of numpy's global random state.
+
+    Parameters:
+    ---------------
+        n_sensors: int
+            - number of sensors, at most the number of grid cells
+        seed: int, default=0
+            - seed of the random generator of the sensor locations
+    """
+    def __init__(self, n_sensors, seed=0):
+        self.n_sensors = int(n_sensors)
+        self.seed = seed
+
+    def bind(self, frame_shape, n_frames):
+        super(SensorSubset, self).bind(frame_shape, n_frames)
+        n_cells = int(np.prod(frame_shape))
+        if not 0 < self.n_sensors <= n_cells:
+            raise ValueError(f'The number of sensors must be between 1 and {n_cells}, got {self.n_sensors}.')
+        rng = np.random.default_rng(self.seed)
+        self.sensors = np.sort(rng.choice(n_cells, size=self.n_sensors, replace=False))
+        return self
+
+    def n_values(self):
+        return self.n_sensors
+
+    def __call__(self, u_frame):
+        return np.ravel(u_frame)[self.sensors]
+
+    def derivative(self, u_frame, du_frame):
+        return self(du_frame)
+
+    def describe(self):
+        return dict(observation=type(self).__name__, n_sensors=self.n_sensors, seed=self.seed)
+
+
+class RadialPowerSpectrum(Observation):
+    """Radially averaged power spectrum of the (mean-subtracted) frames: the mean
+    of |FFT(u)|^2 over rings of wave numbers. It describes the length scales of
+    a pattern independent of where its spots or stripes are, which makes it a
+    robust summary of patterns that depend on the random initial noise.
+
+    Parameters:
+    ---------------
+        n_bins: int, default=None
+            - number of rings, between the zero and the largest wave number
+            (min(n_x, n_y) // 2 if None)
+    """
+    def __init__(self, n_bins=None):
+        self.n_bins = n_bins
+
+    def bind(self, frame_shape, n_frames):
+        super(RadialPowerSpectrum, self).bind(frame_shape, n_frames)
+        n_bins = self.n_bins or min(frame_shape) // 2
+        k_x = np.fft.fftfreq(frame_shape[0])[:, np.newaxis]
+        k_y = np.fft.rfftfreq(frame_shape[1])[np.newaxis, :]
+        k_radius = np.sqrt(k_x ** 2 + k_y ** 2)
+        ## rings of equal width up to the largest wave number along an axis (0.5)
+        self.bins = np.minimum((k_radius / 0.5 * n_bins).astype(int), n_bins).ravel()
+        self.counts = np.bincount(self.bins, minlength=n_bins + 1)[:n_bins]
+        self._n_bins = n_bins
+        return self
+
+    def n_values(self):
+        return self._n_bins
+
+    def _ring_mean(self, values):
+        ring_sums = np.bincount(self.bins, weights=values.ravel(), minlength=self._n_bins + 1)
+        return ring_sums[:self._n_bins] / np.maximum(self.counts, 1)
+
+    def __call__(self, u_frame):
+        return self._ring_mean(np.abs(np.fft.rfft2(u_frame - np.mean(u_frame))) ** 2)
+
+    def derivative(self, u_frame, du_frame):
+        ## d|U|^2 = 2 Re(conj(U) dU), with the (linear) transform dU of du_frame
+        spectrum = np.fft.rfft2(u_frame - np.mean(u_frame))
+        d_spectrum = np.fft.rfft2(du_frame - np.mean(du_frame))
+        return self._ring_mean(2 * np.real(np.conj(spectrum) * d_spectrum))
+
+    def describe(self):
+        return dict(observation=type(self).__name__, n_bins=self.n_bins)
+
+
+class FrameSelection(Observation):
+    """Observe only some of the saved frames, optionally with another observation
+    operator applied to each of them.
+
+    Parameters:
+    ---------------
+        frames: list of int
+            - indices of the observed saved frames (negative indices count from
+            the last saved frame)
+        observation: Observation, default=None
+            - operator applied to the selected frames, the full frames if None
+    """
+    def __init__(self, frames, observation=None):
+        self.frame_indices = [int(i_frame) for i_frame in frames]
+        self.observation = Observation() if observation is None else observation
+
+    def bind(self, frame_shape, n_frames):
+        super(FrameSelection, self).bind(frame_shape, n_frames)
+        self.observation.bind(frame_shape, n_frames)
+        frames = np.array(self.frame_indices, dtype=int)
+        frames[frames < 0] += n_frames
+        if np.any(frames < 0) or np.any(frames >= n_frames):
+            raise ValueError(f'The selected frames {self.frame_indices} are not within the {n_frames} saved frames.')
+        self.frames = np.unique(frames)
+        return self
+
+    def observed_frames(self, n_frames):
+        return self.frames[self.frames < n_frames]
+
+    def n_values(self):
+        return self.observation.n_values()
+
+    def __call__(self, u_frame):
+        return self.observation(u_frame)
+
+    def derivative(self, u_frame, du_frame):
+        return self.observation.derivative(u_frame, du_frame)
+
+    def describe(self):
+        return dict(observation=type(self).__name__, frames=self.frame_indices,
+                    inner=self.observation.describe())
@@ -0,0 +1,102 @@
+## Plotting of Solver results (kept apart from Pde_solver, so that solving does not import matplotlib)
+import matplotlib.pyplot as plt
+import matplotlib.animation as animation
+import rendering
+
+
+def plot2d(solver, save_figures=False):
+    """Function to plot u and v matrix of a solver at their current state.
+
+    Arguments:
+    --------------
+        solver: Solver
+            - solver to plot
+        save_figures: bool, default = False
+            - If true, save figure as png file
+    """
+    filename_uv = f'u_matrix_F={solver.F}_k={solver.k}.png'  # define file name to save to
+    plt.rcParams['figure.figsize'] = (12, 5)
+    extent = (0, solver.u_mat.shape[1], 0, solver.u_mat.shape[0])  # cells as drawn by pcolor
+    plt.subplot(121)  # plot u matrix
+    plt.imshow(solver.u_mat, cmap=plt.cm.RdBu, origin='lower', extent=extent, interpolation='nearest')
+    plt.xlabel('u_1'); plt.ylabel('u_2'); plt.title(f'u matrix, F={solver.F}, k={solver.k} after {solver.n_times} iterations')
+    plt.colorbar()
+    plt.subplot(122) # plot v matrix
+    plt.imshow(solver.v_mat, cmap=plt.cm.RdBu, origin='lower', extent=extent, interpolation='nearest')
+    plt.xlabel('v_1'); plt.ylabel('v_2'); plt.title(f'v matrix, F={solver.F}, k={solver.k} after {solver.n_times} iterations')
+    plt.colorbar()
+    if save_figures:
+        plt.savefig(filename_uv, dpi=200)
+
+
+def animate_frames(solver, save_animation=True, file_name=None, fps=20, scale=None):
+    """Function to create animation of evolution u matrix using the saved frames of a solver.
+
+    Saved animations are rendered without a matplotlib figure (see
+    rendering.write_animation), reading the frames in batches. Otherwise a
+    matplotlib animation is returned, which updates a single image.
+
+    Arguments:
+    -----------------
+        solver: Solver
+            - solver to animate
+        save_animation: bool
+            - If true, save animation to gif file
+        file_name: str, default=None
+            - file to save to (.gif or .mp4), u_matrix_F={F}_k={k}.gif if None
+        fps: float, default=20
+            - frames per second
+        scale: int, default=None
+            - every grid cell becomes scale x scale pixels of the saved animation,
+            such that it is at least 512 pixels wide if None
+
+    Returns:
+    -----------------
+        anim: matplotlib.animation.FuncAnimation
+            - the animation, if save_animation is False
+    """
+    frames = solver.save_u_mat
+    if save_animation:
+        file_name = file_name or f'u_matrix_F={solver.F}_k={solver.k}.gif'
+        scale = scale or max(1, 512 // max(frames.shape[1:]))
+        rendering.write_animation(file_name, frames, fps=fps, scale=scale)
+        return None
+    fig = plt.figure(figsize=(10, 10))
+    vmin, vmax = rendering.frame_range(frames)
+    image = plt.imshow(frames[0], cmap=plt.cm.RdBu, vmin=vmin, vmax=vmax, origin='lower',
+                       interpolation='nearest')
+    plt.xlabel('u_1')
+    plt.ylabel('u_2')
+    plt.title(f'u matrix, F={solver.F}, k={solver.k} after {solver.n_times} iterations.')
+
+    def animate(i):
+        """Plotting function for animation"""
+        image.set_data(frames[i])
+        return image,
+
+    return animation.FuncAnimation(fig, animate, frames=range(frames.shape[0]), interval=1000 / fps,
+                                   blit=True)
+
+
+def plot_convergence(solver, save_convergence=False):
+    """Function to plot convergence of the matrices of a solver.
+
+    Arguments:
+    -----------------
+        solver: Solver
+            - solver to plot
+        save_convergence: bool
+            - If true, save convergence plot to file
+    """
+    plt.rcParams['figure.figsize'] = (9, 5)
+    plt.plot(solver.t_arr[solver.convergence_steps], solver.convergence, linewidth=2, label='Difference')
+    if solver.til_convergence:
+        plt.hlines(y=solver.rel_tol, xmin=solver.t_arr[0], xmax=solver.t_arr[-1], label='convergence criterion')
+    plt.xlabel('Time t'); plt.ylabel('Sum of absolute differences U and V \n between t and t+1')
+    plt.grid(True); plt.yscale('log');
+    plt.title('Convergence plot')
+    plt.legend()
+
+    if save_convergence:
+        file_name = f'convergence_ F={solver.F}, k={solver.k} after {solver.n_times} iterations.png'
+        plt.savefig(file_name)
@@ -0,0 +1,175 @@
+## Fast rendering of saved frames to images and animations, without matplotlib figures
+import os
+import shutil
+import subprocess
+import numpy as np
+
+
+def colormap_lut(cmap='RdBu', n_colors=256):
+    """Lookup table of a matplotlib colormap.
+
+    Parameters:
+    ---------------
+        cmap: str, default='RdBu'
+            - name of the matplotlib colormap
+        n_colors: int, default=256
+            - number of colours (at most 256, so that GIF frames need no quantisation)
+
+    Returns:
+    ---------------
+        lut: np array of shape (n_colors, 3), dtype uint8
+            - RGB colour of every level
+    """
+    import matplotlib  # only the colormap registry, not pyplot
+    return (matplotlib.colormaps[cmap](np.linspace(0, 1, n_colors))[:, :3] * 255).round().astype(np.uint8)
+
+
+def frame_range(frames, batch_size=64):
+    """Minimum and maximum value of a stack of frames, read batch_size frames at a time."""
+    vmin, vmax = np.inf, -np.inf
+    for start in range(0, len(frames), batch_size):
+        batch = np.asarray(frames[start:start + batch_size])
+        vmin, vmax = min(vmin, float(batch.min())), max(vmax, float(batch.max()))
+    return vmin, vmax
+
+
+def to_levels(frames, vmin, vmax, n_colors=256):
+    """Map frames to colormap levels: vmin to 0 and vmax to n_colors - 1 (values
+    outside the range are clipped).
+
+    Returns:
+    ---------------
+        levels: np array of the shape of frames, dtype uint8
+    """
+    scale = (n_colors - 1) / (vmax - vmin) if vmax > vmin else 0.0
+    levels = np.subtract(frames, vmin, dtype=np.float32)
+    levels *= scale
+    np.clip(levels, 0, n_colors - 1, out=levels)
+    return np.rint(levels, out=levels).astype(np.uint8)
+
+
+def iter_levels(frames, vmin=None, vmax=None, n_colors=256, batch_size=64, scale=1, flip=True):
+    """Yield the colormap levels of the frames one by one, reading and mapping
+    batch_size frames at a time (frames is only indexed with slices, so memory-
+    mapped and HDF5 frame stacks are read lazily).
+
+    Parameters:
+    ---------------
+        frames: array-like of shape (n_frames, n_x, n_y)
+            - frames, e.g. Solver.save_u_mat
+        vmin, vmax: float, default=None
+            - values mapped to the ends of the colormap, the range of all frames if None
+        n_colors: int, default=256
+            - number of colormap levels
+        batch_size: int, default=64
+            - number of frames read and mapped at a time
+        scale: int, default=1
+            - every grid cell becomes scale x scale pixels
+        flip: bool, default=True
+            - if true, the first row of a frame is the bottom row of the image,
+            as in plot2d()
+    """
+    if vmin is None or vmax is None:
+        data_min, data_max = frame_range(frames, batch_size)
+        vmin = data_min if vmin is None else vmin
+        vmax = data_max if vmax is None else vmax
+    for start in range(0, len(frames), batch_size):
+        levels = to_levels(frames[start:start + batch_size], vmin, vmax, n_colors)
+        if flip:
+            levels = levels[:, ::-1]
+        if scale > 1:
+            levels = levels.repeat(scale, axis=1).repeat(scale, axis=2)
+        for frame_levels in levels:
+            yield np.ascontiguousarray(frame_levels)
+
+
+def to_rgb(frames, vmin, vmax, cmap='RdBu', lut=None):
+    """Map frames to RGB images with a colormap.
+
+    Returns:
+    ---------------
+        rgb: np array of shape frames.shape + (3,), dtype uint8
+    """
+    lut = colormap_lut(cmap) if lut is None else lut
+    return lut[to_levels(frames, vmin, vmax, len(lut))]
+
+
+def _images(frames, cmap, vmin, vmax, batch_size, scale):
+    """Palette (mode 'P') PIL images of the frames."""
+    from PIL import Image
+    palette = colormap_lut(cmap).reshape(-1).tolist()
+    for frame_levels in iter_levels(frames, vmin, vmax, 256, batch_size, scale):
+        image = Image.fromarray(frame_levels)
+        image.putpalette(palette)  # makes the 8-bit image a palette image
+        yield image
+
+
+def write_gif(path, frames, fps=20, cmap='RdBu', vmin=None, vmax=None, batch_size=64, scale=1, loop=0):
+    """Write frames as an animated GIF. Frames are encoded as palette images of
+    the colormap, so no colour quantisation is needed. See iter_levels() for
+    the other parameters.
+
+    Parameters:
+    ---------------
+        path: str
+            - file name
+        frames: array-like of shape (n_frames, n_x, n_y)
+            - frames, e.g. Solver.save_u_mat
+        fps: float, default=20
+            - frames per second
+        loop: int, default=0
+            - number of times the animation repeats, 0 for forever
+    """
+    images = _images(frames, cmap, vmin, vmax, batch_size, scale)
+    first = next(images)
+    first.save(path, save_all=True, append_images=images, duration=1000 / fps, loop=loop, optimize=False)
+
+
+def write_png_sequence(pattern, frames, cmap='RdBu', vmin=None, vmax=None, batch_size=64, scale=1):
+    """Write every frame as a PNG image.
+
+    Parameters:
+    ---------------
+        pattern: str
+            - file name pattern, formatted with the frame index, e.g. 'frames/u_{:05d}.png'
+
+    Returns:
+    ---------------
+        paths: list of str
+            - file names of the images
+    """
+    paths = []
+    for i_frame, image in enumerate(_images(frames, cmap, vmin, vmax, batch_size, scale)):
+        paths.append(pattern.format(i_frame))
+        image.save(paths[-1], optimize=False, compress_level=1)
+    return paths
+
+
+def write_mp4(path, frames, fps=20, cmap='RdBu', vmin=None, vmax=None, batch_size=64, scale=1,
+              ffmpeg='ffmpeg'):
+    """Write frames as an H.264 MP4 video by piping RGB frames to ffmpeg, which
+    must be installed. The frame size is padded to even numbers of pixels."""
+    if shutil.which(ffmpeg) is None:
+        raise RuntimeError(f'{ffmpeg} was not found, it is needed to write MP4 files (or use write_gif).')
+    lut = colormap_lut(cmap)
+    levels = iter_levels(frames, vmin, vmax, len(lut), batch_size, scale)
+    first = next(levels)
+    height, width = first.shape
+    command = [ffmpeg, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+               '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+               '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', '-pix_fmt', 'yuv420p', '-c:v', 'libx264',
+               os.fspath(path)]
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as process:
+        process.stdin.write(lut[first].tobytes())
+        for frame_levels in levels:
+            process.stdin.write(lut[frame_levels].tobytes())
+        process.stdin.close()
+    if process.returncode != 0:
+        raise RuntimeError(f'{ffmpeg} failed with exit status {process.returncode}.')
+
+
+def write_animation(path, frames, **kwargs):
+    """Write frames as a GIF or MP4 animation, depending on the extension of path."""
+    if str(path).lower().endswith('.mp4'):
+        return write_mp4(path, frames, **kwargs)
+    return write_gif(path, frames, **kwargs)
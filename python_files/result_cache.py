@@ -0,0 +1,159 @@
+## Content-addressed cache of Solver.simulate() results
+import os
+import mmap
+import json
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+
+def _is_memory_mapped(value):
+    """Return True if the array value is a view of a memory-mapped file."""
+    while value is not None:
+        if isinstance(value, (np.memmap, mmap.mmap)):
+            return True
+        value = getattr(value, 'base', None)
+    return False
+
+
+def _resident_bytes(value):
+    """Bytes of memory held by a cached array (none for memory-mapped arrays)."""
+    return 0 if _is_memory_mapped(value) else value.nbytes
+
+
+class ResultCache():
+    """Memoising cache of Solver.simulate() outputs, in memory and optionally on disk.
+
+    Results are keyed on a hash of the parameters, the solver configuration and
+    the initial conditions (see key()). The in-memory tier is an LRU cache with
+    a byte budget; the optional disk tier stores one .npy file per result in a
+    directory, evicting the least recently used files beyond its own budget.
+    Disk entries are written atomically, so worker processes can share a
+    directory. Cached arrays are returned read-only.
+
+    Memory-mapped results (e.g. the output of a solver with an NpyMemmapSink)
+    are cached without copying them into memory, and neither count towards
+    nor are evicted by max_bytes; disk entries are memory-mapped when they
+    are read back.
+
+    Parameters:
+    ---------------
+        max_bytes: int, default=2**28
+            - byte budget of the in-memory tier (256 MB by default)
+        directory: str, default=None
+            - directory of the disk tier, no disk tier if None
+        max_disk_bytes: int, default=None
+            - byte budget of the disk tier, unlimited if None
+    """
+    def __init__(self, max_bytes=2 ** 28, directory=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+        self._memory = OrderedDict()
+        self.memory_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(solver, parameters):
+        """Return the cache key of simulating solver with parameters: a sha256 hash
+        of the parameters, the grid size and spacing, number of time points and saved frames,
+        model, scheme and time step settings, the settings of the active engine
+        (if used), the initial conditions and the observation operator (if any). The number of time points and saved
+        frames are taken from the configuration of the solver, because solving
+        (adaptively or until convergence) changes n_times and n_save_frames."""
+        description = dict(parameters=[float(p) for p in parameters], n_x=solver.n_x,
+                           n_y=solver.n_y, dx=solver.dx, n_time_points=solver._config['n_time_points'],
+                           n_save_frames=solver._config['n_save_frames'], model=solver.solve_eq,
+                           interaction=solver.interaction, decay=solver.decay,
+                           scheme=solver.scheme, dt=solver.dt, adaptive=solver.adaptive,
+                           atol=solver.atol, rtol=solver.rtol, dtype=solver.dtype.name,
+                           init=solver.init_hash())
+        if solver.engine == 'active':  # the only engine whose results depend on its settings
+            description['active'] = [solver.active_tol, solver.active_interval, solver.tile_size]
+        if solver.observation is not None:
+            description['observation'] = solver.observation.describe()
+        return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.npy')
+
+    def get(self, key):
+        """Return the cached result of key, or None if it is not cached."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            self.hits += 1
+            return self._memory[key]
+        if self.directory is not None and os.path.exists(self._path(key)):
+            try:
+                value = np.load(self._path(key), mmap_mode='r')
+            except (OSError, ValueError):  # removed or evicted by another process
+                value = None
+            if value is not None:
+                os.utime(self._path(key))  # mark as recently used
+                self.hits += 1
+                self.disk_hits += 1
+                return self._put_memory(key, value)
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store the result value under key and return the (read-only) cached array."""
+        value = np.asanyarray(value)
+        value = self._put_memory(key, value.view() if _is_memory_mapped(value) else np.array(value))
+        if self.directory is not None and not os.path.exists(self._path(key)):
+            tmp_path = f'{self._path(key)}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as npy_file:
+                np.save(npy_file, value)
+            os.replace(tmp_path, self._path(key))
+            self._evict_disk()
+        return value
+
+    def _put_memory(self, key, value):
+        value.flags.writeable = False
+        if key in self._memory:
+            self.memory_bytes -= _resident_bytes(self._memory.pop(key))
+        if _resident_bytes(value) <= self.max_bytes:
+            self._memory[key] = value
+            self.memory_bytes += _resident_bytes(value)
+            while self.memory_bytes > self.max_bytes:  # evict least recently used results in memory
+                evicted = next(key for key, cached in self._memory.items() if _resident_bytes(cached))
+                self.memory_bytes -= _resident_bytes(self._memory.pop(evicted))
+                self.evictions += 1
+        return value
+
+    def _evict_disk(self):
+        if self.max_disk_bytes is None:
+            return
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith('.npy'):
+                stat = os.stat(os.path.join(self.directory, file_name))
+                entries.append((stat.st_mtime, stat.st_size, file_name))
+        disk_bytes = sum(entry[1] for entry in entries)
+        for _, size, file_name in sorted(entries):
+            if disk_bytes <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                pass
+            disk_bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Return a dict with hit/miss statistics and the size of the memory tier."""
+        lookups = self.hits + self.misses
+        return dict(hits=self.hits, disk_hits=self.disk_hits, misses=self.misses,
+                    hit_rate=self.hits / lookups if lookups else 0.0,
+                    evictions=self.evictions, n_entries=len(self._memory),
+                    memory_bytes=self.memory_bytes)
+
+    def clear(self):
+        """Remove all results from the memory tier (the disk tier is kept)."""
+        self._memory.clear()
+        self.memory_bytes = 0
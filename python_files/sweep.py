@@ -0,0 +1,216 @@
+## Parameter sweeps over the (F, k) plane with per-point summaries
+import os
+import copy
+import multiprocessing
+import numpy as np
+from scipy import ndimage
+from frame_sinks import MemorySink
+
+PATTERNS = ('uniform', 'spots', 'maze', 'holes', 'mixed')  # labels of classify_pattern()
+
+
+def classify_pattern(v_mat, rel_tol=1e-3):
+    """Classify the (final) v matrix of a gray-scott run.
+
+    The matrix is thresholded halfway between its minimum and maximum, and the
+    connected regions of high v (with periodic boundaries) are counted:
+        - 'uniform': v is (nearly) constant, e.g. the pattern died out
+        - 'spots': many small, separate regions of high v
+        - 'holes': many small, separate regions of low v
+        - 'maze': one region of high v that spans a large part of the grid
+        - 'mixed': anything else
+
+    Parameters:
+    ---------------
+        v_mat: 2D numpy array
+            - v matrix
+        rel_tol: float, default=1e-3
+            - v is considered constant if its range is below rel_tol (relative
+            to max(|v|, 1))
+
+    Returns:
+    ---------------
+        pattern: str
+            - one of PATTERNS
+    """
+    v_min, v_max = float(np.min(v_mat)), float(np.max(v_mat))
+    if v_max - v_min < rel_tol * max(abs(v_max), 1):
+        return 'uniform'
+    high = v_mat > (v_min + v_max) / 2
+    n_cells = high.size
+
+    def regions(mask):
+        """Sizes of the connected regions of mask, merged across the periodic boundaries."""
+        labels, _ = ndimage.label(mask)
+        for first, second in ((labels[0], labels[-1]), (labels[:, 0], labels[:, -1])):
+            for label_a, label_b in zip(first, second):
+                if label_a and label_b and label_a != label_b:
+                    labels[labels == label_b] = label_a
+        sizes = np.bincount(labels.ravel())[1:]
+        return sizes[sizes > 0]
+
+    high_regions, low_regions = regions(high), regions(~high)
+    if len(high_regions) >= 3 and high_regions.max() < 0.05 * n_cells and high.mean() < 0.5:
+        return 'spots'
+    if len(low_regions) >= 3 and low_regions.max() < 0.05 * n_cells and high.mean() >= 0.5:
+        return 'holes'
+    if high_regions.max() > 0.2 * n_cells:
+        return 'maze'
+    return 'mixed'
+
+
+def summarise(u_mat, v_mat, n_steps, converged):
+    """Return the summary record (a dict) of one finished run."""
+    return dict(done=True, converged=converged, n_steps=n_steps, u_mean=np.mean(u_mat),
+                u_var=np.var(u_mat), v_mean=np.mean(v_mat), v_var=np.var(v_mat),
+                pattern=PATTERNS.index(classify_pattern(v_mat)), final_u=u_mat, final_v=v_mat)
+
+
+## Solver template of the worker processes of a Sweep, set once per worker
+_template = None
+_solve_kwargs = None
+
+
+def _init_worker(template, solve_kwargs):
+    global _template, _solve_kwargs
+    _template = template
+    _solve_kwargs = solve_kwargs
+
+
+def _run_copy(template):
+    """Copy of a template solver that keeps its frames in memory: the sweep only
+    stores the final matrices, and runs on several workers must not write to the
+    files of one disk sink."""
+    return copy.deepcopy(template, memo={id(template.frame_sink): MemorySink()})
+
+
+def _solve_point(task):
+    """Solve one (F, k) point with a fresh copy of the template solver."""
+    i_point, F, k = task
+    solver = _run_copy(_template)
+    solver.solve([F, k], **_solve_kwargs)
+    return i_point, summarise(solver.u_mat, solver.v_mat, solver.n_times,
+                              getattr(solver, 'convergence_reached', False))
+
+
+class Sweep():
+    """Sweep of a Solver over a grid of F and k values.
+
+    Only summary statistics of every point are kept: the final u and v
+    matrices, the mean and variance of u and v, the number of time steps until
+    convergence (or n_time_points) and the pattern class (see
+    classify_pattern()). They are streamed to a single structured .npy file
+    with one record per point, which can be loaded with
+    np.load(path, mmap_mode='r') and indexed as results[i_F, i_k]. A point is
+    marked done as soon as its record is written, so an interrupted sweep
+    resumes by running again with the same path: finished points are skipped.
+
+    Parameters:
+    ---------------
+        solver: Solver
+            - template solver, which sets the grid, time points, model and
+            initial conditions of every run (its n_save_frames only affects the
+            memory used per run, 2 is enough)
+        F_values, k_values: 1D arrays
+            - values of F and k, the sweep runs over all combinations
+        path: str
+            - file name of the results (.npy)
+        til_convergence: bool, default=True
+            - if true, every run stops at convergence
+        rel_tol: float, default=1e-4
+            - relative tolerance of the convergence criterion
+    """
+    def __init__(self, solver, F_values, k_values, path, til_convergence=True, rel_tol=1e-4):
+        self.solver = solver
+        self.F_values = np.asarray(F_values, dtype=float)
+        self.k_values = np.asarray(k_values, dtype=float)
+        self.path = path
+        self.til_convergence = til_convergence
+        self.rel_tol = rel_tol
+        grid_shape = (solver.n_x, solver.n_y)
+        self.dtype = np.dtype([('F', float), ('k', float), ('done', bool), ('converged', bool),
+                               ('n_steps', np.int64), ('u_mean', float), ('u_var', float),
+                               ('v_mean', float), ('v_var', float), ('pattern', np.int8),
+                               ('final_u', solver.dtype, grid_shape), ('final_v', solver.dtype, grid_shape)])
+
+    def open_results(self):
+        """Open the results file, creating it if it does not exist yet."""
+        shape = (len(self.F_values), len(self.k_values))
+        if os.path.exists(self.path):
+            results = np.lib.format.open_memmap(self.path, mode='r+')
+            if (results.shape != shape or results.dtype != self.dtype
+                    or not np.array_equal(results['F'][:, 0], self.F_values)
+                    or not np.array_equal(results['k'][0], self.k_values)):
+                raise ValueError(f'{self.path} holds the results of a different sweep.')
+            return results
+        results = np.lib.format.open_memmap(self.path, mode='w+', dtype=self.dtype, shape=shape)
+        results['F'], results['k'] = np.meshgrid(self.F_values, self.k_values, indexing='ij')
+        results.flush()
+        return results
+
+    def _store(self, results, i_point, record):
+        results_flat = results.reshape(-1)
+        for name, value in record.items():
+            results_flat[name][i_point] = value
+        results.flush()
+
+    def run(self, n_workers=1, batch_size=None, verbose=False):
+        """Run all points that are not done yet.
+
+        Parameters:
+        ---------------
+            n_workers: int, default=1
+                - number of worker processes, the points are solved in the main
+                process if 1 and on all cores if None
+            batch_size: int, default=None
+                - if given, solve this many points at once with
+                Solver.solve_batch() (in the main process)
+            verbose: bool, default=False
+                - if true, print the progress
+
+        Returns:
+        ---------------
+            n_solved: int
+                - number of points that were solved in this run
+        """
+        results = self.open_results()
+        todo = np.flatnonzero(~results['done'].reshape(-1))
+        tasks = [(i_point, float(results['F'].flat[i_point]), float(results['k'].flat[i_point]))
+                 for i_point in todo]
+        solve_kwargs = dict(til_convergence=self.til_convergence, rel_tol=self.rel_tol)
+        if batch_size is not None:
+            finished = self._run_batched(tasks, batch_size)
+        elif n_workers == 1:
+            _init_worker(self.solver, solve_kwargs)
+            finished = map(_solve_point, tasks)
+        else:
+            ## spawned workers: forking after multi-threaded (numba) code can deadlock
+            pool = multiprocessing.get_context('spawn').Pool(n_workers, initializer=_init_worker,
+                                                             initargs=(self.solver, solve_kwargs))
+            finished = pool.imap_unordered(_solve_point, tasks)
+        try:
+            for n_solved, (i_point, record) in enumerate(finished, start=1):
+                self._store(results, i_point, record)
+                if verbose:
+                    print(f'{n_solved}/{len(tasks)} points solved', end='\r')
+        except BaseException:
+            if batch_size is None and n_workers != 1:
+                pool.terminate()  # e.g. interrupted: finished points are stored, stop the others
+            raise
+        if batch_size is None and n_workers != 1:
+            pool.close()
+            pool.join()
+        del results
+        return len(tasks)
+
+    def _run_batched(self, tasks, batch_size):
+        """Yield the records of the tasks, solved batch_size points at a time."""
+        for i_batch in range(0, len(tasks), batch_size):
+            batch = tasks[i_batch:i_batch + batch_size]
+            solver = _run_copy(self.solver)
+            solver.solve_batch(np.array([[F, k] for _, F, k in batch]), til_convergence=self.til_convergence,
+                               rel_tol=self.rel_tol)
+            for i_member, (i_point, _, _) in enumerate(batch):
+                n_steps = int(solver.batch_n_times[i_member])
+                yield i_point, summarise(solver.batch_u_mat[i_member], solver.batch_v_mat[i_member],
+                                         n_steps, self.til_convergence and n_steps < solver.n_times)
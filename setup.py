@@ -85,5 +85,10 @@ setup(
         'pytest',
         'jupyter',
         'tqdm'
-    ]
+    ],
+
+    # Optional dependencies
+    extras_require={
+        'numba': ['numba'],
+    }
 )
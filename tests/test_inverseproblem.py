@@ -1,4 +1,5 @@
 import unittest
+import warnings
 import numpy as np
 import numpy as np
 from scipy.integrate import odeint
@@ -92,3 +93,184 @@ def test_find_parameter():
 
 
 
+
+class BatchTestModel(TestModel):
+    """Exponential model for testing, with a batched simulate method."""
+
+    def simulate_batch(self, parameters, times):
+        return np.array([self.simulate(p, times) for p in parameters])
+
+
+def test_batched_error():
+    """The batched sum of squares error must match pints.SumOfSquaresError."""
+    from pints import MultiOutputProblem
+    from grayscott.population import BatchedSumOfSquaresError
+
+    times = np.arange(0, 10, 0.5)
+    values = np.transpose(exponential_growth([0.5, 0.5], 0.1, times))
+    problem = MultiOutputProblem(BatchTestModel(), times, values)
+    parameters = np.array([[0.5, 0.1], [0.4, 0.2], [0.7, 0.05]])
+
+    batched_error = BatchedSumOfSquaresError(problem)(parameters)
+    error = SumOfSquaresError(problem)
+    assert np.allclose(batched_error, [error(p) for p in parameters], rtol=1e-12)
+
+    ## batched evaluations run under the stopping criteria of pints.OptimisationController
+    import pints
+    from grayscott.population import BatchEvaluator, EvaluatorOptimisationController
+    error = BatchedSumOfSquaresError(problem)
+    controller = EvaluatorOptimisationController(error, XNES([0.4, 0.2]), BatchEvaluator(error))
+    controller.set_max_iterations(5)
+    controller.set_log_to_screen(False)
+    controller.run()
+    assert controller.iterations() == 5 and controller.evaluations() == 5 * controller.optimiser().population_size()
+    assert pints.SequentialEvaluator.__name__ == 'SequentialEvaluator'
+
+
+def test_find_parameter_batched():
+    """Example based testing of a batched run of Inference.optimise()."""
+    np.random.seed(1)
+    parameters = np.array([0.5, 0.1])
+    times = np.arange(0, 10, 0.1)
+    data_ys = np.transpose(exponential_growth([0.5, 0.5], 0.1, times))
+    data_ys = data_ys + 0.01 * np.random.normal(size=data_ys.shape)
+
+    inference = Inference(BatchTestModel(), times, data_ys)
+    estimated_parameters = inference.optimise(batched=True)
+
+    assert np.allclose(a=estimated_parameters, b=parameters, rtol=5.0e-02)
+
+
+def test_find_parameter_parallel():
+    """Seeded parallel runs of Inference.optimise() must be reproducible."""
+    np.random.seed(1)
+    parameters = np.array([0.5, 0.1])
+    times = np.arange(0, 10, 0.1)
+    data_ys = np.transpose(exponential_growth([0.5, 0.5], 0.1, times))
+    data_ys = data_ys + 0.01 * np.random.normal(size=data_ys.shape)
+
+    inference = Inference(TestModel(), times, data_ys)
+    estimated_parameters = inference.optimise(parallel=True, n_workers=2, seed=3)
+    repeated_parameters = inference.optimise(parallel=True, n_workers=2, seed=3)
+
+    assert np.array_equal(estimated_parameters, repeated_parameters)
+    assert np.allclose(a=estimated_parameters, b=parameters, rtol=5.0e-02)
+
+
+def test_find_parameter_surrogate():
+    """The surrogate-assisted search must find the parameters with far fewer model solves than SNES."""
+    from pints import RectangularBoundaries
+    from grayscott.inverseproblem import InverseProblem
+
+    class CountingModel(TestModel):
+        n_solves = 0
+
+        def n_outputs(self):
+            return 1
+
+        def simulate(self, parameters, times):
+            CountingModel.n_solves += 1
+            return super(CountingModel, self).simulate(parameters, times)[:, 0]
+
+    parameters = np.array([0.5, 0.1])
+    times = np.arange(0, 10, 0.1)
+    data_ys = exponential_growth([0.5, 0.5], 0.1, times)[0]
+
+    problem = InverseProblem(CountingModel(), times, data_ys)
+    boundaries = RectangularBoundaries([0.01, 0.01], [1.0, 1.0])
+    estimated_parameters, score = problem.find_parameter([0.05, 0.05], surrogate=True, boundaries=boundaries,
+                                                         max_solves=150, seed=1)
+
+    assert CountingModel.n_solves <= 150
+    assert np.allclose(a=estimated_parameters, b=parameters, rtol=1.0e-02)
+
+
+def test_find_parameter_gradient():
+    """The gradient based fit of Inference.optimise() must recover F and k in a few tens of solves,
+    and report them in its profile."""
+    from grayscott.instrumentation import Profiler
+    solv = Solver(n_save_frames=10, n_time_points=400, model='gray-scott', n_grid=16, fix_seed=True)
+    data = solv.solve(parameters=[0.035, 0.06]).reshape(10, -1)
+
+    inference = Inference(solv, solv.save_times, data)
+    estimated_parameters = inference.optimise(gradient=True, x0=[0.04, 0.062], profiler=Profiler())
+
+    assert np.allclose(a=estimated_parameters, b=[0.035, 0.06], rtol=1.0e-04)
+    assert inference.profile['evaluations'] == inference.profile['solves'] > 0
+    assert inference.profile['steps_per_evaluation'] == 400
+    assert inference.profile['times']['objective'] <= inference.profile['times']['inference']
+    assert solv.profiler is None and 'simulateS1' not in vars(solv)
+
+
+def test_coarse_to_fine():
+    """Coarse-to-fine inference must spend most solves on the coarse grid and still recover F and k."""
+    from multifidelity import CoarseToFine, restrict
+    solv = Solver(n_save_frames=11, n_time_points=601, model='gray-scott', n_grid=32, fix_seed=True)
+    data = solv.solve(parameters=[0.035, 0.06]).reshape(11, 32, 32)
+
+    assert np.allclose(restrict(data, 2)[:, 0, 0], data[:, :2, :2].mean(axis=(1, 2)))
+    coarse_solver = CoarseToFine(solv, data).stage_solver(2, 4)
+    assert coarse_solver.n_x == 16 and coarse_solver.n_times == 151
+    assert coarse_solver.t_end == solv.t_end and coarse_solver.dx == 2
+    distributed = Solver(n_save_frames=11, n_time_points=601, n_grid=32, fix_seed=True, engine='distributed')
+    assert CoarseToFine(distributed, data).stage_solver(2, 4).engine == 'numpy'
+
+    np.random.seed(1)
+    inference = Inference(solv, solv.save_times, data.reshape(11, -1))
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)  # diverging candidates score inf silently
+        estimated_parameters = inference.optimise(coarse_to_fine=((2, 4), (1, 1)))
+
+    assert np.allclose(a=estimated_parameters, b=[0.035, 0.06], rtol=1.0e-02)
+
+
+def test_sample():
+    """Seeded MCMC chains must be reproducible in parallel, stop once converged and cover the parameters."""
+    from grayscott.inverseproblem import InverseProblem
+    from grayscott.sampling import CachedLogPDF
+
+    class CountingLogPDF():
+        n_calls = 0
+
+        def n_parameters(self):
+            return 2
+
+        def __call__(self, x):
+            CountingLogPDF.n_calls += 1
+            return -np.sum(np.square(x))
+
+    cached = CachedLogPDF(CountingLogPDF(), max_entries=2)
+    assert [cached([1, 2]), cached([1, 2]), cached([3, 4]), cached([5, 6]), cached([1, 2])] == [-5, -5, -25, -61, -5]
+    assert CountingLogPDF.n_calls == 4 and cached.hits == 1
+
+    np.random.seed(1)
+    parameters = np.array([0.5, 0.1])
+    times = np.arange(0, 10, 0.1)
+    data_ys = np.transpose(exponential_growth([0.5, 0.5], 0.1, times))
+    data_ys = data_ys + 0.01 * np.random.normal(size=data_ys.shape)
+
+    inference = Inference(TestModel(), times, data_ys)
+    np.random.seed(3)
+    samples = inference.sample(x0=parameters, sigma=0.01, n_chains=3, seed=2, min_ess=100)
+    next_random = np.random.rand()
+    np.random.seed(3)
+    assert next_random == np.random.rand()  # the global random state is untouched
+    diagnostics = inference.diagnostics
+    assert diagnostics['converged'] and diagnostics['iterations'] < 10000
+    assert np.all(diagnostics['rhat'] < 1.05) and np.all(diagnostics['ess'] >= 100)
+    assert samples.shape == (3, diagnostics['iterations'] // 2, 2)
+    mean, std = samples.reshape(-1, 2).mean(axis=0), samples.reshape(-1, 2).std(axis=0)
+    assert np.all(np.abs(mean - parameters) < 4 * std + 1e-3)
+    assert np.array_equal(inference.sample(x0=parameters, sigma=0.01, n_chains=3, seed=2, min_ess=100,
+                                           parallel=True, n_workers=2), samples)
+
+    class SingleOutputModel(TestModel):
+        def n_outputs(self):
+            return 1
+
+        def simulate(self, parameters, times):
+            return super(SingleOutputModel, self).simulate(parameters, times)[:, 0]
+
+    problem = InverseProblem(SingleOutputModel(), times, data_ys[:, 0])
+    assert problem.sample(parameters, n_chains=2, seed=2, max_iterations=200).shape == (2, 100, 2)
+    assert problem.diagnostics['iterations'] == 200 and not problem.diagnostics['converged']
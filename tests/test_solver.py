@@ -5,6 +5,7 @@ repo = os.path.dirname(cwd)
 sys.path.append(repo + '/python_files')
 from Pde_solver import Solver
 import numpy as np
+import pytest
 
 def convergence_test():
     def_n_times = 16000
@@ -23,3 +24,487 @@ def diffusion_test():
 
     assert np.isclose(solv.init_u_mat.sum(), solv.u_mat.sum())  # assert convergence of energy (i.e diffusion and boundary)
     return True
+
+def test_update_uv_inplace():
+    """The in-place kernel must reproduce update_uv() bit-for-bit for both models."""
+    for model in ['gray-scott', 'heat']:
+        solv = Solver(n_save_frames=2, n_time_points=10, model=model, n_grid=17, fix_seed=True)
+        solv.F, solv.k = 0.035, 0.06
+        ref_u, ref_v = solv.init_u_mat, solv.init_v_mat
+        u, v = solv.init_u_mat.copy(), solv.init_v_mat.copy()
+        u_next, v_next = np.empty_like(u), np.empty_like(v)
+        for _ in range(25):
+            ref_u, ref_v = solv.update_uv(ref_u, ref_v)
+            solv.update_uv_inplace(u, v, u_next, v_next)
+            u, u_next = u_next, u
+            v, v_next = v_next, v
+        assert np.array_equal(ref_u, u)
+        assert np.array_equal(ref_v, v)
+
+def test_solve_reference_loop():
+    """solve() must return the frames of a plain update_uv() time loop."""
+    solv = Solver(n_save_frames=5, n_time_points=40, model='gray-scott', n_grid=16, fix_seed=True)
+    init_u = solv.init_u_mat.copy()
+    output = solv.solve(parameters=[0.035, 0.06])
+    assert np.array_equal(solv.init_u_mat, init_u)  # initial state untouched
+    u, v = solv.init_u_mat, solv.init_v_mat
+    frames = []
+    for i_t in range(solv.n_times):
+        if i_t in solv.save_frames:
+            frames.append(u)
+        u, v = solv.update_uv(u, v)
+    frames[-1] = u
+    assert np.array_equal(output, np.array(frames).reshape(-1))
+    assert np.array_equal(solv.u_mat, u)
+
+def test_numba_engine():
+    """The numba engine (or its numpy fallback) must match the numpy engine."""
+    for model in ['gray-scott', 'heat']:
+        solv_np = Solver(n_save_frames=4, n_time_points=60, model=model, n_grid=20, fix_seed=True)
+        solv_nb = Solver(n_save_frames=4, n_time_points=60, model=model, n_grid=20, fix_seed=True,
+                         engine='numba')
+        output_np = solv_np.solve(parameters=[0.035, 0.06])
+        output_nb = solv_nb.solve(parameters=[0.035, 0.06])
+        assert np.allclose(output_np, output_nb, rtol=1e-12, atol=1e-14)
+        assert np.allclose(solv_np.v_mat, solv_nb.v_mat, rtol=1e-12, atol=1e-14)
+
+def test_solve_batch():
+    """Each member of a batched solve must match an individual solve."""
+    parameters = np.array([[0.035, 0.06], [0.035, 0.065], [0.02, 0.05]])
+    solv = Solver(n_save_frames=5, n_time_points=50, model='gray-scott', n_grid=16, fix_seed=True)
+    output = solv.solve_batch(parameters)
+    assert output.shape == (3, 5 * 16 * 16)
+    for i_m, params in enumerate(parameters):
+        assert np.array_equal(output[i_m], solv.solve(params))
+        assert np.array_equal(solv.batch_v_mat[i_m], solv.v_mat)
+
+def test_solve_batch_convergence():
+    """Converged members are frozen, the other members keep being updated."""
+    solv = Solver(n_save_frames=10, n_time_points=400, model='heat', n_grid=16, fix_seed=True)
+    output = solv.solve_batch(np.array([[0.035, 0.06], [0.035, 0.06]]), til_convergence=True,
+                              rel_tol=1e-3)
+    solv.solve([0.035, 0.06], til_convergence=True, rel_tol=1e-3)
+    assert np.all(solv.batch_n_times == solv.n_times)
+    assert np.array_equal(solv.batch_u_mat[0], solv.u_mat)
+    frames = output[0].reshape(10, 16, 16)
+    assert np.array_equal(frames[-1], frames[-2])  # frozen after convergence
+
+def test_imex_spectral():
+    """The IMEX spectral scheme must conserve heat and reach a steady
+    pattern in far fewer (larger) time steps than forward Euler."""
+    solv = Solver(n_save_frames=5, n_time_points=50, model='heat', n_grid=32, fix_seed=True,
+                  scheme='imex-spectral', dt=20)
+    solv.solve(parameters=[0.035, 0.06])
+    assert np.isclose(solv.init_u_mat.sum(), solv.u_mat.sum())
+    assert solv.save_times[-1] == 49 * 20
+
+    def_n_times = 1600
+    solv = Solver(n_save_frames=40, n_time_points=def_n_times, model='gray-scott', n_grid=32,
+                  fix_seed=True, scheme='imex-spectral', dt=10)
+    solv.solve(parameters=[0.035, 0.06], til_convergence=True, rel_tol=1e-3)
+    assert solv.n_times < def_n_times / 2
+    ## the converged pattern is (nearly) a steady state of the forward Euler scheme as well
+    euler = Solver(n_time_points=2, n_grid=32)
+    euler.F, euler.k = 0.035, 0.06
+    new_u, new_v = euler.update_uv(solv.u_mat, solv.v_mat)
+    assert np.abs(new_u - solv.u_mat).max() < 1e-3
+
+def test_adaptive():
+    """Adaptive time stepping must save frames at the requested times and stay
+    close to a fine fixed-step solution."""
+    fine = Solver(n_save_frames=5, n_time_points=4001, model='gray-scott', n_grid=16, fix_seed=True, dt=0.1)
+    fine.solve(parameters=[0.035, 0.06])
+    solv = Solver(n_save_frames=5, n_time_points=401, model='gray-scott', n_grid=16, fix_seed=True,
+                  adaptive=True, rtol=1e-4, atol=1e-5)
+    solv.solve(parameters=[0.035, 0.06])
+    assert np.allclose(solv.save_times, [0, 100, 200, 300, 400])
+    assert np.isclose(solv.step_sizes.sum(), 400)
+    assert len(solv.t_arr) == len(solv.convergence) == len(solv.step_sizes)
+    assert np.abs(solv.save_u_mat - fine.save_u_mat).max() < 1e-2
+    assert solv.n_rhs_evals < 4000
+
+    solv = Solver(n_save_frames=3, n_time_points=101, model='heat', n_grid=16, fix_seed=True,
+                  scheme='imex-spectral', adaptive=True)
+    solv.solve(parameters=[0.035, 0.06])
+    assert np.isclose(solv.init_u_mat.sum(), solv.u_mat.sum())
+
+    ## fixed and adaptive steps both keep the frames saved so far and the converged state
+    full = Solver(n_save_frames=10, n_time_points=400, model='heat', n_grid=16, fix_seed=True)
+    full.solve(parameters=[0.035, 0.06])
+    for adaptive in [False, True]:
+        solv = Solver(n_save_frames=10, n_time_points=400, model='heat', n_grid=16, fix_seed=True,
+                      adaptive=adaptive)
+        solv.solve(parameters=[0.035, 0.06], til_convergence=True, rel_tol=1e-3)
+        assert solv.convergence_reached and len(solv.save_u_mat) == len(solv.save_times) < 10
+        assert np.array_equal(solv.save_u_mat[-1], solv.u_mat)
+        assert solv.save_times[-2] < solv.save_times[-1] == solv.t_end
+        if not adaptive:
+            n_saved = len(solv.save_times) - 1
+            assert np.array_equal(solv.save_times[:-1], full.save_times[:n_saved])
+            assert np.array_equal(solv.save_u_mat[:-1], full.save_u_mat[:n_saved])
+
+def test_frame_sinks():
+    """Frames streamed to disk must equal the frames kept in memory."""
+    import tempfile
+    from frame_sinks import NpyMemmapSink, HDF5Sink
+    solv = Solver(n_save_frames=6, n_time_points=60, model='gray-scott', n_grid=16, fix_seed=True)
+    output = solv.solve(parameters=[0.035, 0.06])
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        sinks = [NpyMemmapSink(os.path.join(tmp_dir, 'frames'))]
+        try:
+            import h5py
+            sinks.append(HDF5Sink(os.path.join(tmp_dir, 'frames.h5')))
+        except ImportError:
+            pass
+        for sink in sinks:
+            solv_disk = Solver(n_save_frames=6, n_time_points=60, model='gray-scott', n_grid=16,
+                               fix_seed=True, frame_sink=sink)
+            assert np.array_equal(output, solv_disk.solve(parameters=[0.035, 0.06]))
+            assert np.array_equal(solv.save_v_mat[3], solv_disk.save_v_mat[3])
+            solv_disk.solve(parameters=[0.035, 0.06], til_convergence=True, rel_tol=1e-2)
+            assert solv_disk.save_u_mat.shape[0] == solv_disk.n_save_frames
+            sink.close()
+        saved_u = np.load(os.path.join(tmp_dir, 'frames_u.npy'), mmap_mode='r')
+        assert saved_u.shape == (solv_disk.n_save_frames, 16, 16)
+
+def test_checkpoint_resume():
+    """Resuming from a checkpoint must give the same result as an uninterrupted run."""
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'checkpoint.npz')
+        for til_convergence in [False, True]:
+            solv = Solver(n_save_frames=7, n_time_points=100, model='gray-scott', n_grid=16, fix_seed=True)
+            output = solv.solve(parameters=[0.035, 0.06], til_convergence=til_convergence, rel_tol=1e-2,
+                                checkpoint_path=path, checkpoint_every=30)
+            with np.load(path) as checkpoint:
+                assert checkpoint['next_step'] == 30 * ((solv.n_times - 1) // 30)
+            np.random.seed(1)
+            expected = np.random.rand()
+            np.random.seed(1)
+            resumed = Solver.resume(path)
+            assert np.random.rand() == expected  # the global random state is untouched
+            assert np.array_equal(output, resumed.save_u_mat.reshape(-1))
+            assert np.array_equal(solv.v_mat, resumed.v_mat)
+            assert np.array_equal(solv.save_times, resumed.save_times)
+            assert np.array_equal(solv.convergence, resumed.convergence)
+
+        ## with a disk sink, the checkpoint refers to its files instead of copying the frames
+        from frame_sinks import NpyMemmapSink
+        sink = NpyMemmapSink(os.path.join(tmp_dir, 'frames'))
+        solv = Solver(n_save_frames=7, n_time_points=100, model='gray-scott', n_grid=16, fix_seed=True,
+                      frame_sink=sink)
+        output = solv.solve(parameters=[0.035, 0.06], checkpoint_path=path, checkpoint_every=30)
+        with np.load(path) as checkpoint:
+            assert checkpoint['frames_u'].size == 0
+        for resume_sink in [None, NpyMemmapSink(os.path.join(tmp_dir, 'other'))]:
+            resumed = Solver.resume(path, frame_sink=resume_sink)
+            assert np.array_equal(output, resumed.save_u_mat.reshape(-1))
+            assert np.array_equal(solv.save_v_mat, resumed.save_v_mat)
+
+        warm = Solver(n_save_frames=2, n_time_points=10, model='gray-scott', n_grid=16)
+        warm.warm_start(path)
+        assert np.array_equal(warm.init_u_mat, np.load(path)['u_mat'])
+
+def test_result_cache():
+    """Repeated simulations must be served from the cache, in memory and on disk."""
+    import tempfile
+    from result_cache import ResultCache
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache = ResultCache(directory=tmp_dir)
+        solv = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=16, fix_seed=True,
+                      cache=cache)
+        output = solv.simulate([0.035, 0.06], None)
+        assert np.array_equal(output, solv.simulate([0.035, 0.06], None))
+        solv.simulate([0.035, 0.065], None)
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 2
+
+        ## a new solver with the same initial conditions shares the disk cache
+        cache = ResultCache(max_bytes=output.nbytes, directory=tmp_dir)
+        solv = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=16, fix_seed=True,
+                      cache=cache)
+        assert np.array_equal(output, solv.simulate([0.035, 0.06], None))
+        assert cache.stats()['disk_hits'] == 1
+        assert cache.memory_bytes == 0  # disk entries are memory-mapped
+        solv.simulate([0.03, 0.06], None)
+        solv.simulate([0.03, 0.065], None)  # evicts the previous in-memory result
+        assert cache.stats()['n_entries'] == 2 and cache.evictions == 1
+
+        ## different initial conditions or configuration give a different key
+        other = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=16)
+        assert cache.key(other, [0.035, 0.06]) != cache.key(solv, [0.035, 0.06])
+        other = Solver(n_save_frames=3, n_time_points=31, model='gray-scott', n_grid=16, fix_seed=True)
+        assert cache.key(other, [0.035, 0.06]) != cache.key(solv, [0.035, 0.06])
+
+        ## the key does not change when solving changes n_times (adaptive time stepping)
+        cache = ResultCache()
+        solv = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=16, fix_seed=True,
+                      adaptive=True, cache=cache)
+        for _ in range(3):
+            solv.simulate([0.035, 0.06], None)
+        assert cache.stats()['hits'] == 2 and cache.stats()['misses'] == 1
+
+        ## a converged solve does not shorten later simulations, which share the key of a fresh solver
+        cache = ResultCache()
+        solv = Solver(n_save_frames=10, n_time_points=400, model='heat', n_grid=16, fix_seed=True, cache=cache)
+        solv.solve([0.035, 0.06], til_convergence=True, rel_tol=1e-3)
+        assert solv.convergence_reached and solv.n_save_frames < 10
+        output = solv.simulate([0.035, 0.06], None)
+        fresh = Solver(n_save_frames=10, n_time_points=400, model='heat', n_grid=16, fix_seed=True, cache=cache)
+        assert len(output) == 10 * 16 * 16 and solv.n_times == 400
+        assert np.array_equal(fresh.simulate([0.035, 0.06], None), fresh.solve([0.035, 0.06]))
+
+def test_float32():
+    """Single precision runs must stay in float32 and close to float64 runs."""
+    solv_64 = Solver(n_save_frames=4, n_time_points=200, model='gray-scott', n_grid=16, fix_seed=True)
+    solv_32 = Solver(n_save_frames=4, n_time_points=200, model='gray-scott', n_grid=16, fix_seed=True,
+                     dtype=np.float32)
+    output_64 = solv_64.solve(parameters=[0.035, 0.06])
+    output_32 = solv_32.solve(parameters=[0.035, 0.06])
+    assert output_32.dtype == solv_32.u_mat.dtype == np.float32
+    assert solv_32.convergence.dtype == np.float64
+    assert np.allclose(output_32, output_64, atol=1e-5)
+
+def test_convergence_monitor():
+    """The convergence metric is only sampled every convergence_interval steps, the
+    fused numba metric matches the numpy one, and disabling it leaves the output unchanged."""
+    solv = Solver(n_save_frames=4, n_time_points=100, model='gray-scott', n_grid=16, fix_seed=True)
+    output = solv.solve(parameters=[0.035, 0.06])
+    for engine in ['numpy', 'numba']:
+        for norm in ['l1', 'l2', 'max']:
+            reference = Solver(n_save_frames=4, n_time_points=100, model='gray-scott', n_grid=16,
+                               fix_seed=True, convergence_norm=norm)
+            reference.solve(parameters=[0.035, 0.06])
+            sampled = Solver(n_save_frames=4, n_time_points=100, model='gray-scott', n_grid=16,
+                             fix_seed=True, engine=engine, convergence_interval=10, convergence_norm=norm)
+            assert np.array_equal(sampled.solve(parameters=[0.035, 0.06]), output)
+            assert np.array_equal(sampled.convergence_steps, np.arange(0, 100, 10))
+            assert np.allclose(sampled.convergence, reference.convergence[::10], rtol=1e-10)
+
+    disabled = Solver(n_save_frames=4, n_time_points=100, model='gray-scott', n_grid=16, fix_seed=True,
+                      convergence_interval=None)
+    assert np.array_equal(disabled.solve(parameters=[0.035, 0.06]), output)
+    assert len(disabled.convergence) == 0
+    try:
+        disabled.solve(parameters=[0.035, 0.06], til_convergence=True)
+        assert False
+    except ValueError:
+        pass
+
+def test_tiled_engine():
+    """The tiled engine, with and without temporal blocking and threads, must reproduce the numpy engine."""
+    solv = Solver(n_save_frames=5, n_time_points=120, model='gray-scott', n_grid=20, fix_seed=True)
+    output = solv.solve(parameters=[0.035, 0.06])
+    for tile_size, time_block, n_threads in [(8, 1, 1), (7, 4, 2), (32, 3, 1)]:
+        tiled = Solver(n_save_frames=5, n_time_points=120, model='gray-scott', n_grid=20, fix_seed=True,
+                       engine='tiled', tile_size=tile_size, time_block=time_block, n_threads=n_threads,
+                       convergence_interval=10)
+        assert np.array_equal(tiled.solve(parameters=[0.035, 0.06]), output)
+        assert np.array_equal(tiled.u_mat, solv.u_mat) and np.array_equal(tiled.v_mat, solv.v_mat)
+
+def test_distributed_engine():
+    """The distributed engine must reproduce the frames, output and convergence of the numpy engine."""
+    solv = Solver(n_save_frames=5, n_time_points=300, model='gray-scott', n_grid=20, fix_seed=True)
+    output = solv.solve(parameters=[0.035, 0.06])
+    distributed = Solver(n_save_frames=5, n_time_points=300, model='gray-scott', n_grid=20, fix_seed=True,
+                         engine='distributed', n_workers=2, tile_size=8)
+    try:
+        assert np.array_equal(distributed.solve(parameters=[0.035, 0.06]), output)
+        assert np.array_equal(distributed.save_v_mat, solv.save_v_mat)
+        assert np.allclose(distributed.convergence, solv.convergence, rtol=1e-12)
+
+        solv.solve(parameters=[0.035, 0.06], til_convergence=True, rel_tol=1e-2)
+        distributed.solve(parameters=[0.035, 0.06], til_convergence=True, rel_tol=1e-2)
+        assert distributed.n_times == solv.n_times
+        assert np.array_equal(distributed.u_mat, solv.u_mat)
+    finally:
+        distributed.close()
+
+def test_sweep():
+    """A sweep must match solve_batch(), store the pattern classes and skip finished points on resume."""
+    import tempfile
+    from sweep import Sweep, PATTERNS, classify_pattern
+    solv = Solver(n_save_frames=2, n_time_points=400, model='gray-scott', n_grid=16, fix_seed=True)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'sweep.npy')
+        sweep = Sweep(solv, [0.03, 0.04], [0.06, 0.065], path, rel_tol=1e-3)
+        assert sweep.run(batch_size=3) == 4
+        results = np.load(path)
+        assert results['done'].all() and results['F'][1, 0] == 0.04 and results['k'][1, 1] == 0.065
+        assert results['pattern'][0, 0] == PATTERNS.index(classify_pattern(results['final_v'][0, 0]))
+
+        reference = Solver(n_save_frames=2, n_time_points=400, model='gray-scott', n_grid=16, fix_seed=True)
+        reference.solve(parameters=[0.04, 0.06], til_convergence=True, rel_tol=1e-3)
+        assert np.array_equal(results['final_u'][1, 0], reference.u_mat)
+        assert results['n_steps'][1, 0] == reference.n_times
+
+        done = np.lib.format.open_memmap(path, mode='r+')
+        done['done'][0, 1] = False  # as if the sweep had been interrupted
+        del done
+        assert sweep.run() == 1
+        assert np.array_equal(np.load(path), results)
+
+        ## workers do not write to the disk sink of the template
+        from frame_sinks import NpyMemmapSink
+        sink = NpyMemmapSink(os.path.join(tmp_dir, 'frames'))
+        template = Solver(n_save_frames=2, n_time_points=400, model='gray-scott', n_grid=16, fix_seed=True,
+                          frame_sink=sink)
+        sweep = Sweep(template, [0.03, 0.04], [0.06, 0.065], os.path.join(tmp_dir, 'workers.npy'), rel_tol=1e-3)
+        assert sweep.run(n_workers=2) == 4
+        assert np.array_equal(np.load(sweep.path), results)
+        assert not os.path.exists(sink.u_path) and template.frame_sink is sink
+    assert classify_pattern(np.full((8, 8), 0.25)) == 'uniform'
+
+def test_observations():
+    """Observation operators must equal the operator applied to the full frames, also until convergence and resumed."""
+    import tempfile
+    import pints
+    from observations import Downsample, SensorSubset, RadialPowerSpectrum, FrameSelection
+    solv = Solver(n_save_frames=6, n_time_points=200, model='gray-scott', n_grid=20, fix_seed=True)
+    solv.solve(parameters=[0.035, 0.06])
+    for observation, n_values in [(Downsample(4), 25), (Downsample(3, 'subsample'), 49), (SensorSubset(30), 30),
+                                  (RadialPowerSpectrum(), 10), (FrameSelection([0, -1], Downsample(5, 'max')), 16)]:
+        observed = Solver(n_save_frames=6, n_time_points=200, model='gray-scott', n_grid=20, fix_seed=True,
+                          observation=observation)
+        output = observed.solve(parameters=[0.035, 0.06])
+        frames = observation.observed_frames(6)
+        assert observed.n_outputs() == n_values and output.shape == (len(frames) * n_values,)
+        assert np.allclose(output, np.concatenate([observation(solv.save_u_mat[i]) for i in frames]))
+        assert np.array_equal(observed.solve_batch([[0.035, 0.06]])[0], output)
+        problem = pints.MultiOutputProblem(observed, observed.observed_times, observed.save_observed)
+        assert pints.SumOfSquaresError(problem)([0.035, 0.06]) == 0
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'checkpoint.npz')
+        observed = Solver(n_save_frames=7, n_time_points=100, model='gray-scott', n_grid=16, fix_seed=True,
+                          observation=Downsample(2))
+        output = observed.solve(parameters=[0.035, 0.06], til_convergence=True, rel_tol=1e-2,
+                                checkpoint_path=path, checkpoint_every=30)
+        assert observed.save_observed.shape == (observed.n_save_frames, 64)
+        resumed = Solver.resume(path, observation=Downsample(2))
+        assert np.array_equal(resumed.save_observed.reshape(-1), output)
+
+def test_sensitivities():
+    """simulateS1() must reproduce simulate() and match central differences of it."""
+    import pints
+    from observations import Downsample, RadialPowerSpectrum
+    parameters = np.array([0.035, 0.06])
+    for observation in [None, Downsample(4, 'max'), RadialPowerSpectrum()]:
+        solv = Solver(n_save_frames=4, n_time_points=150, model='gray-scott', n_grid=16, fix_seed=True,
+                      observation=observation)
+        output, sensitivities = solv.simulateS1(parameters, None)
+        assert np.array_equal(output, solv.simulate(parameters, None))
+        assert sensitivities.shape == (4, solv.n_outputs(), 2)
+        for i_parameter, step in enumerate(np.diag([1e-6, 1e-6])):
+            central = (solv.simulate(parameters + step, None) - solv.simulate(parameters - step, None)) / 2e-6
+            assert np.allclose(sensitivities[..., i_parameter].reshape(-1), central,
+                               rtol=1e-5, atol=1e-6 * np.max(np.abs(central)))
+
+    problem = pints.MultiOutputProblem(solv, solv.save_times, output.reshape(4, -1))
+    error, gradient = pints.SumOfSquaresError(problem).evaluateS1(parameters)
+    assert error == 0 and np.allclose(gradient, 0)
+
+def test_initial_conditions():
+    """Initial conditions must come from their own random generators and be shared through the cache."""
+    import tempfile
+    from initial_conditions import FromFile, FromRun, RandomSpots, make_initial_condition
+    from frame_sinks import NpyMemmapSink
+    np.random.seed(5)
+    expected = np.random.rand()
+    np.random.seed(5)
+    solv = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=16, fix_seed=True)
+    assert np.random.rand() == expected  # the global random state is untouched
+    same = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=16, seed=0)
+    assert same.init_u_mat is solv.init_u_mat and not solv.init_u_mat.flags.writeable
+    other = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=16, seed=1)
+    assert not np.array_equal(other.init_u_mat, solv.init_u_mat)
+    assert np.all(np.abs(solv.init_u_mat[:7] - 1) <= 0.01) and np.all(np.abs(solv.init_v_mat[7:9, 7:9] - 0.25) <= 0.01)
+
+    spots = Solver(n_save_frames=3, n_time_points=30, model='gray-scott', n_grid=32, seed=2,
+                   initial_condition=RandomSpots(n_spots=3, radius=2))
+    assert 3 * 5 <= np.sum(spots.init_v_mat > 0.2) <= 3 * 13
+    with pytest.raises(ValueError):
+        make_initial_condition('stripes')
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'init.npy')
+        np.save(path, np.stack([other.init_u_mat, other.init_v_mat]))
+        from_file = Solver(n_save_frames=3, n_time_points=30, n_grid=16, initial_condition=FromFile(path))
+        assert np.array_equal(from_file.init_v_mat, other.init_v_mat)
+        with pytest.raises(ValueError):
+            Solver(n_save_frames=3, n_time_points=30, n_grid=8, initial_condition=FromFile(path))
+
+        solv.frame_sink = NpyMemmapSink(os.path.join(tmp_dir, 'frames'))
+        solv.solve(parameters=[0.035, 0.06])
+        from_run = Solver(n_save_frames=3, n_time_points=30, n_grid=16,
+                          initial_condition=FromRun(os.path.join(tmp_dir, 'frames'), frame=1))
+        assert np.array_equal(from_run.init_u_mat, solv.save_u_mat[1])
+        solv.frame_sink.close()
+
+def test_profiler():
+    """The profiler must time the phases of solve() and count steps, frames and callbacks."""
+    from grayscott.instrumentation import Profiler
+    solv = Solver(n_save_frames=5, n_time_points=100, model='gray-scott', n_grid=16, fix_seed=True)
+    output = solv.solve(parameters=[0.035, 0.06])
+    assert solv.profile is None
+
+    callback_steps = []
+    solv.profiler = Profiler(callback=lambda solver, i_t, profiler: callback_steps.append(i_t), every=30)
+    assert np.array_equal(solv.solve(parameters=[0.035, 0.06]), output)
+    assert callback_steps == [30, 60, 90]
+    assert solv.profile['steps'] == 100 and solv.profile['cell_updates'] == 100 * 16 ** 2
+    assert solv.profile['calls']['step'] == 100 and solv.profile['calls']['diffusion'] == 200
+    assert solv.profile['bytes_copied_estimate'] == (1 + solv.profile['frames_saved']) * 2 * 16 ** 2 * 8
+    times = solv.profile['times']
+    assert 0 < times['diffusion'] + times['reaction'] + times['convergence'] <= times['step'] <= times['solve']
+    assert 'advance_uv' not in vars(solv)  # the timed wrappers are removed after solving
+
+def test_headless_import():
+    """Importing and running the solver must not import the plotting stack or tqdm."""
+    import subprocess
+    code = ("import sys; from Pde_solver import Solver; "
+            "Solver(n_save_frames=2, n_time_points=10, n_grid=8).solve([0.035, 0.06]); "
+            "print(sorted(m for m in ('matplotlib', 'seaborn', 'tqdm', 'numba') if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=repo + '/python_files',
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+def test_rendering():
+    """Frames must be mapped to colormap levels in batches and written as GIF and PNG files."""
+    import tempfile
+    from PIL import Image
+    import rendering
+    solv = Solver(n_save_frames=5, n_time_points=50, model='gray-scott', n_grid=16, fix_seed=True)
+    solv.solve(parameters=[0.035, 0.06])
+    vmin, vmax = rendering.frame_range(solv.save_u_mat, batch_size=2)
+    assert (vmin, vmax) == (solv.save_u_mat.min(), solv.save_u_mat.max())
+    levels = list(rendering.iter_levels(solv.save_u_mat, batch_size=2, scale=2))
+    assert len(levels) == 5 and levels[0].shape == (32, 32) and levels[0].dtype == np.uint8
+    assert np.array_equal(levels[3][::-2, ::2], rendering.to_levels(solv.save_u_mat[3], vmin, vmax))
+    rgb = rendering.to_rgb(solv.save_u_mat, vmin, vmax)
+    assert rgb.shape == (5, 16, 16, 3) and rgb.dtype == np.uint8
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        solv.animation(file_name=os.path.join(tmp_dir, 'u.gif'), scale=1)
+        with Image.open(os.path.join(tmp_dir, 'u.gif')) as gif:
+            assert gif.n_frames == 5 and gif.size == (16, 16)
+            gif.seek(3)
+            assert np.array_equal(np.asarray(gif.convert('RGB'))[::-1], rgb[3])
+        paths = rendering.write_png_sequence(os.path.join(tmp_dir, 'u_{:02d}.png'), solv.save_u_mat)
+        assert len(paths) == 5 and all(os.path.exists(path) for path in paths)
+
+def test_active_engine():
+    """The active engine must match the numpy engine exactly without tolerance, and within a small
+    error while skipping the tiles at rest."""
+    kwargs = dict(n_save_frames=4, n_time_points=400, model='gray-scott', n_grid=128, fix_seed=True,
+                  convergence_interval=None)
+    solv = Solver(**kwargs)
+    output = solv.solve(parameters=[0.035, 0.06])
+    exact = Solver(engine='active', tile_size=8, active_tol=0, **kwargs)
+    assert np.array_equal(exact.solve(parameters=[0.035, 0.06]), output)
+
+    active = Solver(engine='active', tile_size=8, active_tol=1e-6, **kwargs)
+    assert np.allclose(active.solve(parameters=[0.035, 0.06]), output, rtol=0, atol=1e-4)
+    assert 0 < active._active_state['n_active'] < 256 and len(active._active_state['resting']) > 0
+    assert np.allclose(active.v_mat, solv.v_mat, rtol=0, atol=1e-4)
+    with pytest.raises(ValueError):
+        Solver(engine='active', tile_size=8, active_interval=9, **kwargs)